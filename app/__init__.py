@@ -1,32 +1,76 @@
 from flask import Flask, jsonify
-from flask_cors import CORS
 from app.extensions import db, migrate
 from app.config import config, Config
-from app.api import expenses_bp, incomes_bp, users_bp, balances_bp
+from app.utils.sqlite_config import configure_sqlite
+from app.utils.fulltext import configure_sqlite_fts
+from app.models.expense import Expense
 import os
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 
-def create_app(config_name=None):
-    """Create Flask application using the factory pattern."""
+def create_app(config_name=None, api=True):
+    """
+    Create Flask application using the factory pattern.
+
+    The bot, worker and scheduler only need the database, so they pass
+    ``api=False`` and skip the blueprints, JWT, CORS and metrics (and the
+    modules behind them) to start faster.
+    """
     
     if config_name is None:
         config_name = os.environ.get('FLASK_ENV', 'development')
     
     app = Flask(__name__)
     app.config.from_object(config[config_name])
-    app.config['MAX_CONTENT_LENGTH'] = 2 * 1024 * 1024
-    app.config["JWT_SECRET_KEY"] = os.getenv('JWT_SECRET_KEY')
-    jwt = JWTManager(app)
+    config[config_name].init_app(app)
     
     # Initialize Flask extensions
     db.init_app(app)
-    migrate.init_app(app, db)
-    
+    is_sqlite = app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite')
+    # SQLite cannot ALTER most constraints in place, so migrations use batch mode
+    # compare_server_default lets `flask db migrate` pick up database-side defaults
+    migrate.init_app(app, db, render_as_batch=is_sqlite, compare_server_default=True)
+    if is_sqlite:
+        with app.app_context():
+            configure_sqlite(db.engine)
+            configure_sqlite_fts(db.engine, Expense.__table__)
+            # Embedded deployments may never run `flask db upgrade`, so create missing tables here
+            db.create_all()
+
+    if api:
+        init_api(app)
+
+    # Create upload directories if they don't exist
+    os.makedirs(Config.FILE_FOLDER, exist_ok=True)
+
+    return app
+
+
+def init_api(app):
+    """Register the REST API: JWT, blueprints, metrics, error handlers and CORS."""
+    from flask_cors import CORS
+    from flask_jwt_extended import JWTManager
+    from app.api import expenses_bp, incomes_bp, users_bp, balances_bp, metrics_bp, recurring_bp
+    from app.services.token_service import token_service
+    from app.utils.metrics import init_metrics
+    from app.utils.passwords import password_hasher
+
+    app.config["JWT_SECRET_KEY"] = os.getenv('JWT_SECRET_KEY')
+    jwt = JWTManager(app)
+
+    @jwt.token_in_blocklist_loader
+    def token_revoked(jwt_header, jwt_payload):
+        return token_service.is_revoked(jwt_payload)
+
     # Register blueprints
     app.register_blueprint(expenses_bp, url_prefix='/api')
     app.register_blueprint(incomes_bp, url_prefix='/api')
     app.register_blueprint(users_bp, url_prefix='/api')
     app.register_blueprint(balances_bp, url_prefix='/api')
+    app.register_blueprint(recurring_bp, url_prefix='/api')
+
+    # Request latency, query count and OCR instrumentation
+    if app.config.get('METRICS_ENABLED'):
+        init_metrics(app)
+        app.register_blueprint(metrics_bp)
     
     # Register error handlers
     @app.errorhandler(404)
@@ -49,11 +93,9 @@ def create_app(config_name=None):
     def internal_error(error):
         return jsonify({'success': False, 'error': 'Internal server error'}), 500
     
-    # Create upload directories if they don't exist
-    os.makedirs(Config.FILE_FOLDER, exist_ok=True)
+    # Measure the password hashing work factor once per process
+    password_hasher.calibrate()
     CORS(app)
 
-    return app
-
 # Import models to ensure they're registered with SQLAlchemy
-from app.models import expense
\ No newline at end of file
+from app.models import expense
@@ -3,5 +3,7 @@ from .expenses import expenses_bp
 from .incomes import incomes_bp
 from .users import users_bp
 from .balances import balances_bp
+from .metrics import metrics_bp
+from .recurring import recurring_bp
 
-__all__ = ['expenses_bp', 'incomes_bp', 'users_bp', 'balances_bp']
\ No newline at end of file
+__all__ = ['expenses_bp', 'incomes_bp', 'users_bp', 'balances_bp', 'metrics_bp', 'recurring_bp']
\ No newline at end of file
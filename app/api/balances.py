@@ -5,6 +5,8 @@ import logging
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from app.services.balance_service import balance_service
+from app.services.forecast_service import forecast_service, MAX_HISTORY_MONTHS, DEFAULT_HISTORY_MONTHS
+from app.utils.helpers import parse_date
 
 balances_bp = Blueprint('balances', __name__)
 
@@ -25,17 +27,17 @@ def get_total_balance():
         
         balance = balance_service.get_total_balance(user_id)
         
-        logging.info(f"Retrieved total balance for user_id {user_id} successfully.")
+        logging.info("Retrieved total balance for user_id %s successfully.", user_id)
         return jsonify({
             'success': True,
             'balance': balance
         })
     
     except Exception as e:
-        logging.error(f"Error retrieving total balance for user_id {user_id}: {str(e)}")
+        logging.error("Error retrieving total balance for user_id %s: %s", user_id, str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
 
 
@@ -57,17 +59,17 @@ def get_monthly_balance():
 
         balance = balance_service.get_monthly_balance(user_id, month, year)
         
-        logging.info(f"Retrieved monthly balance for user_id {user_id}, month {month}, year {year} successfully.")
+        logging.info("Retrieved monthly balance for user_id %s, month %s, year %s successfully.", user_id, month, year)
         return jsonify({
             'success': True,
             'balance': balance
         })
     
     except Exception as e:
-        logging.error(f"Error retrieving monthly balance for user_id {user_id}, month {month}, year {year}: {str(e)}")
+        logging.error("Error retrieving monthly balance for user_id %s, month %s, year %s: %s", user_id, month, year, str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
 
 
@@ -87,17 +89,17 @@ def get_summary():
         
         summary = balance_service.get_financial_summary(user_id)
         
-        logging.info(f"Retrieved financial summary for user_id {user_id} successfully.")
+        logging.info("Retrieved financial summary for user_id %s successfully.", user_id)
         return jsonify({
             'success': True,
             'summary': summary
         })
     
     except Exception as e:
-        logging.error(f"Error retrieving financial summary for user_id {user_id}: {str(e)}")
+        logging.error("Error retrieving financial summary for user_id %s: %s", user_id, str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
 
 
@@ -117,15 +119,58 @@ def get_daily_balance_chart():
         
         chart_data = balance_service.get_daily_balance_chart(user_id)
         
-        logging.info(f"Retrieved balance chart data for user_id {user_id} successfully.")
+        logging.info("Retrieved balance chart data for user_id %s successfully.", user_id)
         return jsonify({
             'success': True,
             'data': chart_data
         })
     
     except Exception as e:
-        logging.error(f"Error retrieving balance chart data for user_id {user_id}: {str(e)}")
+        logging.error("Error retrieving balance chart data for user_id %s: %s", user_id, str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
+        }), 500
+
+
+@balances_bp.route('/balance/forecast', methods=['GET'])
+@jwt_required()
+def get_balance_forecast():
+    """
+    Project the end-of-month balance and spend per category.
+
+    Query params:
+        history_months: past months to learn from (default 12, max 120)
+        as_of: last day with known data, YYYY-MM-DD (default today)
+    """
+    try:
+        user_id = get_jwt_identity()
+        history_months = request.args.get('history_months', DEFAULT_HISTORY_MONTHS, type=int)
+        as_of = request.args.get('as_of')
+
+        if not 1 <= history_months <= MAX_HISTORY_MONTHS:
+            return jsonify({
+                'success': False,
+                'error': f'history_months must be between 1 and {MAX_HISTORY_MONTHS}'
+            }), 400
+        today = parse_date(as_of) if as_of else None
+        if as_of and not today:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid date format'
+            }), 400
+
+        forecast = forecast_service.forecast_month(user_id, today, history_months)
+
+        logging.info("Computed balance forecast for user_id %s successfully.", user_id)
+        return jsonify({
+            'success': True,
+            'forecast': forecast
+        })
+
+    except Exception as e:
+        logging.error("Error computing balance forecast for user_id %s: %s", user_id, str(e))
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
         }), 500
@@ -2,70 +2,101 @@
 API routes for managing expenses.
 """
 import logging
+import mimetypes
+import os
 import uuid
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, make_response, send_file, url_for
 from flask_jwt_extended import get_jwt_identity, jwt_required
-from app.services.expense_service import expense_service
-import os
-import tempfile
+from app.services.expense_service import expense_service, DuplicateExpenseError
+from app.services.ocr_job_service import ocr_job_service
+from app.models.ocr_job import OcrJob
+from app.services.period_service import period_service
+from app.services.ticket_store_service import ticket_store_service, MissingTicketImageError
+from app.services.anomaly_service import anomaly_service
 from app.config import Config
+from app.utils.helpers import parse_date, requested_version
+from app.repositories.user_scoped import StaleVersionError
 
 expenses_bp = Blueprint('expenses', __name__)
 
+MAX_SEARCH_PER_PAGE = 100
+
 @expenses_bp.route('/expenses', methods=['GET'])
 @jwt_required()
 def get_expenses():
-    """Get all expenses with optional filtering."""
+    """
+    Get the user's expenses, newest first.
+
+    Query params: limit (optional) - page size; the response then carries a
+    ``next_cursor`` to pass back as ``cursor`` for the following page.
+    """
     try:
         user_id = get_jwt_identity()
         limit = request.args.get('limit', type=int)
-        expenses = expense_service.get_all_expenses(user_id, limit)
+        cursor = request.args.get('cursor')
+        next_cursor = None
+        if limit:
+            try:
+                expenses, next_cursor = expense_service.get_expenses_page(user_id, limit, cursor)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+        else:
+            expenses = expense_service.get_all_expenses(user_id, None)
 
-        logging.info(f"Fetched {len(expenses)} expenses successfully.")
+        logging.info("Fetched %s expenses successfully.", len(expenses))
         return jsonify({
             'success': True,
-            'expenses': [expense.to_dict() for expense in expenses]
+            'expenses': [expense.to_dict() for expense in expenses],
+            'next_cursor': next_cursor
         })
     
     except Exception as e:
-        logging.error(f"Error fetching expenses: {str(e)}")
+        logging.error("Error fetching expenses: %s", str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
 
-@expenses_bp.route('/expenses/<string:expense_id>', methods=['GET'])
+@expenses_bp.route('/expenses/<uuid:expense_id>', methods=['GET'])
 @jwt_required()
 def get_expense(expense_id):
     """Get a specific expense by ID."""
     try:
         user_id = get_jwt_identity()
-        expense = expense_service.get_expense_by_id(expense_id)
+        expense = expense_service.get_expense_by_id(user_id, expense_id)
         
         if not expense:
-            logging.info(f"Expense with ID {expense_id} not found.")
+            logging.info("Expense with ID %s not found.", expense_id)
             return jsonify({
                 'success': False,
                 'error': 'Expense not found'
             }), 404
         
-        logging.info(f"Fetched expense with ID {expense_id} successfully.")
+        logging.info("Fetched expense with ID %s successfully.", expense_id)
         return jsonify({
             'success': True,
             'expense': expense.to_dict()
         })
     
     except Exception as e:
-        logging.error(f"Error fetching expense with ID {expense_id}: {str(e)}")
+        logging.error("Error fetching expense with ID %s: %s", expense_id, str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
 
 @expenses_bp.route('/expenses', methods=['POST'])
 @jwt_required()
 def create_expense():
-    """Create a new expense."""
+    """
+    Create a new expense.
+
+    ``file_name`` must be the ticket image of one of the user's OCR jobs (the
+    ``file_name`` of a finished job's draft).
+    """
     try:
         user_id = get_jwt_identity()
         data = request.get_json()
@@ -81,31 +112,61 @@ def create_expense():
         required_fields = ['payment_concept', 'total']
         for field in required_fields:
             if field not in data:
-                logging.info(f"Missing required field for creating an expense: {field}")
+                logging.info("Missing required field for creating an expense: %s", field)
                 return jsonify({
                     'success': False,
                     'error': f'Missing required field: {field}'
                 }), 400
         
-        expense = expense_service.create_expense(data)
+        # Blob names are global: only accept images stored for this user's own tickets
+        if data.get('file_name') and not ocr_job_service.owns_ticket(user_id, data['file_name']):
+            logging.info("Rejected ticket image %s not uploaded by user %s.", data['file_name'], user_id)
+            return jsonify({
+                'success': False,
+                'error': 'Unknown ticket image. Upload it with /expenses/upload-ticket first.'
+            }), 400
+        
+        data['user_id'] = user_id
+        allow_duplicate = request.args.get('allow_duplicate', 'false').lower() == 'true'
+        try:
+            expense = expense_service.create_expense(data, allow_duplicate=allow_duplicate)
+        except DuplicateExpenseError as e:
+            logging.info("Rejected duplicate of expense %s for user %s.", e.existing.id, user_id)
+            return jsonify({
+                'success': False,
+                'error': 'Expense looks like a duplicate. Resend with ?allow_duplicate=true to save it anyway.',
+                'duplicate_of': e.existing.to_dict()
+            }), 409
+        except MissingTicketImageError:
+            logging.info("Rejected expense with expired ticket image %s for user %s.", data['file_name'], user_id)
+            return jsonify({
+                'success': False,
+                'error': 'Ticket image expired. Upload it again with /expenses/upload-ticket.'
+            }), 400
         
-        logging.info(f"Created expense with ID {expense.id} successfully.")
+        logging.info("Created expense with ID %s successfully.", expense.id)
         return jsonify({
             'success': True,
-            'expense': expense.to_dict()
+            'expense': expense.to_dict(),
+            'is_outlier': anomaly_service.is_outlier(expense.anomaly_score)
         }), 201
     
     except Exception as e:
-        logging.error(f"Error creating expense: {str(e)}")
+        logging.error("Error creating expense: %s", str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
 
-@expenses_bp.route('/expenses/<string:expense_id>', methods=['PUT'])
+@expenses_bp.route('/expenses/<uuid:expense_id>', methods=['PUT', 'PATCH'])
 @jwt_required()
 def update_expense(expense_id):
-    """Update an existing expense."""
+    """
+    Partially update an expense.
+
+    Send the ``version`` last read (in the body or an If-Match header) to get a
+    409 instead of overwriting a concurrent edit.
+    """
     try:
         user_id = get_jwt_identity()
         data = request.get_json()
@@ -117,60 +178,74 @@ def update_expense(expense_id):
                 'error': 'No data provided'
             }), 400
         
-        expense = expense_service.update_expense(expense_id, data)
+        try:
+            version = requested_version(data, request.headers.get('If-Match'))
+            expense = expense_service.update_expense(user_id, expense_id, data, version)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        except StaleVersionError as e:
+            logging.info("Conflicting update of expense %s (current version %s).", expense_id, e.current_version)
+            return jsonify({
+                'success': False,
+                'error': 'Expense was modified by another request. Reload it and retry.',
+                'current_version': e.current_version
+            }), 409
         
         if not expense:
-            logging.info(f"Expense with ID {expense_id} not found for update.")
+            logging.info("Expense with ID %s not found for update.", expense_id)
             return jsonify({
                 'success': False,
                 'error': 'Expense not found'
             }), 404
         
-        logging.info(f"Updated expense with ID {expense_id} successfully.")
+        logging.info("Updated expense with ID %s successfully.", expense_id)
         return jsonify({
             'success': True,
             'expense': expense.to_dict()
         })
     
     except Exception as e:
-        logging.error(f"Error updating expense with ID {expense_id}: {str(e)}")
+        logging.error("Error updating expense with ID %s: %s", expense_id, str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
 
-@expenses_bp.route('/expenses/<string:expense_id>', methods=['DELETE'])
+@expenses_bp.route('/expenses/<uuid:expense_id>', methods=['DELETE'])
 @jwt_required()
 def delete_expense(expense_id):
     """Delete an expense."""
     try:
         user_id = get_jwt_identity()
-        success = expense_service.delete_expense(expense_id)
+        success = expense_service.delete_expense(user_id, expense_id)
         
         if not success:
-            logging.info(f"Expense with ID {expense_id} not found for deletion.")
+            logging.info("Expense with ID %s not found for deletion.", expense_id)
             return jsonify({
                 'success': False,
                 'error': 'Expense not found'
             }), 404
         
-        logging.info(f"Deleted expense with ID {expense_id} successfully.")
+        logging.info("Deleted expense with ID %s successfully.", expense_id)
         return jsonify({
             'success': True,
             'message': 'Expense deleted successfully'
         })
     
     except Exception as e:
-        logging.error(f"Error deleting expense with ID {expense_id}: {str(e)}")
+        logging.error("Error deleting expense with ID %s: %s", expense_id, str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
 
 @expenses_bp.route('/expenses/upload-ticket', methods=['POST'])
 @jwt_required()
 def upload_ticket():
-    """Upload and process a ticket image."""
+    """Upload a ticket image and queue it for OCR processing."""
     try:
         user_id = get_jwt_identity()
         if 'file' not in request.files:
@@ -182,51 +257,245 @@ def upload_ticket():
         
         file = request.files['file']
         
-        if file.file_name == '':
+        if file.filename == '':
             logging.info("No file selected for ticket processing.")
             return jsonify({
                 'success': False,
                 'error': 'No file selected'
             }), 400
         
-        if not _allowed_file(file.file_name):
-            logging.info(f"Invalid file type for ticket processing: {file.file_name}")
+        if not _allowed_file(file.filename):
+            logging.info("Invalid file type for ticket processing: %s", file.filename)
+            return jsonify({
+                'success': False,
+                'error': 'Invalid file type. Allowed: jpg, jpeg, png, bmp, tiff, webp'
+            }), 400
+        
+        if _file_size(file) > Config.MAX_TICKET_FILE_SIZE:
+            logging.info("Ticket image too large for processing: %s", file.filename)
+            return jsonify({
+                'success': False,
+                'error': f'File too large. Maximum: {Config.MAX_TICKET_FILE_SIZE} bytes'
+            }), 413
+        
+        # OCR runs in the worker process; the request only stores the image
+        job = ocr_job_service.enqueue(user_id, file)
+        
+        logging.info("Queued ticket image %s as OCR job %s", file.filename, job.id)
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('expenses.get_ticket_job', job_id=job.id),
+            'message': 'ticket queued for processing'
+        }), 202
+    
+    except Exception as e:
+        logging.error("Error queuing ticket image: %s", str(e))
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+@expenses_bp.route('/expenses/upload-tickets', methods=['POST'])
+@jwt_required()
+def upload_tickets():
+    """Upload several ticket images and queue them as one OCR batch."""
+    try:
+        user_id = get_jwt_identity()
+        files = [file for file in request.files.getlist('files') if file.filename]
+        
+        if not files:
+            logging.info("No files uploaded for batch ticket processing.")
+            return jsonify({
+                'success': False,
+                'error': 'No files uploaded'
+            }), 400
+        
+        if len(files) > Config.OCR_MAX_FILES_PER_UPLOAD:
+            logging.info("Too many files uploaded for batch ticket processing: %s", len(files))
             return jsonify({
                 'success': False,
-                'error': 'Invalid file type. Allowed: jpg, jpeg, png, bmp, tiff'
+                'error': f'Too many files. Maximum: {Config.OCR_MAX_FILES_PER_UPLOAD}'
             }), 400
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.file_name)[1]) as tmp_file:
-            file.save(tmp_file.name)
-            
-            # Process the ticket
-            expense_data = expense_service.process_ticket_image(tmp_file.name)
-            
-            # Clean up temporary file
-            os.unlink(tmp_file.name)
-        
-        logging.info(f"Processed ticket image successfully: {file.file_name}")
+        invalid = [file.filename for file in files if not _allowed_file(file.filename)]
+        if invalid:
+            logging.info("Invalid file types for batch ticket processing: %s", invalid)
+            return jsonify({
+                'success': False,
+                'error': f'Invalid file type: {", ".join(invalid)}. Allowed: jpg, jpeg, png, bmp, tiff, webp'
+            }), 400
+        
+        too_large = [file.filename for file in files if _file_size(file) > Config.MAX_TICKET_FILE_SIZE]
+        if too_large:
+            logging.info("Ticket images too large for batch processing: %s", too_large)
+            return jsonify({
+                'success': False,
+                'error': f'File too large: {", ".join(too_large)}. Maximum: {Config.MAX_TICKET_FILE_SIZE} bytes'
+            }), 413
+        
+        jobs = ocr_job_service.enqueue_batch(user_id, files)
+        batch_id = jobs[0].batch_id
+        
+        logging.info("Queued %s ticket images as OCR batch %s", len(jobs), batch_id)
+        return jsonify({
+            'success': True,
+            'batch_id': batch_id,
+            'job_ids': [job.id for job in jobs],
+            'status_url': url_for('expenses.get_ticket_batch', batch_id=batch_id) if batch_id
+                else url_for('expenses.get_ticket_job', job_id=jobs[0].id),
+            'message': 'tickets queued for processing'
+        }), 202
+    
+    except Exception as e:
+        logging.error("Error queuing ticket images: %s", str(e))
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+@expenses_bp.route('/expenses/jobs/batch/<uuid:batch_id>', methods=['GET'])
+@jwt_required()
+def get_ticket_batch(batch_id):
+    """Get the status of every job in an OCR batch and the drafts extracted so far."""
+    try:
+        user_id = get_jwt_identity()
+        jobs = ocr_job_service.get_batch(user_id, batch_id)
+        
+        if not jobs:
+            logging.info("OCR batch %s not found.", batch_id)
+            return jsonify({
+                'success': False,
+                'error': 'Batch not found'
+            }), 404
+        
+        job_dicts = [job.to_dict() for job in jobs]
+        pending = sum(1 for job in jobs if job.status in (OcrJob.STATUS_QUEUED, OcrJob.STATUS_PROCESSING))
         return jsonify({
             'success': True,
-            'extracted_data': expense_data,
-            'message': 'ticket processed successfully'
+            'batch_id': batch_id,
+            'completed': pending == 0,
+            'jobs': job_dicts,
+            'drafts': [job['result'] for job in job_dicts if job['status'] == OcrJob.STATUS_DONE]
         })
     
     except Exception as e:
-        logging.error(f"Error processing ticket image: {str(e)}")
+        logging.error("Error fetching OCR batch %s: %s", batch_id, str(e))
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+@expenses_bp.route('/expenses/jobs/<uuid:job_id>', methods=['GET'])
+@jwt_required()
+def get_ticket_job(job_id):
+    """Get the status and, once done, the extracted data of an OCR job."""
+    try:
+        user_id = get_jwt_identity()
+        job = ocr_job_service.get_job(user_id, job_id)
+        
+        if not job:
+            logging.info("OCR job %s not found.", job_id)
+            return jsonify({
+                'success': False,
+                'error': 'Job not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'job': job.to_dict()
+        })
+    
+    except Exception as e:
+        logging.error("Error fetching OCR job %s: %s", job_id, str(e))
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+@expenses_bp.route('/expenses/search', methods=['GET'])
+@jwt_required()
+def search_expenses():
+    """
+    Full-text search of the current user's expenses.
+
+    Query params:
+        q: words to find in concept, note or category (all must match, as prefixes)
+        page: page number (default 1)
+        per_page: results per page (default 20, max 100)
+    """
+    try:
+        user_id = get_jwt_identity()
+        query = request.args.get('q', '').strip()
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+
+        if not query:
+            return jsonify({
+                'success': False,
+                'error': 'Missing search query: q'
+            }), 400
+        if page < 1 or not 1 <= per_page <= MAX_SEARCH_PER_PAGE:
+            return jsonify({
+                'success': False,
+                'error': f'page must be >= 1 and per_page between 1 and {MAX_SEARCH_PER_PAGE}'
+            }), 400
+
+        found = expense_service.search_expenses(user_id, query, page, per_page)
+
+        logging.info("Search returned %s of %s expenses for user %s.", len(found['results']), found['total'], user_id)
+        return jsonify({
+            'success': True,
+            'expenses': [
+                {**expense.to_dict(), 'score': score}
+                for expense, score in found['results']
+            ],
+            'page': page,
+            'per_page': per_page,
+            'total': found['total'],
+            'pages': -(-found['total'] // per_page)
+        })
+
+    except Exception as e:
+        logging.error("Error searching expenses: %s", str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
 
 @expenses_bp.route('/expenses/statistics', methods=['GET'])
 @jwt_required()
 def get_statistics():
-    """Get expense statistics."""
+    """Get expense statistics for the current user, optionally within a date range."""
     try:
         user_id = get_jwt_identity()
-        stats = expense_service.get_expense_statistics()
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        percentiles = request.args.get('percentiles')
+
+        start_date = parse_date(start_date) if start_date else None
+        end_date = parse_date(end_date) if end_date else None
+        if (request.args.get('start_date') and not start_date) or (request.args.get('end_date') and not end_date):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid date format'
+            }), 400
+
+        try:
+            percentiles = [float(p) for p in percentiles.split(',')] if percentiles else None
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'percentiles must be numbers, e.g. percentiles=50,90,99'
+            }), 400
+        if percentiles and not all(0 <= p <= 100 for p in percentiles):
+            return jsonify({
+                'success': False,
+                'error': 'percentiles must be a comma-separated list of numbers between 0 and 100'
+            }), 400
+
+        stats = expense_service.get_expense_statistics(user_id, start_date, end_date, percentiles)
         
         return jsonify({
             'success': True,
@@ -234,65 +503,92 @@ def get_statistics():
         })
     
     except Exception as e:
+        logging.error("Error computing expense statistics: %s", str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
     
 
 @expenses_bp.route("/file/ticket/<uuid:expense_id>", methods=['GET'])
 @jwt_required()
 def get_file(expense_id: uuid.UUID) -> str:
-    """Get the full file path for an uploaded file."""
+    """
+    Send the ticket image of an expense.
+
+    Query params: size (optional) - thumbnail size in px, one of TICKET_THUMBNAIL_SIZES;
+    omitted or 'full' for the full image.
+    """
     try:
         user_id = get_jwt_identity()   
-        expense = expense_service.get_expense_by_id(expense_id)
+        size = request.args.get('size', 'full')
+        if size != 'full':
+            if not size.isdigit() or int(size) not in Config.TICKET_THUMBNAIL_SIZES:
+                return jsonify({
+                    'success': False,
+                    'error': f"size must be 'full' or one of: {', '.join(str(s) for s in Config.TICKET_THUMBNAIL_SIZES)}"
+                }), 400
+            size = int(size)
+        else:
+            size = None
+
+        # Scoped to the user: another user's expense is reported as not found
+        expense = expense_service.get_expense_by_id(user_id, expense_id)
         if not expense or not expense.file_name:
-            logging.info(f"File for expense ID {expense_id} not found.")
+            logging.info("File for expense ID %s not found for user %s.", expense_id, user_id)
             return jsonify({
                 'success': False,
                 'error': 'File not found'
             }), 404
         
-        if user_id != expense.user_id:
-            logging.info(f"Unauthorized access attempt by user {user_id} for expense ID {expense_id}.")
+        file_path = ticket_store_service.resolve_path(user_id, expense.file_name, size)
+        if not os.path.exists(file_path):
+            logging.warning("Ticket image missing on disk for expense ID %s: %s", expense_id, file_path)
             return jsonify({
                 'success': False,
-                'error': 'Unauthorized access'
-            }), 403
-        
-        files_path = os.path.join(Config.FILE_FOLDER, user_id)
-        user_file = os.path.join(files_path, expense.file_name)
-        file_rel_path = os.path.abspath(user_file)
-
-        print(os.path.abspath(os.path.join(Config.FILE_FOLDER, expense.file_name)))
+                'error': 'File not found'
+            }), 404
 
-        return_file = send_file(file_rel_path)
-        logging.info(f"Retrieved file path successfully: {expense.file_name}")
+        # Blob names are content hashes, so they make stable ETags
+        etag = os.path.basename(file_path) if ticket_store_service.is_blob_name(expense.file_name) else None
+        return_file = _send_ticket_file(file_path, etag)
+        logging.info("Retrieved file path successfully: %s", expense.file_name)
         return return_file
     except Exception as e:
-        logging.error(f"Error retrieving file: {str(e)}")
+        logging.error("Error retrieving file: %s", str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
     
 @expenses_bp.route("/expenses/monthly", methods=['GET'])
 @jwt_required()
 def get_monthly_expenses():
-    """Get total expense amounts grouped by month for the current user."""
+    """Get current period totals compared to previous periods (week, month, quarter or year)."""
     try:
         user_id = get_jwt_identity()
-        monthly_expenses = expense_service.get_monthly_expenses(user_id)
+        period = request.args.get('period', 'month')
+        periods = request.args.get('periods', 2, type=int)
+        trend_window = request.args.get('trend_window', type=int)
+
+        error = period_service.validate_period_args(period, periods, trend_window)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+
+        monthly_expenses = expense_service.get_monthly_expenses(user_id, period, periods, trend_window)
         
         return jsonify({
             'success': True,
             'monthly_expenses': monthly_expenses
         })
     except Exception as e:
+        logging.error("Error fetching monthly expenses: %s", str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
 
 def _allowed_file(file_name):
@@ -300,3 +596,34 @@ def _allowed_file(file_name):
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'tiff', 'webp'}
     return '.' in file_name and \
             file_name.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def _file_size(file):
+    """Size in bytes of an uploaded file, leaving the stream at the start."""
+    file.stream.seek(0, os.SEEK_END)
+    size = file.stream.tell()
+    file.stream.seek(0)
+    return size
+
+def _send_ticket_file(file_path: str, etag: str = None):
+    """Send a ticket image as a private, cacheable response, offloading to the web server if configured."""
+    if Config.X_ACCEL_REDIRECT_PREFIX:
+        relative_path = os.path.relpath(file_path, os.path.abspath(Config.FILE_FOLDER)).replace(os.sep, '/')
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = f"{Config.X_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{relative_path}"
+        response.mimetype = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        response.set_etag(etag or f"{os.path.getmtime(file_path)}-{os.path.getsize(file_path)}")
+        response.cache_control.max_age = Config.TICKET_CACHE_MAX_AGE
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            # Nothing for the web server to send
+            del response.headers['X-Accel-Redirect']
+    else:
+        # X-Sendfile is handled by send_file when USE_X_SENDFILE is set
+        response = send_file(file_path, etag=etag or True, max_age=Config.TICKET_CACHE_MAX_AGE, conditional=True)
+
+    # Receipts are per-user: browsers may cache them, shared caches may not
+    response.cache_control.public = False
+    response.cache_control.private = True
+    if etag:
+        response.cache_control.immutable = True
+    return response
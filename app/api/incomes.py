@@ -2,74 +2,150 @@ import logging
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from app.services.income_service import income_service
+from app.services.period_service import period_service
+from app.repositories.user_scoped import StaleVersionError
+from app.utils.helpers import requested_version
 
 incomes_bp = Blueprint('incomes', __name__)
 
 @incomes_bp.route('/incomes', methods=['GET'])
 @jwt_required()
 def get_incomes():
-    """Get all incomes with optional filtering."""
+    """Get the user's incomes, newest first; with ``limit``, paged by ``cursor``/``next_cursor``."""
     try:
         user_id = get_jwt_identity()
         limit = request.args.get('limit', type=int)
-        
-        incomes = income_service.get_all_incomes(limit)
+        cursor = request.args.get('cursor')
+        next_cursor = None
+        if limit:
+            try:
+                incomes, next_cursor = income_service.get_incomes_page(user_id, limit, cursor)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+        else:
+            incomes = income_service.get_incomes_by_user_id(user_id)
 
-        logging.info(f"Fetched {len(incomes)} incomes successfully.")
+        logging.info("Fetched %s incomes successfully.", len(incomes))
         return jsonify({
             'success': True,
-            'incomes': [income.to_dict() for income in incomes]
+            'incomes': [income.to_dict() for income in incomes],
+            'next_cursor': next_cursor
         })
     
     except Exception as e:
-        logging.error(f"Error fetching incomes: {str(e)}")
+        logging.error("Error fetching incomes: %s", str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
 
 @incomes_bp.route("/incomes/monthly", methods=['GET'])
 @jwt_required()
 def get_monthly_incomes():
-    """Get total income amounts grouped by month for the current user."""
+    """Get current period totals compared to previous periods (week, month, quarter or year)."""
     try:
         user_id = get_jwt_identity()
-        monthly_incomes = income_service.get_monthly_incomes(user_id)
+        period = request.args.get('period', 'month')
+        periods = request.args.get('periods', 2, type=int)
+        trend_window = request.args.get('trend_window', type=int)
+
+        error = period_service.validate_period_args(period, periods, trend_window)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+
+        monthly_incomes = income_service.get_monthly_incomes(user_id, period, periods, trend_window)
         
         return jsonify({
             'success': True,
             'monthly_incomes': monthly_incomes
         })
     except Exception as e:
+        logging.error("Error fetching monthly incomes: %s", str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
     
-@incomes_bp.route('/incomes/<string:income_id>', methods=['DELETE'])
+@incomes_bp.route('/incomes/<uuid:income_id>', methods=['PUT', 'PATCH'])
+@jwt_required()
+def update_income(income_id):
+    """Partially update an income; a stale ``version`` (body or If-Match) answers 409."""
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json()
+
+        if not data:
+            return jsonify({
+                'success': False,
+                'error': 'No data provided'
+            }), 400
+
+        try:
+            version = requested_version(data, request.headers.get('If-Match'))
+            income = income_service.update_income(user_id, income_id, data, version)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        except StaleVersionError as e:
+            logging.info("Conflicting update of income %s (current version %s).", income_id, e.current_version)
+            return jsonify({
+                'success': False,
+                'error': 'Income was modified by another request. Reload it and retry.',
+                'current_version': e.current_version
+            }), 409
+
+        if not income:
+            logging.info("Income with ID %s not found for update.", income_id)
+            return jsonify({
+                'success': False,
+                'error': 'Income not found'
+            }), 404
+
+        logging.info("Updated income with ID %s successfully.", income_id)
+        return jsonify({
+            'success': True,
+            'income': income.to_dict()
+        })
+
+    except Exception as e:
+        logging.error("Error updating income with ID %s: %s", income_id, str(e))
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+@incomes_bp.route('/incomes/<uuid:income_id>', methods=['DELETE'])
 @jwt_required()
 def delete_income(income_id):
     """Delete an income."""
     try:
         user_id = get_jwt_identity()
         
-        success = income_service.delete_income(income_id)
+        success = income_service.delete_income(user_id, income_id)
         if not success:
-            logging.info(f"Income with ID {income_id} not found for deletion.")
+            logging.info("Income with ID %s not found for deletion.", income_id)
             return jsonify({
                 'success': False,
                 'error': 'Income not found'
             }), 404
         
-        logging.info(f"Deleted income with ID {income_id} successfully.")
+        logging.info("Deleted income with ID %s successfully.", income_id)
         return jsonify({
             'success': True,
             'message': 'Income deleted successfully'
         })
     
     except Exception as e:
-        logging.error(f"Error deleting income with ID {income_id}: {str(e)}")
+        logging.error("Error deleting income with ID %s: %s", income_id, str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
\ No newline at end of file
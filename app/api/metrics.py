@@ -0,0 +1,36 @@
+"""
+API route exposing request metrics in Prometheus text format.
+"""
+import hmac
+import logging
+from flask import Blueprint, Response, jsonify, request
+from app.config import Config
+from app.utils.metrics import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Expose collected metrics for Prometheus scraping.
+
+    With METRICS_TOKEN set, scrapers must send ``Authorization: Bearer <token>``;
+    without it only clients on the loopback interface are answered.
+    """
+    if Config.METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode('utf-8'), Config.METRICS_TOKEN.encode('utf-8')):
+            logging.warning("Rejected /metrics request without a valid token from %s", request.remote_addr)
+            return jsonify({
+                'success': False,
+                'error': 'Unauthorized'
+            }), 401
+    elif request.remote_addr not in LOOPBACK_ADDRESSES:
+        logging.warning("Rejected /metrics request from non-loopback address %s", request.remote_addr)
+        return jsonify({
+            'success': False,
+            'error': 'Forbidden'
+        }), 403
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,102 @@
+"""
+API routes for managing recurring incomes and expenses.
+"""
+import logging
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from app.services.recurring_service import recurring_service
+
+recurring_bp = Blueprint('recurring', __name__)
+
+@recurring_bp.route('/recurring', methods=['GET'])
+@jwt_required()
+def get_recurring_rules():
+    """Get the current user's recurring rules; ?all=true includes stopped ones."""
+    try:
+        user_id = get_jwt_identity()
+        active_only = request.args.get('all', 'false').lower() != 'true'
+        rules = recurring_service.get_rules(user_id, active_only)
+
+        logging.info("Fetched %s recurring rules successfully.", len(rules))
+        return jsonify({
+            'success': True,
+            'rules': [rule.to_dict() for rule in rules]
+        })
+
+    except Exception as e:
+        logging.error("Error fetching recurring rules: %s", str(e))
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+@recurring_bp.route('/recurring', methods=['POST'])
+@jwt_required()
+def create_recurring_rule():
+    """
+    Create a recurring income or expense.
+
+    Body: kind ('income'|'expense'), name, amount, frequency ('daily'|'weekly'|'monthly'|'yearly'),
+    optional interval, start_date, end_date, category (expenses) and description.
+    Occurrences already due are booked right away.
+    """
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json()
+
+        if not data:
+            logging.info("No data provided for creating a recurring rule.")
+            return jsonify({
+                'success': False,
+                'error': 'No data provided'
+            }), 400
+
+        error = recurring_service.validate_rule_data(data)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+
+        rule = recurring_service.create_rule(user_id, data)
+        booked = recurring_service.run_due(user_id=user_id)
+
+        logging.info("Created recurring rule %s, booked %s occurrences.", rule.id, booked)
+        return jsonify({
+            'success': True,
+            'rule': rule.to_dict(),
+            'booked': booked
+        }), 201
+
+    except Exception as e:
+        logging.error("Error creating recurring rule: %s", str(e))
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+@recurring_bp.route('/recurring/<uuid:rule_id>', methods=['DELETE'])
+@jwt_required()
+def stop_recurring_rule(rule_id):
+    """Stop a recurring rule. Incomes and expenses already booked are kept."""
+    try:
+        user_id = get_jwt_identity()
+        if not recurring_service.deactivate_rule(user_id, rule_id):
+            logging.info("Recurring rule %s not found.", rule_id)
+            return jsonify({
+                'success': False,
+                'error': 'Recurring rule not found'
+            }), 404
+
+        logging.info("Stopped recurring rule %s successfully.", rule_id)
+        return jsonify({
+            'success': True,
+            'message': 'Recurring rule stopped'
+        })
+
+    except Exception as e:
+        logging.error("Error stopping recurring rule %s: %s", rule_id, str(e))
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
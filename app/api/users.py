@@ -1,18 +1,18 @@
 import logging
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import get_jwt_identity, jwt_required, create_access_token
-from app.utils import to_datetime
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
 from app.services.user_service import user_service
-from datetime import datetime, timedelta, timezone
-import os
+from app.services.token_service import token_service
+from app.services.link_token_service import link_token_service
 
-from app.utils.helpers import utc_now
+from app.utils.helpers import mask_sensitive_data
+from app.utils.passwords import PasswordHasherBusy
+from app.utils.rate_limit import rate_limit
 
 users_bp = Blueprint('user', __name__)
 
-TOKEN_EXPIRATION_MINUTES = int(os.getenv('TOKEN_EXPIRATION_MINUTES', '15')) 
-
 @users_bp.route("/signup", methods=["POST"])
+@rate_limit("signup")
 def signup():
     """Register a new user."""
     try:
@@ -21,34 +21,23 @@ def signup():
         email = data.get("email")
         password = data.get("password")
 
-        user = user_service.get_user_by_token(token)
-        if not user:
-            logging.info(f"Failed account linking attempt with invalid token: {token}")
+        link_token = link_token_service.get(token)
+        if not link_token:
+            logging.info("Failed account linking attempt with invalid token")
             return jsonify({
                     'success': False,
                     'error': 'User not found'
                 }), 404
+        user = link_token.user
         if user.is_linked:
-            logging.info(f"Attempt to link already linked user: {user.id}")
+            logging.info("Attempt to link already linked user: %s", user.id)
             return jsonify({
                 'success': False,
                 "error": "User already linked"
             }), 400
-        
-        now = utc_now()
-        vinculation_token_created = to_datetime(user.vinculation_token_created)
-        if not vinculation_token_created:
-            logging.info(f"Token creation date not found for User {user.id}")
-            return jsonify({
-                "success": False,
-                "error": "Invalid token"
-            }), 400
-            
-        time_difference = now - vinculation_token_created
-        expiration_time = timedelta(minutes=TOKEN_EXPIRATION_MINUTES)
-        
-        if time_difference > expiration_time:
-            logging.info(f"Token expired for User {user.id}. Created: {vinculation_token_created}, Expired after: {TOKEN_EXPIRATION_MINUTES} minutes")
+
+        if link_token.is_expired():
+            logging.info("Token expired for User %s. Expired at: %s", user.id, link_token.expires_at)
             return jsonify({
                 "success": False,
                 "error": "Token expired"
@@ -57,27 +46,33 @@ def signup():
         user.email = email
         user.set_password(password)
         user.is_linked = True
-        user.vinculation_token = None
-        user.vinculation_token_created = None
+        # Committed together with the user update below
+        link_token_service.discard(user.id)
         user_service.update_user(user.id, {
             "email": user.email,
             "password": user.password,
-            "is_linked": user.is_linked,
-            "vinculation_token": user.vinculation_token
+            "is_linked": user.is_linked
         })
-        logging.info(f"User {user.id} linked their account successfully.")
+        logging.info("User %s linked their account successfully.", user.id)
         return jsonify({
             "success": True,
             "message": "Account linked successfully",
         })
+    except PasswordHasherBusy:
+        logging.warning("Password hashing saturated, rejecting %s", request.path)
+        return jsonify({
+            'success': False,
+            'error': 'Server busy, try again later'
+        }), 503, {'Retry-After': '1'}
     except Exception as e:
-        logging.error(f"Error linking account: {str(e)}")
+        logging.error("Error linking account: %s", str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
 
 @users_bp.route("/login", methods=["POST"])
+@rate_limit("login")
 def login():
     """Authenticate user with email and password."""
     try:
@@ -86,74 +81,72 @@ def login():
         password = data.get("password")
 
         if not all([email, password]):
-            logging.info(f"Login attempt with missing credentials: email={email}, password={'***' if password else None}")
+            logging.info("Login attempt with missing credentials: email=%s, password=%s", email, '***' if password else None)
             return jsonify({
                 'success': False,
                 'error': 'Email and password are required'
             }), 400
-        logging.info(f"request data: {data}")
+        logging.debug("request data: %s", mask_sensitive_data(data))
 
         user = user_service.get_user_by_email(email)
         if not user or not user.check_password(password):
-            logging.info(f"Failed login attempt for email: {email}")
+            logging.info("Failed login attempt for email: %s", email)
             return jsonify({
                 'success': False,
                 'error': 'Invalid email or password'
             }), 401
-        logging.info(f"User found with: {user}")
+        logging.debug("User found with: %s", user)
+
+        if user.password_needs_rehash():
+            user.set_password(password)
+            user_service.update_user(user.id, {"password": user.password})
+            logging.info("Password hash upgraded for User %s", user.id)
 
         if not user.is_linked:
-            logging.info(f"Login attempt for unlinked account: User {user.id}")
+            logging.info("Login attempt for unlinked account: User %s", user.id)
             return jsonify({
                 'success': False,
                 'error': 'Account not linked.'
             }), 401
         
-        access_token = create_access_token(identity=user.id)
-        logging.info(f"User {user.id} Email {email} logged in successfully.")
+        tokens = token_service.issue_tokens(user)
+        logging.info("User %s Email %s logged in successfully.", user.id, email)
         return jsonify({
             'success': True,
             'message': 'Login successful',
             'user': {
                 'id': user.id,
             },
-            'access_token': access_token
+            **tokens
         })
 
+    except PasswordHasherBusy:
+        logging.warning("Password hashing saturated, rejecting %s", request.path)
+        return jsonify({
+            'success': False,
+            'error': 'Server busy, try again later'
+        }), 503, {'Retry-After': '1'}
     except Exception as e:
-        logging.error(f"Error during login: {str(e)}")
+        logging.error("Error during login: %s", str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
 
 @users_bp.route("/refresh", methods=["POST"])
-@jwt_required()
+@jwt_required(refresh=True)
 def refresh():
-    """Refresh access token."""
+    """
+    Exchange a refresh token for a new access token.
+
+    Revoked refresh tokens are rejected by the JWT blocklist check against the
+    in-memory token version cache, so the common case never reads the database.
+    """
     try:
         user_id = get_jwt_identity()
-        
-        # Verify user still exists and is active
-        user = user_service.get_user_by_id(user_id)
-        if not user:
-            logging.info(f"Token refresh attempt for non-existent user: {user_id}")
-            return jsonify({
-                'success': False,
-                'error': 'User not found'
-            }), 404
-        
-        if not user.is_linked:
-            logging.info(f"Token refresh attempt for unlinked account: {user_id}")
-            return jsonify({
-                'success': False,
-                'error': 'Account not linked'
-            }), 401
-        
-        # Create new access token
-        new_access_token = create_access_token(identity=user_id)
-        
-        logging.info(f"Token refreshed successfully for user: {user_id}")
+        new_access_token = token_service.refresh_access_token(get_jwt())
+
+        logging.info("Token refreshed successfully for user: %s", user_id)
         return jsonify({
             'success': True,
             'message': 'Token refreshed successfully',
@@ -161,13 +154,34 @@ def refresh():
         })
     
     except Exception as e:
-        logging.error(f"Error refreshing token: {str(e)}")
+        logging.error("Error refreshing token: %s", str(e))
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+@users_bp.route("/logout", methods=["POST"])
+@jwt_required(refresh=True)
+def logout():
+    """Revoke every access and refresh token of the user."""
+    try:
+        user_id = get_jwt_identity()
+        token_service.revoke_user_tokens(user_id)
+        logging.info("User %s logged out.", user_id)
+        return jsonify({
+            'success': True,
+            'message': 'Logged out successfully'
+        })
+
+    except Exception as e:
+        logging.error("Error during logout: %s", str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
 
 @users_bp.route("/change-password", methods=["POST"]) 
+@rate_limit("change-password")
 @jwt_required()
 def change_password():
     """Change user password."""
@@ -184,8 +198,9 @@ def change_password():
                 'error': 'Email, current password and new password are required'
             }), 400
 
+        # Only the token's own account can be changed
         user = user_service.get_user_by_email(email)
-        if not user:
+        if not user or user.id != user_id:
             return jsonify({
                 'success': False,
                 'error': 'User not found'
@@ -199,15 +214,25 @@ def change_password():
 
         user.set_password(new_password)
         user_service.update_user(user.id, {"password": user.password})
+        # Sign out other sessions; this one continues with fresh tokens
+        token_service.revoke_user_tokens(user.id)
 
         return jsonify({
             'success': True,
             'message': 'Password changed successfully',
+            **token_service.issue_tokens(user)
         })
 
+    except PasswordHasherBusy:
+        logging.warning("Password hashing saturated, rejecting %s", request.path)
+        return jsonify({
+            'success': False,
+            'error': 'Server busy, try again later'
+        }), 503, {'Retry-After': '1'}
     except Exception as e:
+        logging.error("Error changing password: %s", str(e))
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Internal server error'
         }), 500
 
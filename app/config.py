@@ -4,21 +4,92 @@ Configuration settings for the Expense Management App.
 
 import logging
 import os
+from datetime import timedelta
 from dotenv import load_dotenv
 load_dotenv()
 class Config:
 
     """Base configuration class."""
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Database: MySQL via DATABASE_URL. Development falls back to an embedded
+    # SQLite file; relative SQLite paths are resolved inside the Flask instance folder.
+    SQLITE_PATH = os.getenv('SQLITE_PATH', 'expenses.db')
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
     
+    # Dashboard sessions: short-lived access tokens renewed with a long-lived refresh token.
+    # Revoked token versions are cached in memory and re-read this often.
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', 15)))
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', 30)))
+    TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv('TOKEN_REVOCATION_SYNC_SECONDS', 60))
+
+    # Account-linking tokens sent by the bot's /link command expire after this
+    TOKEN_EXPIRATION_MINUTES = int(os.getenv('TOKEN_EXPIRATION_MINUTES', 15))
+
+    # Password hashing: PBKDF2 iterations are calibrated at startup to take about
+    # PASSWORD_HASH_TARGET_MS, unless pinned with PASSWORD_HASH_ITERATIONS
+    PASSWORD_HASH_TARGET_MS = float(os.getenv('PASSWORD_HASH_TARGET_MS', 250))
+    PASSWORD_HASH_MIN_ITERATIONS = int(os.getenv('PASSWORD_HASH_MIN_ITERATIONS', 100000))
+    PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', 0))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))
+    PASSWORD_HASH_TIMEOUT_SECONDS = float(os.getenv('PASSWORD_HASH_TIMEOUT_SECONDS', 10))
+
+    # Throttling of /login, /signup and /change-password: "<requests>/<seconds>"
+    # per client IP and per email. Counters are kept in memory unless
+    # RATE_LIMIT_STORAGE_URL points to a Redis-compatible server.
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_STORAGE_URL = os.getenv('RATE_LIMIT_STORAGE_URL', '')
+    AUTH_RATE_LIMIT_IP = os.getenv('AUTH_RATE_LIMIT_IP', '20/60')
+    AUTH_RATE_LIMIT_EMAIL = os.getenv('AUTH_RATE_LIMIT_EMAIL', '5/60')
+
     # Telegram Bot
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 
     # Upload settings
     FILE_FOLDER = os.getenv('FILE_FOLDER', os.path.join('files', 'tickets'))
-    MAX_CONTENT_LENGTH = os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024)  # 16 MB
+    MAX_TICKET_FILE_SIZE = int(os.getenv('MAX_TICKET_FILE_SIZE', 5 * 1024 * 1024))  # 5 MB per image
     logging.info("Upload folder set to: %s", FILE_FOLDER)
+    # Unreferenced ticket images are kept this long before garbage collection
+    TICKET_GC_GRACE_SECONDS = int(os.getenv('TICKET_GC_GRACE_SECONDS', 24 * 60 * 60))
+    TICKET_GC_INTERVAL_SECONDS = int(os.getenv('TICKET_GC_INTERVAL_SECONDS', 60 * 60))
+    # Ticket images are transcoded to WebP with thumbnails of these sizes (px)
+    TICKET_WEBP_QUALITY = int(os.getenv('TICKET_WEBP_QUALITY', 80))
+    TICKET_THUMBNAIL_SIZES = [int(size) for size in os.getenv('TICKET_THUMBNAIL_SIZES', '256,512,1024').split(',') if size.strip()]
+    TICKET_CACHE_MAX_AGE = int(os.getenv('TICKET_CACHE_MAX_AGE', 365 * 24 * 60 * 60))
+    # Let the front web server send ticket files: Apache/lighttpd X-Sendfile, or
+    # nginx X-Accel-Redirect to an internal location aliased to FILE_FOLDER
+    USE_X_SENDFILE = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'
+    X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '')
+
+    # Queued ticket OCR
+    OCR_JOB_FOLDER = os.getenv('OCR_JOB_FOLDER', os.path.join('files', 'pending'))
+    OCR_WORKER_POLL_SECONDS = float(os.getenv('OCR_WORKER_POLL_SECONDS', 1.0))
+    OCR_BATCH_SIZE = int(os.getenv('OCR_BATCH_SIZE', 8))
+    OCR_MAX_FILES_PER_UPLOAD = int(os.getenv('OCR_MAX_FILES_PER_UPLOAD', 20))
+    # Whole request body: a full batch of images plus room for the multipart framing
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', MAX_TICKET_FILE_SIZE * OCR_MAX_FILES_PER_UPLOAD + 64 * 1024))
+    OCR_JOB_TIMEOUT_SECONDS = int(os.getenv('OCR_JOB_TIMEOUT_SECONDS', 300))
+    OCR_JOB_MAX_ATTEMPTS = int(os.getenv('OCR_JOB_MAX_ATTEMPTS', 3))  # Claims before a stuck job is failed
+    OCR_REQUEUE_INTERVAL_SECONDS = float(os.getenv('OCR_REQUEUE_INTERVAL_SECONDS', 60))
     
+    # Recurring incomes and expenses
+    RECURRING_POLL_SECONDS = float(os.getenv('RECURRING_POLL_SECONDS', 15 * 60))
+    RECURRING_BATCH_SIZE = int(os.getenv('RECURRING_BATCH_SIZE', 200))
+
+    # Unusual expenses: flagged this many standard deviations above the category mean
+    ANOMALY_Z_THRESHOLD = float(os.getenv('ANOMALY_Z_THRESHOLD', 3.0))
+    ANOMALY_MIN_SAMPLES = int(os.getenv('ANOMALY_MIN_SAMPLES', 5))
+
+    # Instrumentation
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    # Directory where each process publishes its metrics so /metrics can sum
+    # them across gunicorn workers; empty keeps metrics per process
+    METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')
+    METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 1.0))
+    # Bearer token required by /metrics; without one only loopback clients may scrape
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
     # OCR Settings
     OCR_LANGUAGES = ['es', 'en']  # Spanish and English support
 
@@ -30,17 +101,23 @@ class Config:
 class DevelopmentConfig(Config):
     """Development configuration."""
     DEBUG = True
-    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', f'sqlite:///{Config.SQLITE_PATH}')
 
 class ProductionConfig(Config):
     """Production configuration."""
     DEBUG = False
-    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
+
+    @staticmethod
+    def init_app(app):
+        # Never fall back to an empty local database because the variable is missing
+        if not app.config.get('SQLALCHEMY_DATABASE_URI'):
+            raise RuntimeError("DATABASE_URL must be set in production (use sqlite:///expenses.db for SQLite).")
 
 class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
+    # In-memory SQLite by default so tests and benchmarks run offline
+    SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', 'sqlite://')
     WTF_CSRF_ENABLED = False
 
 config = {
@@ -4,5 +4,10 @@ from .expense import Expense
 from .store_category import StoreCategory
 from .income import Income
 from .budget import Budget
+from .ocr_job import OcrJob
+from .ticket_blob import TicketBlob
+from .recurring_rule import RecurringRule
+from .category_stat import CategoryStat
+from .link_token import LinkToken
 
-__all__ = ['User', 'Expense', 'StoreCategory', 'Income', 'Budget']
\ No newline at end of file
+__all__ = ['User', 'Expense', 'StoreCategory', 'Income', 'Budget', 'OcrJob', 'TicketBlob', 'RecurringRule', 'CategoryStat', 'LinkToken']
\ No newline at end of file
@@ -2,23 +2,24 @@
 Budget model for managing user budgets in different categories.
 """
 
-import uuid
 from app.extensions import db
-from datetime import date, datetime
-from sqlalchemy import Column, DateTime, Float, String, Date, ForeignKey, Integer
+from app.utils.gen_uuid import GUID, new_id
+from app.utils.timestamps import created_at_column, updated_at_column
+from datetime import date
+from sqlalchemy import Column, Float, String, Date, ForeignKey, Integer
 from sqlalchemy.orm import relationship
 
 class Budget(db.Model):
     __tablename__ = 'budgets'
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String(36), ForeignKey('users.id'), nullable=False)
+    id = Column(GUID(), primary_key=True, default=new_id)
+    user_id = Column(GUID(), ForeignKey('users.id'), nullable=False)
     category = Column(String(50), nullable=False)
     month = Column(Integer, nullable=False)  # 1-12
     year = Column(Integer, nullable=False)
     budget_amount = Column(Float, nullable=False)
-    created_at = Column(DateTime, default=datetime.today())
-    updated_at = Column(DateTime, default=datetime.today(), onupdate=datetime.today())
+    created_at = created_at_column()
+    updated_at = updated_at_column()
 
     user = relationship("User", back_populates="budgets")
     
@@ -45,7 +46,5 @@ class Budget(db.Model):
             category=data.get('category'),
             month=data.get('month'),
             year=data.get('year'),
-            budget_amount=data.get('budget_amount'),
-            created_at=data.get('created_at', datetime.today()),
-            updated_at=data.get('updated_at', datetime.today())
+            budget_amount=data.get('budget_amount')
         )
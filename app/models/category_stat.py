@@ -0,0 +1,38 @@
+"""
+CategoryStat model for running per-category expense statistics.
+"""
+from app.extensions import db
+from app.utils.gen_uuid import GUID
+from app.utils.timestamps import updated_at_column
+from sqlalchemy import Column, Float, ForeignKey, Integer, String
+
+class CategoryStat(db.Model):
+
+    __tablename__ = 'category_stats'
+
+    # Welford's running mean and sum of squared deviations of Expense.total
+    user_id = Column(GUID(), ForeignKey('users.id'), primary_key=True)
+    category = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0.0)
+    m2 = Column(Float, nullable=False, default=0.0)
+    updated_at = updated_at_column()
+
+    def __repr__(self):
+        return f'<CategoryStat {self.category}: n={self.count} mean={self.mean}>'
+
+    @property
+    def variance(self) -> float:
+        """Sample variance; 0 with fewer than two expenses."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        """Convert stats to dictionary for JSON serialization."""
+        return {
+            'user_id': self.user_id,
+            'category': self.category,
+            'count': self.count,
+            'mean': round(self.mean, 2),
+            'std': round(self.variance ** 0.5, 2),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -1,17 +1,21 @@
 """
 Expense model for storing expense records.
 """
-import uuid
 from app.extensions import db
-from datetime import date, datetime
-from sqlalchemy import Column, DateTime, Float, String, Date, ForeignKey
+from app.utils.gen_uuid import GUID, new_id
+from app.utils.timestamps import created_at_column, updated_at_column
+from datetime import date
+from sqlalchemy import Column, Float, Integer, String, Date, ForeignKey
 from sqlalchemy.orm import relationship
 
 class Expense(db.Model):
     
     __tablename__ = 'expenses'
+
+    # Columns clients may change; everything else is derived or owned by the server
+    UPDATABLE_FIELDS = ('payment_concept', 'note', 'category', 'subtotal', 'tax', 'total', 'payment_date')
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID(), primary_key=True, default=new_id)
     payment_concept = Column(String(100), nullable=True)
     note = Column(String(500), nullable=True)
     category = Column(String(50), nullable=True)
@@ -19,11 +23,26 @@ class Expense(db.Model):
     tax = Column(Float, default=16)  # Tax/IVA percentage
     total = Column(Float, nullable=True)
     file_name = Column(String(255), nullable=True)
+    fingerprint = Column(String(64), nullable=True)  # Duplicate detection, see expense_fingerprint()
+    anomaly_score = Column(Float, nullable=True)  # z-score against the category when saved
     payment_date = Column(Date, default=date.today)
-    created_at = Column(DateTime, default=datetime.today())
-    updated_at = Column(DateTime, default=datetime.today(), onupdate=datetime.today())
-    user_id = Column(String(36), ForeignKey('users.id'), nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default='1')  # Optimistic concurrency
+    created_at = created_at_column()
+    updated_at = updated_at_column()
+    user_id = Column(GUID(), ForeignKey('users.id'), nullable=False)
     user = relationship("User", back_populates="expenses")
+    recurring_rule_id = Column(GUID(), ForeignKey('recurring_rules.id'), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_expenses_user_payment_date', 'user_id', 'payment_date'),
+        db.Index('ix_expenses_user_created_at', 'user_id', 'created_at', 'id'),  # Keyset paging
+        db.Index('ix_expenses_user_fingerprint', 'user_id', 'fingerprint'),
+        db.Index('ix_expenses_user_file_name', 'user_id', 'file_name'),
+        # One row per occurrence of a recurring rule, so catch-up runs are idempotent
+        db.UniqueConstraint('recurring_rule_id', 'payment_date', name='uq_expenses_recurring_occurrence'),
+        # SQLite uses an FTS5 table instead, see app/utils/fulltext.py
+        db.Index('ix_expenses_fulltext', 'payment_concept', 'note', 'category', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
     
     def __repr__(self):
         return f'<Expense {self.payment_concept}: ${self.total}>'
@@ -39,10 +58,13 @@ class Expense(db.Model):
             'tax': self.tax,
             'total': self.total,
             'file_name': self.file_name,
+            'anomaly_score': self.anomaly_score,
             'payment_date': self.payment_date.isoformat() if self.payment_date else None,
+            'version': self.version,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'user_id': self.user_id
+            'user_id': self.user_id,
+            'recurring_rule_id': self.recurring_rule_id
         }
     
     @classmethod
@@ -57,7 +79,5 @@ class Expense(db.Model):
             total=data.get('total'),
             file_name=data.get('file_name'),
             payment_date=data.get('payment_date', date.today()),
-            created_at=data.get('created_at', datetime.today()),
-            updated_at=data.get('updated_at', datetime.today()),
             user_id=data.get('user_id')
         )
\ No newline at end of file
@@ -1,25 +1,38 @@
 """
 Income model for storing income records.
 """
-import uuid
 from app.extensions import db
-from datetime import date, datetime
-from sqlalchemy import Boolean, Column, DateTime, Float, Integer, String, Date, ForeignKey
+from app.utils.gen_uuid import GUID, new_id
+from app.utils.timestamps import created_at_column, updated_at_column
+from datetime import date
+from sqlalchemy import Boolean, Column, Float, Integer, String, Date, ForeignKey
 from sqlalchemy.orm import relationship
 
 class Income(db.Model):
     __tablename__ = "incomes"
 
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    # Columns clients may change; everything else is owned by the server
+    UPDATABLE_FIELDS = ("source", "amount", "income_date", "description")
+
+    id = Column(GUID(), primary_key=True, default=new_id)
     source = Column(String(100), nullable=False)
     amount = Column(Float, nullable=False)
     income_date = Column(Date, default=date.today)
     description = Column(String(500), nullable=True, default=None)
-    created_at = Column(DateTime, default=datetime.today())
-    updated_at = Column(DateTime, default=datetime.today(), onupdate=datetime.today())
+    version = Column(Integer, nullable=False, default=1, server_default='1')  # Optimistic concurrency
+    created_at = created_at_column()
+    updated_at = updated_at_column()
 
-    user_id = Column(String(36), ForeignKey("users.id"), nullable=False)
+    user_id = Column(GUID(), ForeignKey("users.id"), nullable=False)
     user = relationship("User", back_populates="incomes")
+    recurring_rule_id = Column(GUID(), ForeignKey("recurring_rules.id"), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_incomes_user_income_date', 'user_id', 'income_date'),
+        db.Index('ix_incomes_user_created_at', 'user_id', 'created_at', 'id'),  # Keyset paging
+        # One row per occurrence of a recurring rule, so catch-up runs are idempotent
+        db.UniqueConstraint('recurring_rule_id', 'income_date', name='uq_incomes_recurring_occurrence'),
+    )
 
     def __repr__(self):
         return f"<Income {self.source}: ${self.amount}>"
@@ -32,9 +45,11 @@ class Income(db.Model):
             "amount": self.amount,
             "income_date": self.income_date.isoformat() if self.income_date else None,
             "description": self.description,
+            "version": self.version,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
             "user_id": self.user_id,
+            "recurring_rule_id": self.recurring_rule_id,
         }
     
     @classmethod
@@ -45,7 +60,5 @@ class Income(db.Model):
             amount=data.get("amount"),
             income_date=data.get("income_date", date.today()),
             description=data.get("description", None),
-            created_at=data.get("created_at", datetime.today()),
-            updated_at=data.get("updated_at", datetime.today()),
             user_id=data.get("user_id"),
         )
@@ -0,0 +1,28 @@
+"""
+LinkToken model for the one-time tokens that link a Telegram user to a dashboard account.
+"""
+from app.extensions import db
+from app.utils.gen_uuid import GUID
+from app.utils.timestamps import created_at_column, database_now
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, String
+from sqlalchemy.orm import relationship
+
+class LinkToken(db.Model):
+
+    __tablename__ = 'link_tokens'
+
+    # SHA-256 of the token sent to the user; the token itself is never stored
+    token_hash = Column(String(64), primary_key=True)
+    user_id = Column(GUID(), ForeignKey('users.id'), nullable=False, index=True)
+    created_at = created_at_column()
+    expires_at = Column(DateTime, nullable=False, index=True)  # Database clock, used by the purge job
+
+    user = relationship("User")
+
+    def __repr__(self):
+        return f'<LinkToken {self.user_id} expires {self.expires_at}>'
+
+    def is_expired(self, now: datetime = None) -> bool:
+        """Whether the token is past its expiry, on the database clock by default."""
+        return (now or database_now()) >= self.expires_at
@@ -0,0 +1,57 @@
+"""
+OcrJob model for queued ticket OCR processing.
+"""
+import json
+from app.extensions import db
+from app.utils.gen_uuid import GUID, new_id
+from app.utils.timestamps import created_at_column, updated_at_column
+from sqlalchemy import Column, Integer, String, Text, ForeignKey
+from sqlalchemy.orm import relationship
+
+class OcrJob(db.Model):
+
+    __tablename__ = 'ocr_jobs'
+
+    STATUS_QUEUED = 'queued'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    id = Column(GUID(), primary_key=True, default=new_id)
+    status = Column(String(20), nullable=False, default=STATUS_QUEUED)
+    batch_id = Column(GUID(), nullable=True, index=True)  # Set for multi-file uploads
+    claimed_by = Column(String(64), nullable=True)  # Worker that is processing the job
+    image_path = Column(String(255), nullable=False)
+    original_file_name = Column(String(255), nullable=True)
+    result = Column(Text, nullable=True)  # JSON-encoded extracted expense data
+    file_name = Column(String(80), nullable=True)  # Ticket blob stored for the job's image
+    error = Column(String(500), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = created_at_column()
+    updated_at = updated_at_column()
+
+    user_id = Column(GUID(), ForeignKey('users.id'), nullable=False)
+    user = relationship("User", back_populates="ocr_jobs")
+
+    __table_args__ = (
+        db.Index('ix_ocr_jobs_status_created_at', 'status', 'created_at'),
+        db.Index('ix_ocr_jobs_user_file_name', 'user_id', 'file_name'),
+    )
+
+    def __repr__(self):
+        return f'<OcrJob {self.id}: {self.status}>'
+
+    def to_dict(self):
+        """Convert job to dictionary for JSON serialization."""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'batch_id': self.batch_id,
+            'original_file_name': self.original_file_name,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'user_id': self.user_id
+        }
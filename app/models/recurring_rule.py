@@ -0,0 +1,84 @@
+"""
+RecurringRule model for incomes and expenses that repeat on a schedule.
+"""
+from app.extensions import db
+from app.utils.gen_uuid import GUID, new_id
+from app.utils.timestamps import created_at_column, updated_at_column
+from datetime import date
+from sqlalchemy import Boolean, Column, Date, Float, ForeignKey, Integer, String
+from sqlalchemy.orm import relationship
+
+class RecurringRule(db.Model):
+
+    __tablename__ = 'recurring_rules'
+
+    KIND_INCOME = 'income'
+    KIND_EXPENSE = 'expense'
+    KINDS = (KIND_INCOME, KIND_EXPENSE)
+    FREQUENCIES = ('daily', 'weekly', 'monthly', 'yearly')
+
+    id = Column(GUID(), primary_key=True, default=new_id)
+    kind = Column(String(10), nullable=False)
+    name = Column(String(100), nullable=False)  # Income source or expense payment concept
+    amount = Column(Float, nullable=False)
+    category = Column(String(50), nullable=True)  # Expenses only
+    description = Column(String(500), nullable=True)
+    frequency = Column(String(10), nullable=False, default='monthly')
+    interval = Column(Integer, nullable=False, default=1)  # Every N days/weeks/months/years
+    start_date = Column(Date, nullable=False, default=date.today)
+    end_date = Column(Date, nullable=True)
+    # Occurrences are computed from start_date so month-end dates do not drift
+    occurrences = Column(Integer, nullable=False, default=0)  # Already materialised
+    next_run = Column(Date, nullable=True)  # Date of the next occurrence, NULL when finished
+    active = Column(Boolean, nullable=False, default=True)
+    created_at = created_at_column()
+    updated_at = updated_at_column()
+
+    user_id = Column(GUID(), ForeignKey('users.id'), nullable=False)
+    user = relationship("User", back_populates="recurring_rules")
+
+    __table_args__ = (
+        db.Index('ix_recurring_rules_active_next_run', 'active', 'next_run'),
+    )
+
+    def __repr__(self):
+        return f'<RecurringRule {self.kind} {self.name}: ${self.amount} {self.frequency}>'
+
+    def to_dict(self):
+        """Convert rule to dictionary for JSON serialization."""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'name': self.name,
+            'amount': self.amount,
+            'category': self.category,
+            'description': self.description,
+            'frequency': self.frequency,
+            'interval': self.interval,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'occurrences': self.occurrences,
+            'next_run': self.next_run.isoformat() if self.next_run else None,
+            'active': self.active,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'user_id': self.user_id
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create rule from dictionary."""
+        start_date = data.get('start_date') or date.today()
+        return cls(
+            kind=data.get('kind'),
+            name=data.get('name'),
+            amount=data.get('amount'),
+            category=data.get('category'),
+            description=data.get('description'),
+            frequency=data.get('frequency', 'monthly'),
+            interval=data.get('interval', 1),
+            start_date=start_date,
+            end_date=data.get('end_date'),
+            next_run=start_date,
+            user_id=data.get('user_id')
+        )
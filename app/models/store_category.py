@@ -1,23 +1,24 @@
 """
 StoreCategory model for storing store and category mappings.
 """
-import uuid
 from app.extensions import db
-from datetime import datetime, date
-from sqlalchemy import Column, DateTime, String, Date, ForeignKey
+from app.utils.gen_uuid import GUID, new_id
+from app.utils.timestamps import created_at_column, updated_at_column
+from datetime import date
+from sqlalchemy import Column, String, Date, ForeignKey
 from sqlalchemy.orm import relationship
 
 class StoreCategory(db.Model):
     
     __tablename__ = 'store_categories'
 
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID(), primary_key=True, default=new_id)
     store_name = Column(String(100), nullable=False, unique=True)
     category = Column(String(50), nullable=False)
-    created_at = Column(DateTime, default=datetime.today())
-    updated_at = Column(DateTime, default=datetime.today(), onupdate=datetime.today())
+    created_at = created_at_column()
+    updated_at = updated_at_column()
 
-    user_id = Column(String(36), ForeignKey('users.id'), nullable=False)
+    user_id = Column(GUID(), ForeignKey('users.id'), nullable=False)
     user = relationship("User", back_populates="store_categories")
     
     def __repr__(self):
@@ -40,8 +41,6 @@ class StoreCategory(db.Model):
         return cls(
             store_name=data.get('store_name'),
             category=data.get('category'),
-            created_at=data.get('created_at', datetime.today()),
-            updated_at=data.get('updated_at', datetime.today()),
             
             user_id=data.get('user_id')
         )
\ No newline at end of file
@@ -0,0 +1,33 @@
+"""
+TicketBlob model for content-addressed ticket images.
+"""
+from app.extensions import db
+from app.utils.timestamps import created_at_column, updated_at_column
+from sqlalchemy import Column, Integer, String
+
+class TicketBlob(db.Model):
+
+    __tablename__ = 'ticket_blobs'
+
+    file_name = Column(String(80), primary_key=True)  # "<sha256><extension>"
+    size = Column(Integer, nullable=False, default=0)
+    ref_count = Column(Integer, nullable=False, default=0)  # Expenses pointing at this blob
+    created_at = created_at_column()
+    updated_at = updated_at_column()
+
+    __table_args__ = (
+        db.Index('ix_ticket_blobs_ref_count_updated_at', 'ref_count', 'updated_at'),
+    )
+
+    def __repr__(self):
+        return f'<TicketBlob {self.file_name}: {self.ref_count} refs>'
+
+    def to_dict(self):
+        """Convert blob to dictionary for JSON serialization."""
+        return {
+            'file_name': self.file_name,
+            'size': self.size,
+            'ref_count': self.ref_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
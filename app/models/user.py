@@ -1,35 +1,40 @@
 from app.extensions import db
-import uuid
-from datetime import datetime, date
-from sqlalchemy import Column, DateTime, String, Float, Boolean
+from app.utils.gen_uuid import GUID, new_id
+from app.utils.timestamps import created_at_column, updated_at_column
+from datetime import date
+from sqlalchemy import Column, String, Float, Boolean, Integer
 from sqlalchemy.orm import relationship
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils.passwords import password_hasher
 
 class User(db.Model):
     __tablename__ = 'users'
 
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID(), primary_key=True, default=new_id)
     telegram_id = Column(String(32), unique=True, nullable=False)
     email = Column(String(128), unique=True, nullable=True)
     password = Column(String(256), nullable=True)
-    vinculation_token = Column(String(64), nullable=True)
-    vinculation_token_created = Column(DateTime, nullable=True)
     is_linked = Column(Boolean, default=False)
+    # Bumped to revoke every dashboard token issued before (see token_service)
+    token_version = Column(Integer, nullable=False, default=0, server_default='0')
     accumulated_balance = Column(Float, default=0.0)
-    created_at = Column(DateTime, default=datetime.today())
-    updated_at = Column(DateTime, default=datetime.today(), onupdate=datetime.today())
+    created_at = created_at_column()
+    updated_at = updated_at_column()
 
     expenses = relationship("Expense", back_populates="user")
     store_categories = relationship("StoreCategory", back_populates="user")
     incomes = relationship("Income", back_populates="user")
     budgets = relationship("Budget", back_populates="user")
+    ocr_jobs = relationship("OcrJob", back_populates="user")
+    recurring_rules = relationship("RecurringRule", back_populates="user")
 
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        self.password = password_hasher.hash(password)
     def check_password(self, password):
         if self.password is None:
             return False
-        return check_password_hash(self.password, password)
+        return password_hasher.verify(password, self.password)
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password)
 
     def __repr__(self):
         return f'<User {self.telegram_id}>'
@@ -41,9 +46,8 @@ class User(db.Model):
             'telegram_id': self.telegram_id,
             'email': self.email,
             'password': self.password,
-            'vinculation_token': self.vinculation_token,
-            'vinculation_token_created': self.vinculation_token_created.isoformat() if self.vinculation_token_created else None,
             'is_linked': self.is_linked,
+            'token_version': self.token_version,
             'accumulated_balance': self.accumulated_balance,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
@@ -55,10 +59,6 @@ class User(db.Model):
             telegram_id=data.get('telegram_id'),
             email=data.get('email'),
             password=data.get('password'),
-            vinculation_token=data.get('vinculation_token'),
-            vinculation_token_created=data.get('vinculation_token_created'),
             is_linked=data.get('is_linked', False),
-            accumulated_balance=data.get('accumulated_balance', 0.0),
-            created_at=data.get('created_at', datetime.today()),
-            updated_at=data.get('updated_at', datetime.today())
+            accumulated_balance=data.get('accumulated_balance', 0.0)
         )
\ No newline at end of file
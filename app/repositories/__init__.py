@@ -0,0 +1,4 @@
+# Repositories package
+from .user_scoped import UserScopedRepository, StaleVersionError
+
+__all__ = ['UserScopedRepository', 'StaleVersionError']
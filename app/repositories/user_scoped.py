@@ -0,0 +1,109 @@
+"""
+Queries constrained to one user's rows.
+
+Every query built here carries ``user_id = :user_id`` in its WHERE clause, so
+a row of another user is simply not found: ownership is checked by the
+database in the same lookup instead of after loading the row.
+
+Models with a ``version`` column get optimistic concurrency: ``update`` bumps
+the version and, given the version the client last read, only matches that
+version, so a concurrent edit makes it change no row instead of being lost.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple, Type
+from sqlalchemy import and_, or_
+from app.extensions import db
+
+
+def encode_cursor(timestamp: datetime, row_id: str) -> str:
+    """Opaque keyset cursor for the row after which the next page starts."""
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of ``encode_cursor``; raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), str(row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+class StaleVersionError(Exception):
+    """Raised when a row changed since the client read it."""
+
+    def __init__(self, current_version: int):
+        super().__init__(f"Row was modified (current version {current_version})")
+        self.current_version = current_version
+
+
+class UserScopedRepository:
+    """Access to the rows of ``model`` owned by ``user_id``."""
+
+    def __init__(self, model: Type[db.Model], user_id: str):
+        if not user_id:
+            raise ValueError("user_id is required for a scoped query")
+        self.model = model
+        self.user_id = user_id
+
+    def query(self):
+        """Base query of the user's rows."""
+        return self.model.query.filter(self.model.user_id == self.user_id)
+
+    def get(self, row_id: Any, for_update: bool = False) -> Optional[db.Model]:
+        """Row by primary key, or None if missing or owned by someone else."""
+        query = self.query().filter(self.model.id == str(row_id))
+        if for_update:
+            query = query.with_for_update()
+        return query.first()
+
+    def version(self, row_id: Any) -> Optional[int]:
+        """Current version of an owned row, or None if it is not found."""
+        return self.query().filter(self.model.id == str(row_id)).with_entities(self.model.version).scalar()
+
+    def update(self, row_id: Any, values: dict, version: Optional[int] = None) -> int:
+        """
+        UPDATE one owned row without loading it, bumping its version.
+
+        With ``version``, only a row still at that version is changed. Returns the
+        number of rows changed (0: not found or modified concurrently).
+        """
+        query = self.query().filter(self.model.id == str(row_id))
+        if hasattr(self.model, 'version'):
+            if version is not None:
+                query = query.filter(self.model.version == version)
+            values = {**values, 'version': self.model.version + 1}
+        return query.update(values, synchronize_session=False)
+
+    def page(self, limit: int, cursor: Optional[str] = None, query=None) -> Tuple[List[db.Model], Optional[str]]:
+        """
+        Newest-first keyset page ordered by (created_at, id).
+
+        The primary key breaks timestamp ties, so the order is total and a page
+        boundary never skips or repeats rows; with the (user_id, created_at, id)
+        index the database seeks straight to the cursor instead of counting an OFFSET.
+
+        Returns:
+            (rows, next_cursor) where next_cursor is None on the last page
+        """
+        model = self.model
+        query = query if query is not None else self.query()
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            query = query.filter(or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < row_id)
+            ))
+        rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+        if len(rows) <= limit:
+            return rows, None
+        last = rows[limit - 1]
+        return rows[:limit], encode_cursor(last.created_at, last.id)
+
+    def delete(self, row_id: Any) -> int:
+        """DELETE one owned row without loading it. Returns the number of rows removed."""
+        return self.query().filter(self.model.id == str(row_id)).delete(synchronize_session=False)
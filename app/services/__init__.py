@@ -1,16 +1,30 @@
 # Services package
 from .ocr_service import OCRService, ocr_service
-from .expense_service import ExpenseService, expense_service
+from .expense_service import ExpenseService, DuplicateExpenseError, expense_service
 from .story_category_service import StoreCategoryService
 from .user_service import UserService, user_service
 from .income_service import IncomeService, income_service
 from .balance_service import BalanceService, balance_service
+from .period_service import PeriodService, period_service
+from .ticket_store_service import TicketStoreService, ticket_store_service
+from .recurring_service import RecurringService, recurring_service
+from .forecast_service import ForecastService, forecast_service
+from .anomaly_service import AnomalyService, anomaly_service
+from .token_service import TokenService, token_service
+from .link_token_service import LinkTokenService, link_token_service
 
 __all__ = [
     'OCRService', 'ocr_service',
-    'ExpenseService', 'expense_service',
+    'ExpenseService', 'DuplicateExpenseError', 'expense_service',
     'StoreCategoryService',
     'UserService', 'user_service',
     'IncomeService', 'income_service',
-    'BalanceService', 'balance_service'
+    'BalanceService', 'balance_service',
+    'PeriodService', 'period_service',
+    'TicketStoreService', 'ticket_store_service',
+    'RecurringService', 'recurring_service',
+    'ForecastService', 'forecast_service',
+    'AnomalyService', 'anomaly_service',
+    'TokenService', 'token_service',
+    'LinkTokenService', 'link_token_service'
 ]
\ No newline at end of file
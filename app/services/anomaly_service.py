@@ -0,0 +1,139 @@
+"""
+Service layer for flagging unusual expenses.
+
+Each user/category keeps a running count, mean and sum of squared deviations
+(Welford's algorithm) in ``category_stats``, so scoring a new expense reads
+and updates one row no matter how long the history is.
+"""
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app.config import Config
+from app.extensions import db
+from app.models.category_stat import CategoryStat
+from app.models.expense import Expense
+
+
+class AnomalyService:
+    """Service for scoring expenses against their category's running statistics."""
+
+    @staticmethod
+    def _category(category: Optional[str]) -> str:
+        return (category or 'uncategorized').lower()
+
+    @staticmethod
+    def get_stat(user_id: str, category: Optional[str]) -> Optional[CategoryStat]:
+        """Running statistics of a user's category, if any."""
+        return db.session.get(CategoryStat, (user_id, AnomalyService._category(category)))
+
+    @staticmethod
+    def is_outlier(score: Optional[float]) -> bool:
+        """Whether a z-score is high enough to flag the expense."""
+        return score is not None and score >= Config.ANOMALY_Z_THRESHOLD
+
+    @staticmethod
+    def _locked_stat(user_id: str, category: str) -> Optional[CategoryStat]:
+        return CategoryStat.query.filter_by(user_id=user_id, category=category).with_for_update().first()
+
+    @staticmethod
+    def _insert_missing_stat(user_id: str, category: str):
+        """
+        Insert an empty statistics row unless one exists, without failing the transaction.
+
+        Two first expenses of a category can both find no row; with a plain
+        INSERT the second would hit the primary key and abort its transaction.
+        """
+        values = {'user_id': user_id, 'category': category, 'count': 0, 'mean': 0.0, 'm2': 0.0}
+        table = CategoryStat.__table__
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            db.session.execute(insert(table).values(**values).on_conflict_do_nothing())
+        elif dialect in ('mysql', 'mariadb'):
+            from sqlalchemy.dialects.mysql import insert
+            statement = insert(table).values(**values)
+            db.session.execute(statement.on_duplicate_key_update(category=statement.inserted.category))
+        else:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(table.insert().values(**values))
+            except IntegrityError:
+                pass  # Inserted concurrently; the savepoint rollback keeps the transaction
+
+    @staticmethod
+    def observe(expense: Expense) -> Optional[float]:
+        """
+        Score an expense against its category, then add it to the statistics.
+
+        Runs in the caller's transaction and sets ``expense.anomaly_score``: the
+        number of standard deviations above the category mean, or None until the
+        category has ANOMALY_MIN_SAMPLES expenses.
+        """
+        if expense.total is None or expense.recurring_rule_id:
+            return None
+        category = AnomalyService._category(expense.category)
+        stat = AnomalyService._locked_stat(expense.user_id, category)
+        if stat is None:
+            AnomalyService._insert_missing_stat(expense.user_id, category)
+            stat = AnomalyService._locked_stat(expense.user_id, category)
+
+        std = stat.variance ** 0.5
+        if stat.count >= Config.ANOMALY_MIN_SAMPLES and std > 0:
+            expense.anomaly_score = round((expense.total - stat.mean) / std, 2)
+
+        stat.count += 1
+        delta = expense.total - stat.mean
+        stat.mean += delta / stat.count
+        stat.m2 += delta * (expense.total - stat.mean)
+        return expense.anomaly_score
+
+    @staticmethod
+    def forget(user_id: str, category: Optional[str], total: Optional[float], recurring_rule_id: Optional[str] = None):
+        """Remove a deleted or edited expense from its category statistics (reverse Welford step)."""
+        if total is None or recurring_rule_id:
+            return
+        stat = AnomalyService._locked_stat(user_id, AnomalyService._category(category))
+        if stat is None or stat.count == 0:
+            return
+        if stat.count == 1:
+            stat.count, stat.mean, stat.m2 = 0, 0.0, 0.0
+            return
+        old_mean = stat.mean
+        stat.count -= 1
+        stat.mean = (old_mean * (stat.count + 1) - total) / stat.count
+        stat.m2 = max(stat.m2 - (total - old_mean) * (total - stat.mean), 0.0)
+
+    @staticmethod
+    def rebuild(user_id: Optional[str] = None) -> int:
+        """
+        Recompute statistics from the expenses table with one grouped query.
+
+        Used to seed the table for existing ledgers. Returns the number of categories.
+        """
+        category = func.lower(func.coalesce(Expense.category, 'uncategorized'))
+        query = db.session.query(
+            Expense.user_id, category, func.count(Expense.id),
+            func.avg(Expense.total), func.sum(Expense.total * Expense.total)
+        ).filter(Expense.total.isnot(None), Expense.recurring_rule_id.is_(None))
+        stats = CategoryStat.query
+        if user_id:
+            query = query.filter(Expense.user_id == user_id)
+            stats = stats.filter_by(user_id=user_id)
+        rows = query.group_by(Expense.user_id, category).all()
+
+        stats.delete(synchronize_session=False)
+        db.session.add_all([
+            CategoryStat(
+                user_id=row_user_id, category=row_category, count=count, mean=mean,
+                m2=max(sum_squares - count * mean * mean, 0.0)
+            )
+            for row_user_id, row_category, count, mean, sum_squares in rows
+        ])
+        db.session.commit()
+        return len(rows)
+
+
+anomaly_service = AnomalyService()
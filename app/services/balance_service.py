@@ -56,7 +56,7 @@ class BalanceService:
             }
             
         except Exception as e:
-            logger.error(f"Error calculating monthly balance: {str(e)}")
+            logger.error("Error calculating monthly balance: %s", str(e))
             raise
     
     def get_total_balance(self, user_id):
@@ -79,7 +79,7 @@ class BalanceService:
             }
             
         except Exception as e:
-            logger.error(f"Error calculating total balance: {str(e)}")
+            logger.error("Error calculating total balance: %s", str(e))
             raise
     
     def get_category_expenses(self, user_id, month=None, year=None):
@@ -116,7 +116,7 @@ class BalanceService:
             return categories
             
         except Exception as e:
-            logger.error(f"Error getting category expenses: {str(e)}")
+            logger.error("Error getting category expenses: %s", str(e))
             raise
     
     def get_financial_summary(self, user_id):
@@ -138,7 +138,7 @@ class BalanceService:
             }
             
         except Exception as e:
-            logger.error(f"Error getting financial summary: {str(e)}")
+            logger.error("Error getting financial summary: %s", str(e))
             raise
     
     def get_daily_balance_chart(self, user_id):
@@ -194,7 +194,7 @@ class BalanceService:
             return chart_data
             
         except Exception as e:
-            logger.error(f"Error getting daily balance chart: {str(e)}")
+            logger.error("Error getting daily balance chart: %s", str(e))
             raise
 
 
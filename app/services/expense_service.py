@@ -4,81 +4,301 @@ Service layer for managing expenses and processing tickets.
 from app.models.expense import Expense
 from app.extensions import db
 from app.services.ocr_service import ocr_service
-from typing import List, Dict, Optional
-import os
+from typing import List, Dict, Optional, Tuple
+import math
+from sqlalchemy import Float, and_, bindparam, column, extract, func, or_, text
+from sqlalchemy.dialects.mysql import match
 from datetime import date
 from app.config import Config
+from app.services.period_service import period_service, MONTH_NAMES
+from app.services.ticket_store_service import ticket_store_service, MissingTicketImageError
+from app.services.anomaly_service import anomaly_service
+from app.repositories.user_scoped import UserScopedRepository, StaleVersionError
+
+from app.utils.helpers import parse_date, expense_fingerprint
+from app.utils.gen_uuid import GUID
+from app.utils.fulltext import SQLITE_FTS_KEYS_TABLE, SQLITE_FTS_TABLE, search_terms, sqlite_match_query, mysql_boolean_query
+
+
+class DuplicateExpenseError(Exception):
+    """Raised when a new expense matches one the user already saved."""
+
+    def __init__(self, existing: Expense):
+        super().__init__(f"Expense looks like a duplicate of {existing.id}")
+        self.existing = existing
 
-from app.utils.helpers import parse_date
 
 class ExpenseService:
     """Service for managing expenses and processing tickets."""
     
     @staticmethod
-    def create_expense(data: Dict) -> Expense:
-        """Create a new expense record."""
-        expense = Expense.from_dict(data)
+    def _build_expense(data: Dict) -> Expense:
+        """Build an expense from a dictionary, with a parsed payment date and its fingerprint."""
+        expense = Expense.from_dict({**data, 'payment_date': parse_date(data.get('payment_date') or date.today())})
+        expense.fingerprint = expense_fingerprint(expense.payment_concept, expense.total, expense.payment_date)
+        return expense
+    
+    @staticmethod
+    def find_duplicate(expense: Expense) -> Optional[Expense]:
+        """
+        Find a saved expense of the same user matching ``expense``.
+
+        Matches on the fingerprint (normalised concept, total, payment date) or on
+        the same stored ticket image; both are lookups on (user_id, ...) indexes.
+        """
+        existing = Expense.query.filter_by(user_id=expense.user_id, fingerprint=expense.fingerprint).first()
+        if existing is None and ticket_store_service.is_blob_name(expense.file_name):
+            existing = Expense.query.filter_by(user_id=expense.user_id, file_name=expense.file_name).first()
+        return existing
+    
+    @staticmethod
+    def create_expense(data: Dict, allow_duplicate: bool = False) -> Expense:
+        """
+        Create a new expense record.
+
+        Raises:
+            DuplicateExpenseError: if the user already saved the same expense and
+                ``allow_duplicate`` is False
+            MissingTicketImageError: if the ticket image was garbage-collected
+        """
+        expense = ExpenseService._build_expense(data)
+        if not allow_duplicate:
+            existing = ExpenseService.find_duplicate(expense)
+            if existing:
+                raise DuplicateExpenseError(existing)
         db.session.add(expense)
+        try:
+            ticket_store_service.add_references([expense.file_name])
+        except MissingTicketImageError:
+            db.session.rollback()
+            raise
+        anomaly_service.observe(expense)
         db.session.commit()
         return expense
     
     @staticmethod
-    def get_expense_by_id(expense_id: str) -> Optional[Expense]:
-        """Get expense by ID."""
-        return Expense.query.get(expense_id)
+    def get_expense_by_id(user_id: str, expense_id: str) -> Optional[Expense]:
+        """Get one of the user's expenses by ID; None if missing or owned by another user."""
+        return UserScopedRepository(Expense, user_id).get(expense_id)
     
     @staticmethod
     def get_all_expenses(user_id: str = None, limit: int = 10) -> List[Expense]:
         """Get all expenses for a user, optionally limited."""
-        query = Expense.query.filter_by(user_id=user_id).order_by(Expense.created_at.desc())
+        query = Expense.query.filter_by(user_id=user_id).order_by(Expense.created_at.desc(), Expense.id.desc())
         if limit:
             query = query.limit(limit)
         return query.all()
+
+    @staticmethod
+    def get_expenses_page(user_id: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[Expense], Optional[str]]:
+        """Newest-first keyset page of a user's expenses and the cursor of the next page."""
+        return UserScopedRepository(Expense, user_id).page(limit, cursor)
     
     @staticmethod
-    def get_expenses_by_category(category: str) -> List[Expense]:
-        """Get expenses filtered by category."""
-        return Expense.query.filter_by(category=category).order_by(Expense.created_at.desc()).all()
+    def search_expenses(user_id: str, query: str, page: int = 1, per_page: int = 20) -> Dict:
+        """
+        Full-text search of a user's expenses by concept, note and category.
+
+        Every word must match, as a prefix. Results are ranked by relevance
+        (BM25 on SQLite, MySQL FULLTEXT score), newest first on ties.
+
+        Returns:
+            Dictionary with the page of (expense, score) pairs and the total match count
+        """
+        terms = search_terms(query)
+        if not terms:
+            return {'results': [], 'total': 0}
+        offset = (page - 1) * per_page
+        dialect = db.engine.dialect.name
+
+        if dialect == 'sqlite':
+            fts_filter = f"""
+                FROM {SQLITE_FTS_TABLE}
+                JOIN {SQLITE_FTS_KEYS_TABLE} ON {SQLITE_FTS_KEYS_TABLE}.id = {SQLITE_FTS_TABLE}.rowid
+                JOIN expenses ON expenses.id = {SQLITE_FTS_KEYS_TABLE}.expense_id
+                WHERE {SQLITE_FTS_TABLE} MATCH :match AND expenses.user_id = :user_id
+            """
+            params = {'match': sqlite_match_query(terms), 'user_id': user_id}
+            # Typed so ids are converted like ORM columns (BINARY(16) <-> string)
+            user_param = bindparam('user_id', type_=GUID())
+            total = db.session.execute(text(f"SELECT count(*) {fts_filter}").bindparams(user_param), params).scalar()
+            # bm25() is lower for better matches; weight the concept above category and note
+            rows = db.session.execute(text(f"""
+                SELECT expenses.id, -bm25({SQLITE_FTS_TABLE}, 10.0, 1.0, 2.0) AS score {fts_filter}
+                ORDER BY score DESC, expenses.payment_date DESC
+                LIMIT :limit OFFSET :offset
+            """).bindparams(user_param).columns(column('id', GUID()), column('score', Float())),
+                {**params, 'limit': per_page, 'offset': offset}).all()
+            scores = {row.id: row.score for row in rows}
+            expenses = Expense.query.filter(Expense.id.in_(scores)).all() if scores else []
+            rank = {expense_id: index for index, expense_id in enumerate(scores)}
+            expenses.sort(key=lambda expense: rank[expense.id])
+            results = [(expense, scores[expense.id]) for expense in expenses]
+        else:
+            if dialect == 'mysql':
+                score = match(Expense.payment_concept, Expense.note, Expense.category,
+                              against=mysql_boolean_query(terms)).in_boolean_mode()
+                condition = score > 0
+            else:
+                # No full-text index on other backends: match every term anywhere
+                score = None
+                condition = and_(*[
+                    or_(*[column.ilike(f"%{term}%") for column in (Expense.payment_concept, Expense.note, Expense.category)])
+                    for term in terms
+                ])
+            base = Expense.query.filter(Expense.user_id == user_id, condition)
+            total = base.count()
+            if score is not None:
+                rows = base.add_columns(score.label('score'))\
+                    .order_by(score.desc(), Expense.payment_date.desc()).limit(per_page).offset(offset).all()
+                results = [(expense, row_score) for expense, row_score in rows]
+            else:
+                rows = base.order_by(Expense.payment_date.desc()).limit(per_page).offset(offset).all()
+                results = [(expense, None) for expense in rows]
+
+        return {'results': results, 'total': total}
     
     @staticmethod
-    def get_expenses_by_date_range(start_date: date, end_date: date) -> List[Expense]:
-        """Get expenses within a date range."""
-        return Expense.query.filter(
+    def get_expenses_by_category(user_id: str, category: str) -> List[Expense]:
+        """Get a user's expenses filtered by category."""
+        return UserScopedRepository(Expense, user_id).query()\
+            .filter_by(category=category).order_by(Expense.created_at.desc(), Expense.id.desc()).all()
+    
+    @staticmethod
+    def get_expenses_by_date_range(user_id: str, start_date: date, end_date: date) -> List[Expense]:
+        """Get a user's expenses within a date range."""
+        return UserScopedRepository(Expense, user_id).query().filter(
             Expense.created_at.between(start_date, end_date)
-        ).order_by(Expense.created_at.desc()).all()
+        ).order_by(Expense.created_at.desc(), Expense.id.desc()).all()
     
     @staticmethod
-    def update_expense(expense_id: str, data: Dict) -> Optional[Expense]:
-        """Update an existing expense."""
-        expense = Expense.query.get(expense_id)
-        if not expense:
-            return None
-        
-        for key, value in data.items():
-            if hasattr(expense, key):
-                setattr(expense, key, value)
-        
+    def _update_values(data: Dict) -> Dict:
+        """Whitelisted, type-checked column values of a partial update; other keys are ignored."""
+        values = {}
+        for field in Expense.UPDATABLE_FIELDS:
+            if field not in data:
+                continue
+            value = data[field]
+            if field == 'payment_date':
+                value = parse_date(value)
+                if value is None:
+                    raise ValueError("Invalid date format: payment_date")
+            elif field in ('subtotal', 'tax', 'total') and value is not None:
+                value = float(value)
+            values[field] = value
+        return values
+
+    @staticmethod
+    def update_expense(user_id: str, expense_id: str, data: Dict, version: Optional[int] = None) -> Optional[Expense]:
+        """
+        Partially update one of the user's expenses with a single conditional UPDATE.
+
+        Only ``Expense.UPDATABLE_FIELDS`` are written. When the concept, total, date
+        or category change, the row is read first to recompute the fingerprint and
+        the category statistics; the UPDATE is then pinned to the version read.
+
+        Args:
+            user_id: Owner of the expense
+            expense_id: ID of the expense
+            data: Fields to change
+            version: Version the client last read; None to skip the check
+
+        Raises:
+            StaleVersionError: if the expense changed since ``version`` (or since it was read)
+            ValueError: for invalid values
+        """
+        repository = UserScopedRepository(Expense, user_id)
+        values = ExpenseService._update_values(data)
+        if not values:
+            raise ValueError(f"Nothing to update; fields: {', '.join(Expense.UPDATABLE_FIELDS)}")
+        if values.keys() & {'payment_concept', 'total', 'payment_date', 'category'}:
+            current = repository.get(expense_id)
+            if not current:
+                return None
+            if version is not None and current.version != version:
+                raise StaleVersionError(current.version)
+            version = current.version
+            new = {field: values.get(field, getattr(current, field)) for field in ('payment_concept', 'total', 'payment_date', 'category')}
+            values['fingerprint'] = expense_fingerprint(new['payment_concept'], new['total'], new['payment_date'])
+            if (new['category'], new['total']) != (current.category, current.total):
+                anomaly_service.forget(user_id, current.category, current.total, current.recurring_rule_id)
+                # Score against the statistics without loading the row into the flush
+                probe = Expense(user_id=user_id, category=new['category'], total=new['total'],
+                                recurring_rule_id=current.recurring_rule_id)
+                values['anomaly_score'] = anomaly_service.observe(probe)
+
+        if not repository.update(expense_id, values, version):
+            db.session.rollback()
+            current_version = repository.version(expense_id)
+            if current_version is None:
+                return None
+            raise StaleVersionError(current_version)
         db.session.commit()
-        return expense
+        return repository.get(expense_id)
     
     @staticmethod
-    def delete_expense(expense_id: str) -> bool:
-        """Delete an expense by ID."""
-        expense = Expense.query.get(expense_id)
+    def delete_expense(user_id: str, expense_id: str) -> bool:
+        """Delete one of the user's expenses by ID."""
+        expense = UserScopedRepository(Expense, user_id).get(expense_id)
         if not expense:
             return False
         
-        # Delete associated ticket file if exists
-        if expense.file_name and os.path.exists(expense.file_name):
-            try:
-                os.remove(expense.file_name)
-            except OSError:
-                pass  # File deletion failed, but continue with DB deletion
+        # Release the ticket image; unreferenced blobs are garbage collected
+        ticket_store_service.release(expense.user_id, expense.file_name)
+        anomaly_service.forget(expense.user_id, expense.category, expense.total, expense.recurring_rule_id)
         
         db.session.delete(expense)
         db.session.commit()
         return True
     
+    @staticmethod
+    def create_expenses(data_list: List[Dict], allow_duplicates: bool = False) -> List[Expense]:
+        """
+        Create several expense records in a single transaction.
+
+        Unless ``allow_duplicates`` is set, drafts matching a saved expense or an
+        earlier draft of the same list are skipped; only the created records are returned.
+
+        Raises:
+            MissingTicketImageError: if a draft's ticket image was garbage-collected;
+                nothing is saved
+        """
+        expenses = []
+        seen = set()
+        for data in data_list:
+            expense = ExpenseService._build_expense(data)
+            if not allow_duplicates:
+                keys = {expense.fingerprint}
+                if ticket_store_service.is_blob_name(expense.file_name):
+                    keys.add(expense.file_name)
+                if keys & seen or ExpenseService.find_duplicate(expense):
+                    continue
+                seen |= keys
+            expenses.append(expense)
+        db.session.add_all(expenses)
+        try:
+            ticket_store_service.add_references([expense.file_name for expense in expenses])
+        except MissingTicketImageError:
+            db.session.rollback()
+            raise
+        for expense in expenses:
+            anomaly_service.observe(expense)
+        db.session.commit()
+        return expenses
+    
+    @staticmethod
+    def backfill_fingerprints(batch_size: int = 500) -> int:
+        """Compute missing fingerprints of expenses saved before duplicate detection."""
+        updated = 0
+        while True:
+            expenses = Expense.query.filter(Expense.fingerprint.is_(None)).limit(batch_size).all()
+            if not expenses:
+                return updated
+            for expense in expenses:
+                expense.fingerprint = expense_fingerprint(expense.payment_concept, expense.total, expense.payment_date)
+            db.session.commit()
+            updated += len(expenses)
+    
     @staticmethod
     def process_ticket_image(user_id: str, image_path: str, save_image: bool = True) -> Dict:
         """
@@ -92,14 +312,29 @@ class ExpenseService:
         Returns:
             Dictionary with extracted expense data
         """
-        try:
+        return ExpenseService.process_ticket_images(user_id, [image_path], save_image)[0]
+    
+    @staticmethod
+    def process_ticket_images(user_id: str, image_paths: List[str], save_image: bool = True) -> List[Dict]:
+        """
+        Process several ticket images with one batched OCR call.
+        
+        Args:
+            user_id: ID of the user
+            image_paths: Paths to the ticket images
+            save_image: Whether to save the images to files directory
             
-            # Extract data using OCR
-            ticket_data = ocr_service.extract_ticket_data(image_path)
+        Returns:
+            List of dictionaries with extracted expense data, in input order
+        """
+        # Extract data using OCR
+        tickets_data = ocr_service.extract_ticket_data_batch(image_paths)
 
+        drafts = []
+        for image_path, ticket_data in zip(image_paths, tickets_data):
             # Prepare expense data
             expense_data = {
-                'payment_concept': ticket_data.get('payment_concept').upper() or 'ticket',
+                'payment_concept': (ticket_data.get('payment_concept') or 'ticket').upper(),
                 'subtotal': ticket_data.get('subtotal') or 0.0,
                 'category': (ticket_data.get('category') or 'uncategorized').lower(),
                 'tax': ticket_data.get('tax') or 16,
@@ -110,77 +345,96 @@ class ExpenseService:
 
             # Save image if requested
             if save_image:
-                saved_path = ExpenseService._save_ticket_image(user_id, image_path)
-                expense_data['file_name'] = saved_path
+                expense_data['file_name'] = ticket_store_service.store(image_path)
 
-            # Add raw OCR data for reference
-            # expense_data['ocr_data'] = ticket_data
-            
-            return expense_data
-            
-        except Exception as e:
-            raise Exception(f"{str(e)}")
-    
-    @staticmethod
-    def _save_ticket_image(user_id: str, image_path: str) -> str:
-        """Save ticket image to files directory."""
-        import shutil
-        from app.utils.helpers import generate_secure_filename
-        # Create files directory if it doesn't exist
-        file_dir = Config.FILE_FOLDER
-        os.makedirs(file_dir, exist_ok=True)
-
-        # Generate secure file_name with timestamp
-        file_name = generate_secure_filename(os.path.basename(image_path))
-        destination_dir = os.path.join(Config.FILE_FOLDER, user_id)
-        os.makedirs(destination_dir, exist_ok=True)
-        destination_path = os.path.join(destination_dir, file_name)
-
-        # Copy file to files directory
-        shutil.copy2(image_path, destination_path)
+            drafts.append(expense_data)
         
-        return file_name
+        return drafts
     
     @staticmethod
-    def get_expense_statistics() -> Dict:
-        """Get expense statistics."""
-        expenses = Expense.query.all()
-        
-        if not expenses:
+    def get_expense_statistics(user_id: str, start_date: date = None, end_date: date = None,
+                               percentiles: List[float] = None) -> Dict:
+        """
+        Get expense statistics for a user, aggregated in SQL.
+
+        Args:
+            user_id: ID of the user
+            start_date: Optional inclusive lower bound on payment_date
+            end_date: Optional inclusive upper bound on payment_date
+            percentiles: Optional list of percentiles (0-100) of the expense total
+
+        Returns:
+            Dictionary with counts, totals, category and monthly breakdowns
+        """
+        filters = [Expense.user_id == user_id]
+        if start_date:
+            filters.append(Expense.payment_date >= start_date)
+        if end_date:
+            filters.append(Expense.payment_date <= end_date)
+
+        count, total_amount, average, minimum, maximum = db.session.query(
+            func.count(Expense.id),
+            func.coalesce(func.sum(Expense.total), 0.0),
+            func.avg(Expense.total),
+            func.min(Expense.total),
+            func.max(Expense.total)
+        ).filter(*filters).one()
+
+        if not count:
             return {
                 'total_expenses': 0,
                 'total_amount': 0.0,
                 'categories': {},
                 'monthly_totals': {}
             }
-        
-        total_amount = sum(expense.total for expense in expenses)
-        
+
         # Group by categories
-        categories = {}
-        for expense in expenses:
-            category = expense.category or 'uncategorized'
-            if category not in categories:
-                categories[category] = {'count': 0, 'total': 0.0}
-            categories[category]['count'] += 1
-            categories[category]['total'] += expense.total
-        
+        category = func.coalesce(Expense.category, 'uncategorized')
+        category_rows = db.session.query(
+            category, func.count(Expense.id), func.sum(Expense.total)
+        ).filter(*filters).group_by(category).all()
+        categories = {
+            name: {'count': cat_count, 'total': cat_total or 0.0}
+            for name, cat_count, cat_total in category_rows
+        }
+
         # Group by month
-        monthly_totals = {}
-        for expense in expenses:
-            if expense.created_at:
-                month_key = expense.created_at.strftime('%Y-%m')
-                if month_key not in monthly_totals:
-                    monthly_totals[month_key] = 0.0
-                monthly_totals[month_key] += expense.total
-        
-        return {
-            'total_expenses': len(expenses),
+        year = extract('year', Expense.payment_date)
+        month = extract('month', Expense.payment_date)
+        monthly_rows = db.session.query(
+            year, month, func.sum(Expense.total)
+        ).filter(*filters).group_by(year, month).order_by(year, month).all()
+        monthly_totals = {
+            f"{int(row_year):04d}-{int(row_month):02d}": row_total or 0.0
+            for row_year, row_month, row_total in monthly_rows
+        }
+
+        statistics = {
+            'total_expenses': count,
             'total_amount': total_amount,
+            'average_amount': average,
+            'min_amount': minimum,
+            'max_amount': maximum,
             'categories': categories,
             'monthly_totals': monthly_totals
         }
 
+        if percentiles:
+            statistics['percentiles'] = {
+                str(p): ExpenseService._total_percentile(filters, count, p) for p in percentiles
+            }
+
+        return statistics
+
+    @staticmethod
+    def _total_percentile(filters: List, count: int, percentile: float) -> Optional[float]:
+        """Nearest-rank percentile of expense totals, fetching a single row."""
+        if not 0 <= percentile <= 100:
+            raise ValueError(f"Percentile must be between 0 and 100: {percentile}")
+        rank = max(0, math.ceil(percentile / 100 * count) - 1)
+        return db.session.query(Expense.total).filter(*filters)\
+            .order_by(Expense.total.asc()).offset(rank).limit(1).scalar()
+
     @staticmethod
     def get_expenses_summary(user_id: str) -> Dict:
         """Get a summary of expenses for a user."""
@@ -211,70 +465,26 @@ class ExpenseService:
         }
 
     @staticmethod
-    def get_monthly_expenses(user_id: str) -> Dict:
-        """Get total expense amount for current month with comparison to previous month."""
-        # Month names
-        month_names = {
-            1: 'Jan', 2: 'Feb', 3: 'Mar', 4: 'Apr',
-            5: 'May', 6: 'Jun', 7: 'Jul', 8: 'Aug',
-            9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dec'
-        }
-        
-        today = date.today()
-        current_month = today.month
-        current_year = today.year
-        
-        # Calculate current month date range
-        current_start_date = date(current_year, current_month, 1)
-        if current_month == 12:
-            current_end_date = date(current_year + 1, 1, 1)
-        else:
-            current_end_date = date(current_year, current_month + 1, 1)
-
-        # Get current month expenses
-        current_monthly_expenses = Expense.query.filter(
-            Expense.user_id == user_id,
-            Expense.payment_date >= current_start_date,
-            Expense.payment_date < current_end_date
-        ).all()
-        
-        current_total = sum(expense.total for expense in current_monthly_expenses)
-        
-        # Calculate previous month date range
-        if current_month == 1:
-            previous_month = 12
-            previous_year = current_year - 1
-        else:
-            previous_month = current_month - 1
-            previous_year = current_year
-            
-        previous_start_date = date(previous_year, previous_month, 1)
-        if previous_month == 12:
-            previous_end_date = date(previous_year + 1, 1, 1)
-        else:
-            previous_end_date = date(previous_year, previous_month + 1, 1)
-        
-        # Get previous month expenses
-        previous_monthly_expenses = Expense.query.filter(
-            Expense.user_id == user_id,
-            Expense.payment_date >= previous_start_date,
-            Expense.payment_date < previous_end_date
-        ).all()
-        
-        previous_total = sum(expense.total for expense in previous_monthly_expenses)
-        
-        # Calculate percentage change
-        if previous_total > 0:
-            percentage_change = ((current_total - previous_total) / previous_total) * 100
-        else:
-            percentage_change = 0.0 if current_total == 0 else 100.0
-        
+    def get_monthly_expenses(user_id: str, period: str = 'month', periods: int = 2,
+                             trend_window: int = None, anchor: date = None) -> Dict:
+        """
+        Get total expense amount for the current period with comparison to previous periods.
+
+        All periods are summed in a single grouped query; see PeriodService.
+        """
+        anchor = anchor or date.today()
+        comparison = period_service.compare_periods(
+            Expense.payment_date, Expense.total, [Expense.user_id == user_id],
+            period=period, periods=periods, anchor=anchor, trend_window=trend_window
+        )
+        percentage_change = comparison['percentage_change']
+
         return {
-            'month': month_names.get(current_month, ''),
-            'year': current_year,
-            'total_expenses': round(current_total, 2),
-            'previous_month_total': round(previous_total, 2),
-            'percentage_change': round(percentage_change, 2),
+            **comparison,
+            'month': MONTH_NAMES.get(anchor.month, ''),
+            'year': anchor.year,
+            'total_expenses': comparison['current_total'],
+            'previous_month_total': comparison['previous_total'],
             'improvement': percentage_change < 0  # True if spending decreased
         }
     
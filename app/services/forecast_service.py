@@ -0,0 +1,197 @@
+"""
+Service layer for end-of-month balance and category spend forecasts.
+
+Incomes and expenses are rolled up in SQL to one row per day (and category),
+then laid out as NumPy arrays of shape (months, days of month). The expected
+flow for the rest of the month is the recency-weighted average of the same
+days in past months, plus the recurring occurrences already scheduled.
+"""
+import calendar
+from datetime import date, timedelta
+from typing import Dict, Optional
+import numpy as np
+from sqlalchemy import func
+from app.extensions import db
+from app.models.expense import Expense
+from app.models.income import Income
+from app.models.recurring_rule import RecurringRule
+from app.models.user import User
+from app.services.period_service import period_service
+
+DEFAULT_HISTORY_MONTHS = 12
+MAX_HISTORY_MONTHS = 120
+HALF_LIFE_MONTHS = 6  # A month this old weighs half as much as last month
+
+
+class ForecastService:
+    """Service for projecting the current month from a user's history."""
+
+    @staticmethod
+    def _month_weights(months: int) -> np.ndarray:
+        """Exponential recency weights, oldest month first, summing to 1."""
+        age = np.arange(months, 0, -1, dtype=float)
+        weights = 0.5 ** ((age - 1) / HALF_LIFE_MONTHS)
+        return weights / weights.sum()
+
+    @staticmethod
+    def _day_grid(rows, start: date, months: int, key_index: Optional[Dict] = None) -> np.ndarray:
+        """
+        Scatter (day, amount[, key]) rollup rows into a (months, 31) grid, or
+        (keys, months, 31) when rows carry a key such as the category.
+        """
+        shape = (months, 31) if key_index is None else (len(key_index), months, 31)
+        grid = np.zeros(shape)
+        if not rows:
+            return grid
+        days = [row[0] for row in rows]
+        month_idx = np.array([(day.year - start.year) * 12 + day.month - start.month for day in days])
+        dom_idx = np.array([day.day - 1 for day in days])
+        amounts = np.array([row[1] or 0.0 for row in rows], dtype=float)
+        if key_index is None:
+            np.add.at(grid, (month_idx, dom_idx), amounts)
+        else:
+            key_idx = np.array([key_index[row[2]] for row in rows])
+            np.add.at(grid, (key_idx, month_idx, dom_idx), amounts)
+        return grid
+
+    @staticmethod
+    def _scheduled(user_id: str, after: date, until: date) -> Dict[str, Dict]:
+        """Recurring occurrences due after ``after`` up to ``until``, by kind, with expense categories."""
+        # Imported here: recurring_service imports the models this module also uses
+        from app.services.recurring_service import recurring_service
+
+        scheduled = {'income': 0.0, 'expense': 0.0, 'categories': {}}
+        rules = RecurringRule.query.filter(
+            RecurringRule.user_id == user_id,
+            RecurringRule.active.is_(True),
+            RecurringRule.next_run <= until
+        ).all()
+        for rule in rules:
+            number = rule.occurrences
+            occurrence = recurring_service.occurrence_date(rule, number)
+            while occurrence <= until and (rule.end_date is None or occurrence <= rule.end_date):
+                if occurrence > after:
+                    scheduled[rule.kind] += rule.amount
+                    if rule.kind == RecurringRule.KIND_EXPENSE:
+                        category = rule.category or 'uncategorized'
+                        scheduled['categories'][category] = scheduled['categories'].get(category, 0.0) + rule.amount
+                number += 1
+                occurrence = recurring_service.occurrence_date(rule, number)
+        return scheduled
+
+    def forecast_month(self, user_id: str, today: Optional[date] = None,
+                       history_months: int = DEFAULT_HISTORY_MONTHS) -> Dict:
+        """
+        Project the end-of-month balance and spend per category.
+
+        Args:
+            user_id: ID of the user
+            today: Last day with known data (default: today)
+            history_months: Number of full past months to learn from
+
+        Returns:
+            Dictionary with month-to-date totals, expected remaining flow, projected
+            month net and balance, per-category projections and a daily balance path
+        """
+        today = today or date.today()
+        month_start = today.replace(day=1)
+        month_days = calendar.monthrange(today.year, today.month)[1]
+        month_end = today.replace(day=month_days)
+        history_start = period_service.period_start(today, 'month', -history_months)
+
+        # Rollups of the past months: one row per day (and category). Recurring rows
+        # are left out because their future occurrences are added exactly below.
+        expense_rows = db.session.query(
+            Expense.payment_date, func.sum(Expense.total), func.coalesce(Expense.category, 'uncategorized')
+        ).filter(
+            Expense.user_id == user_id,
+            Expense.payment_date >= history_start,
+            Expense.payment_date < month_start,
+            Expense.recurring_rule_id.is_(None)
+        ).group_by(Expense.payment_date, func.coalesce(Expense.category, 'uncategorized')).all()
+        income_rows = db.session.query(Income.income_date, func.sum(Income.amount)).filter(
+            Income.user_id == user_id,
+            Income.income_date >= history_start,
+            Income.income_date < month_start,
+            Income.recurring_rule_id.is_(None)
+        ).group_by(Income.income_date).all()
+        month_to_date_by_category = dict(db.session.query(
+            func.coalesce(Expense.category, 'uncategorized'), func.sum(Expense.total)
+        ).filter(
+            Expense.user_id == user_id, Expense.payment_date >= month_start, Expense.payment_date <= today
+        ).group_by(func.coalesce(Expense.category, 'uncategorized')).all())
+        month_to_date_expenses = sum(total or 0.0 for total in month_to_date_by_category.values())
+        month_to_date_incomes = db.session.query(func.coalesce(func.sum(Income.amount), 0.0)).filter(
+            Income.user_id == user_id, Income.income_date >= month_start, Income.income_date <= today
+        ).scalar()
+
+        categories = sorted({row[2] for row in expense_rows})
+        category_index = {category: index for index, category in enumerate(categories)}
+        category_grid = self._day_grid(expense_rows, history_start, history_months, category_index)
+        expense_grid = category_grid.sum(axis=0) if categories else np.zeros((history_months, 31))
+        income_grid = self._day_grid(income_rows, history_start, history_months)
+
+        # Seasonal average of each remaining day of the month over the past months
+        weights = self._month_weights(history_months)
+        remaining = slice(today.day, month_days)
+        expected_daily_expenses = weights @ expense_grid[:, remaining]
+        expected_daily_incomes = weights @ income_grid[:, remaining]
+        expected_category = category_grid[:, :, remaining].sum(axis=2) @ weights if categories else np.zeros(0)
+
+        scheduled = self._scheduled(user_id, today, month_end)
+        expected_expenses = float(expected_daily_expenses.sum()) + scheduled['expense']
+        expected_incomes = float(expected_daily_incomes.sum()) + scheduled['income']
+
+        month_net = month_to_date_incomes - month_to_date_expenses
+        projected_net = month_net + expected_incomes - expected_expenses
+        user = db.session.get(User, user_id)
+        balance = user.accumulated_balance if user and user.accumulated_balance is not None else 0.0
+
+        # Daily path of the balance; scheduled occurrences are spread over the remaining days
+        remaining_days = month_days - today.day
+        daily_net = expected_daily_incomes - expected_daily_expenses
+        if remaining_days:
+            daily_net = daily_net + (scheduled['income'] - scheduled['expense']) / remaining_days
+        path = balance + np.cumsum(daily_net)
+
+        category_forecast = []
+        for category in set(categories) | set(month_to_date_by_category) | set(scheduled['categories']):
+            index = category_index.get(category)
+            spent = month_to_date_by_category.get(category) or 0.0
+            expected = float(expected_category[index]) if index is not None else 0.0
+            expected += scheduled['categories'].get(category, 0.0)
+            category_forecast.append({
+                'category': category,
+                'month_to_date': round(spent, 2),
+                'expected_remaining': round(expected, 2),
+                'projected_total': round(spent + expected, 2)
+            })
+
+        return {
+            'month': today.month,
+            'year': today.year,
+            'as_of': today.isoformat(),
+            'history_months': history_months,
+            'month_to_date': {
+                'incomes': round(month_to_date_incomes, 2),
+                'expenses': round(month_to_date_expenses, 2),
+                'net': round(month_net, 2)
+            },
+            'expected_remaining': {
+                'incomes': round(expected_incomes, 2),
+                'expenses': round(expected_expenses, 2),
+                'scheduled_incomes': round(scheduled['income'], 2),
+                'scheduled_expenses': round(scheduled['expense'], 2)
+            },
+            'projected_month_net': round(projected_net, 2),
+            'current_balance': round(balance, 2),
+            'projected_balance': round(balance + expected_incomes - expected_expenses, 2),
+            'categories': sorted(category_forecast, key=lambda item: item['projected_total'], reverse=True),
+            'daily': [
+                {'date': (today + timedelta(days=offset + 1)).isoformat(), 'balance': round(float(value), 2)}
+                for offset, value in enumerate(path)
+            ]
+        }
+
+
+forecast_service = ForecastService()
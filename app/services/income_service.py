@@ -1,13 +1,15 @@
 """
 Income Service Module
 """
-from sympy import limit
 from app.models.income import Income
 from app.extensions import db
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import os
 from datetime import date
 from app.config import Config
+from app.services.period_service import period_service, MONTH_NAMES
+from app.repositories.user_scoped import UserScopedRepository, StaleVersionError
+from app.utils.helpers import parse_date
 
 class IncomeService:
 
@@ -22,108 +24,89 @@ class IncomeService:
     @staticmethod
     def get_incomes_by_user_id(user_id: str, limit: int = None) -> List[Income]:
         """Get incomes by user ID."""
-        query = Income.query.filter_by(user_id=user_id).order_by(Income.created_at.desc())
+        query = Income.query.filter_by(user_id=user_id).order_by(Income.created_at.desc(), Income.id.desc())
         if limit:
             query = query.limit(limit)
         return query.all()
 
+    @staticmethod
+    def get_incomes_page(user_id: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[Income], Optional[str]]:
+        """Newest-first keyset page of a user's incomes and the cursor of the next page."""
+        return UserScopedRepository(Income, user_id).page(limit, cursor)
+
     @staticmethod
     def get_all_incomes(limit: int = None) -> List[Income]:
         """Get all incomes."""
-        query = Income.query.order_by(Income.created_at.desc())
+        query = Income.query.order_by(Income.created_at.desc(), Income.id.desc())
         if limit:
             query = query.limit(limit)
         return query.all()
     
     @staticmethod
-    def update_income(income_id: str, data: Dict) -> Optional[Income]:
-        """Update an existing income."""
-        income = Income.query.get(income_id)
-        if not income:
-            return None
-        
-        for key, value in data.items():
-            if hasattr(income, key):
-                setattr(income, key, value)
-        
+    def update_income(user_id: str, income_id: str, data: Dict, version: Optional[int] = None) -> Optional[Income]:
+        """
+        Partially update one of the user's incomes with a single conditional UPDATE.
+
+        Only ``Income.UPDATABLE_FIELDS`` are written; with ``version`` the UPDATE
+        only matches the version the client last read.
+
+        Raises:
+            StaleVersionError: if the income changed since ``version``
+            ValueError: for invalid values
+        """
+        values = {}
+        for field in Income.UPDATABLE_FIELDS:
+            if field not in data:
+                continue
+            value = data[field]
+            if field == 'income_date':
+                value = parse_date(value)
+                if value is None:
+                    raise ValueError("Invalid date format: income_date")
+            elif field == 'amount':
+                value = float(value)
+            values[field] = value
+        if not values:
+            raise ValueError(f"Nothing to update; fields: {', '.join(Income.UPDATABLE_FIELDS)}")
+
+        repository = UserScopedRepository(Income, user_id)
+        if not repository.update(income_id, values, version):
+            db.session.rollback()
+            current_version = repository.version(income_id)
+            if current_version is None:
+                return None
+            raise StaleVersionError(current_version)
         db.session.commit()
-        return income
+        return repository.get(income_id)
     
     @staticmethod
-    def delete_income(income_id: str) -> bool:
-        """Delete an existing income."""
-        income = Income.query.get(income_id)
-        if not income:
-            return False
-        db.session.delete(income)
+    def delete_income(user_id: str, income_id: str) -> bool:
+        """Delete one of the user's incomes with a single scoped DELETE."""
+        deleted = UserScopedRepository(Income, user_id).delete(income_id)
         db.session.commit()
-        return True
+        return bool(deleted)
     
     @staticmethod
-    def get_monthly_incomes(user_id: str) -> Dict:
-        """Get total income amount for current month with comparison to previous month."""
-        # Month names
-        month_names = {
-            1: 'Jan', 2: 'Feb', 3: 'Mar', 4: 'Apr',
-            5: 'May', 6: 'Jun', 7: 'Jul', 8: 'Aug',
-            9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dec'
-        }
-        
-        today = date.today()
-        current_month = today.month
-        current_year = today.year
-        
-        # Calculate current month date range
-        current_start_date = date(current_year, current_month, 1)
-        if current_month == 12:
-            current_end_date = date(current_year + 1, 1, 1)
-        else:
-            current_end_date = date(current_year, current_month + 1, 1)
+    def get_monthly_incomes(user_id: str, period: str = 'month', periods: int = 2,
+                            trend_window: int = None, anchor: date = None) -> Dict:
+        """
+        Get total income amount for the current period with comparison to previous periods.
+
+        All periods are summed in a single grouped query; see PeriodService.
+        """
+        anchor = anchor or date.today()
+        comparison = period_service.compare_periods(
+            Income.income_date, Income.amount, [Income.user_id == user_id],
+            period=period, periods=periods, anchor=anchor, trend_window=trend_window
+        )
+        percentage_change = comparison['percentage_change']
 
-        # Get current month incomes
-        current_monthly_incomes = Income.query.filter(
-            Income.user_id == user_id,
-            Income.income_date >= current_start_date,
-            Income.income_date < current_end_date
-        ).all()
-        
-        current_total = sum(income.amount for income in current_monthly_incomes)
-        
-        # Calculate previous month date range
-        if current_month == 1:
-            previous_month = 12
-            previous_year = current_year - 1
-        else:
-            previous_month = current_month - 1
-            previous_year = current_year
-            
-        previous_start_date = date(previous_year, previous_month, 1)
-        if previous_month == 12:
-            previous_end_date = date(previous_year + 1, 1, 1)
-        else:
-            previous_end_date = date(previous_year, previous_month + 1, 1)
-        
-        # Get previous month incomes
-        previous_monthly_incomes = Income.query.filter(
-            Income.user_id == user_id,
-            Income.income_date >= previous_start_date,
-            Income.income_date < previous_end_date
-        ).all()
-        
-        previous_total = sum(income.amount for income in previous_monthly_incomes)
-        
-        # Calculate percentage change
-        if previous_total > 0:
-            percentage_change = ((current_total - previous_total) / previous_total) * 100
-        else:
-            percentage_change = 0.0 if current_total == 0 else 100.0
-        
         return {
-            'month': month_names.get(current_month, ''),
-            'year': current_year,
-            'total_incomes': round(current_total, 2),
-            'previous_month_total': round(previous_total, 2),
-            'percentage_change': round(percentage_change, 2),
+            **comparison,
+            'month': MONTH_NAMES.get(anchor.month, ''),
+            'year': anchor.year,
+            'total_incomes': comparison['current_total'],
+            'previous_month_total': comparison['previous_total'],
             'improvement': percentage_change > 0  # True if income increased
         }
     
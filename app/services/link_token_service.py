@@ -0,0 +1,66 @@
+"""
+Service layer for account-linking tokens.
+
+Tokens live in their own ``link_tokens`` table keyed by their SHA-256, so
+signup looks one up through the primary key and the plaintext token is never
+stored. Expiry times come from the database clock (``database_now``), the
+same one that sets ``created_at``. Expired tokens are deleted by the
+scheduler's purge job.
+"""
+import hashlib
+import logging
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional
+from app.config import Config
+from app.extensions import db
+from app.models.link_token import LinkToken
+from app.utils.timestamps import database_now
+
+
+class LinkTokenService:
+    """Service for issuing, looking up and purging account-linking tokens."""
+
+    @staticmethod
+    def hash_token(token: str) -> str:
+        """SHA-256 hex digest used as the lookup key."""
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def issue(user_id: str) -> str:
+        """Create a token for a user, replacing any earlier one. Returns the plaintext token."""
+        token = secrets.token_hex(16)
+        now = database_now()
+        LinkToken.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+        db.session.add(LinkToken(
+            token_hash=LinkTokenService.hash_token(token),
+            user_id=user_id,
+            expires_at=now + timedelta(minutes=Config.TOKEN_EXPIRATION_MINUTES)
+        ))
+        db.session.commit()
+        return token
+
+    @staticmethod
+    def get(token: Optional[str]) -> Optional[LinkToken]:
+        """Look up a token (expired or not) by its hash."""
+        if not token:
+            return None
+        return db.session.get(LinkToken, LinkTokenService.hash_token(token))
+
+    @staticmethod
+    def discard(user_id: str):
+        """Delete a user's tokens in the caller's transaction (after a successful link)."""
+        LinkToken.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+    @staticmethod
+    def purge_expired(now: Optional[datetime] = None) -> int:
+        """Delete expired tokens. Returns the number removed."""
+        removed = LinkToken.query.filter(LinkToken.expires_at < (now or database_now()))\
+            .delete(synchronize_session=False)
+        db.session.commit()
+        if removed:
+            logging.info("Purged %s expired link tokens.", removed)
+        return removed
+
+
+link_token_service = LinkTokenService()
@@ -0,0 +1,284 @@
+"""
+Service layer for queuing ticket images and processing them out of band.
+
+Jobs live in the ``ocr_jobs`` table, so the API and any number of worker
+processes (see ``worker.py``) share the queue through the database.
+"""
+import json
+import logging
+import os
+import uuid
+from datetime import timedelta
+from typing import Dict, List, Optional
+from sqlalchemy.exc import InterfaceError, OperationalError
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+from app.config import Config
+from app.extensions import db
+from app.models.ocr_job import OcrJob
+from app.utils.helpers import delete_file
+from app.utils.gen_uuid import new_id
+from app.utils.timestamps import database_now, db_now
+
+# Errors worth another attempt: the database or a remote OCR backend was unreachable
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, ConnectionError, TimeoutError)
+
+
+class OcrJobService:
+    """Service for enqueuing, claiming and completing OCR jobs."""
+
+    @staticmethod
+    def _store_upload(file: FileStorage) -> str:
+        """Save an uploaded image under a random name in the job folder."""
+        os.makedirs(Config.OCR_JOB_FOLDER, exist_ok=True)
+        extension = os.path.splitext(secure_filename(file.filename))[1].lower()
+        image_path = os.path.join(Config.OCR_JOB_FOLDER, f"{uuid.uuid4().hex}{extension}")
+        file.save(image_path)
+        return image_path
+
+    @staticmethod
+    def enqueue(user_id: str, file: FileStorage) -> OcrJob:
+        """Store an uploaded ticket image and create a queued job for it."""
+        return OcrJobService.enqueue_batch(user_id, [file])[0]
+
+    @staticmethod
+    def enqueue_batch(user_id: str, files: List[FileStorage]) -> List[OcrJob]:
+        """Store several ticket images as queued jobs sharing a batch id."""
+        batch_id = new_id() if len(files) > 1 else None
+        jobs = [
+            OcrJob(
+                user_id=user_id,
+                batch_id=batch_id,
+                image_path=OcrJobService._store_upload(file),
+                original_file_name=file.filename
+            )
+            for file in files
+        ]
+        db.session.add_all(jobs)
+        db.session.commit()
+        return jobs
+
+    @staticmethod
+    def get_job(user_id: str, job_id: str) -> Optional[OcrJob]:
+        """Get a job owned by ``user_id``."""
+        return OcrJob.query.filter_by(id=job_id, user_id=user_id).first()
+
+    @staticmethod
+    def get_batch(user_id: str, batch_id: str) -> List[OcrJob]:
+        """Get all jobs of a batch owned by ``user_id``."""
+        return OcrJob.query.filter_by(batch_id=batch_id, user_id=user_id)\
+            .order_by(OcrJob.created_at.asc()).all()
+
+    @staticmethod
+    def owns_ticket(user_id: str, file_name: str) -> bool:
+        """Whether ``file_name`` is a ticket image stored by one of the user's OCR jobs."""
+        return db.session.query(
+            OcrJob.query.filter_by(user_id=user_id, file_name=file_name).exists()
+        ).scalar()
+
+    @staticmethod
+    def claim_batch(worker_id: str, limit: int = None) -> List[OcrJob]:
+        """
+        Atomically move up to ``limit`` of the oldest queued jobs to processing.
+
+        The UPDATE only matches rows that are still queued and tags them with
+        ``worker_id``, so concurrent workers never claim the same job.
+        """
+        limit = limit or Config.OCR_BATCH_SIZE
+        candidates = [
+            row.id for row in db.session.query(OcrJob.id).filter_by(status=OcrJob.STATUS_QUEUED)
+            .order_by(OcrJob.created_at.asc()).limit(limit).all()
+        ]
+        if not candidates:
+            return []
+
+        OcrJob.query.filter(
+            OcrJob.id.in_(candidates),
+            OcrJob.status == OcrJob.STATUS_QUEUED
+        ).update({
+            'status': OcrJob.STATUS_PROCESSING,
+            'claimed_by': worker_id,
+            'attempts': OcrJob.attempts + 1,
+            'updated_at': db_now()
+        }, synchronize_session=False)
+        db.session.commit()
+
+        return OcrJob.query.filter(
+            OcrJob.id.in_(candidates),
+            OcrJob.status == OcrJob.STATUS_PROCESSING,
+            OcrJob.claimed_by == worker_id
+        ).order_by(OcrJob.created_at.asc()).all()
+
+    @staticmethod
+    def requeue_stale(timeout_seconds: int = None, max_attempts: int = None) -> int:
+        """
+        Return jobs stuck in processing (e.g. after a worker crash) to the queue.
+
+        Jobs already claimed ``max_attempts`` times are marked failed instead, so
+        an image that keeps crashing the worker is not retried forever.
+
+        Returns:
+            Number of jobs requeued
+        """
+        timeout_seconds = timeout_seconds or Config.OCR_JOB_TIMEOUT_SECONDS
+        max_attempts = max_attempts or Config.OCR_JOB_MAX_ATTEMPTS
+        cutoff = database_now() - timedelta(seconds=timeout_seconds)
+        stale = OcrJob.query.filter(
+            OcrJob.status == OcrJob.STATUS_PROCESSING,
+            OcrJob.updated_at < cutoff
+        )
+        abandoned = stale.filter(OcrJob.attempts >= max_attempts).with_entities(OcrJob.id, OcrJob.image_path).all()
+        if abandoned:
+            stale.filter(OcrJob.id.in_([row.id for row in abandoned])).update({
+                'status': OcrJob.STATUS_FAILED,
+                'error': f"Gave up after {max_attempts} attempts"
+            }, synchronize_session=False)
+        requeued = stale.filter(OcrJob.attempts < max_attempts)\
+            .update({'status': OcrJob.STATUS_QUEUED}, synchronize_session=False)
+        db.session.commit()
+
+        for row in abandoned:
+            delete_file(row.image_path)
+        if abandoned:
+            logging.warning("Failed %s OCR jobs stuck after %s attempts.", len(abandoned), max_attempts)
+        return requeued
+
+    @staticmethod
+    def _finish(job: OcrJob, worker_id: Optional[str], values: Dict) -> bool:
+        """
+        Apply ``values`` to a job that is still processing and claimed by ``worker_id``.
+
+        A job requeued by ``requeue_stale`` may have been claimed by another
+        worker meanwhile; that worker now owns the job and its image.
+        """
+        claimed = OcrJob.query.filter(OcrJob.id == job.id, OcrJob.status == OcrJob.STATUS_PROCESSING)
+        if worker_id is not None:
+            claimed = claimed.filter(OcrJob.claimed_by == worker_id)
+        finished = claimed.update(dict(values, updated_at=db_now()), synchronize_session=False) == 1
+        db.session.commit()
+        if not finished:
+            logging.warning("OCR job %s is no longer claimed by %s, dropping its outcome.", job.id, worker_id)
+        return finished
+
+    @staticmethod
+    def complete(job: OcrJob, expense_data: Dict, worker_id: str = None) -> bool:
+        """
+        Store the extracted expense data, mark the job done and delete its upload.
+
+        Returns:
+            False if the job was no longer claimed by ``worker_id``
+        """
+        finished = OcrJobService._finish(job, worker_id, {
+            'result': json.dumps(expense_data, default=str),
+            'file_name': expense_data.get('file_name'),
+            'status': OcrJob.STATUS_DONE,
+            'error': None
+        })
+        if finished:
+            delete_file(job.image_path)
+        return finished
+
+    @staticmethod
+    def fail(job: OcrJob, error: str, worker_id: str = None) -> bool:
+        """
+        Mark the job failed with an error message and delete its upload.
+
+        Returns:
+            False if the job was no longer claimed by ``worker_id``
+        """
+        finished = OcrJobService._finish(job, worker_id, {'status': OcrJob.STATUS_FAILED, 'error': error[:500]})
+        if finished:
+            delete_file(job.image_path)
+        return finished
+
+    @staticmethod
+    def retry(job: OcrJob, error: str, worker_id: str = None, max_attempts: int = None) -> bool:
+        """
+        Return the job to the queue after a transient error, keeping its upload.
+
+        Each claim counts as an attempt, so a job that already used
+        ``max_attempts`` claims is failed instead.
+
+        Returns:
+            False if the job was no longer claimed by ``worker_id``
+        """
+        max_attempts = max_attempts or Config.OCR_JOB_MAX_ATTEMPTS
+        if job.attempts >= max_attempts:
+            return OcrJobService.fail(job, f"Gave up after {max_attempts} attempts: {error}", worker_id)
+        return OcrJobService._finish(job, worker_id, {'status': OcrJob.STATUS_QUEUED, 'error': error[:500]})
+
+    @staticmethod
+    def _extract(user_id: str, jobs: List[OcrJob]) -> List[Dict]:
+        """Run one OCR call for ``jobs`` and return a draft per job."""
+        # Imported here so the API process never loads the OCR model
+        from app.services.expense_service import expense_service
+
+        drafts = expense_service.process_ticket_images(user_id, [job.image_path for job in jobs])
+        if len(drafts) != len(jobs):
+            raise ValueError(f"OCR returned {len(drafts)} results for {len(jobs)} images")
+        return drafts
+
+    @staticmethod
+    def _extract_each(user_id: str, jobs: List[OcrJob]) -> List:
+        """Run OCR per job, returning each job's draft or the exception it raised."""
+        outcomes = []
+        for job in jobs:
+            try:
+                outcomes.extend(OcrJobService._extract(user_id, [job]))
+            except Exception as e:
+                db.session.rollback()
+                logging.error("Error processing OCR job %s: %s", job.id, str(e))
+                outcomes.append(e)
+        return outcomes
+
+    @staticmethod
+    def _record(job: OcrJob, worker_id: str, outcome) -> None:
+        """Store a job's draft, or retry or fail it for the exception OCR raised."""
+        try:
+            if isinstance(outcome, TRANSIENT_ERRORS):
+                OcrJobService.retry(job, str(outcome), worker_id)
+            elif isinstance(outcome, Exception):
+                OcrJobService.fail(job, str(outcome), worker_id)
+            else:
+                OcrJobService.complete(job, outcome, worker_id)
+        except TRANSIENT_ERRORS as e:
+            db.session.rollback()
+            OcrJobService.retry(job, str(e), worker_id)
+
+    @staticmethod
+    def process(jobs: List[OcrJob], worker_id: str) -> List[OcrJob]:
+        """
+        Run OCR for jobs claimed by ``worker_id``, one batched call per user, and record the outcomes.
+
+        Transient errors (database or network) send the jobs back to the queue.
+        If a batch fails otherwise, its jobs are retried one by one so only the
+        job with the bad image is marked failed.
+        """
+        jobs_by_user: Dict[str, List[OcrJob]] = {}
+        for job in jobs:
+            jobs_by_user.setdefault(job.user_id, []).append(job)
+
+        for user_id, user_jobs in jobs_by_user.items():
+            try:
+                outcomes = OcrJobService._extract(user_id, user_jobs)
+            except TRANSIENT_ERRORS as e:
+                db.session.rollback()
+                logging.warning("Transient error processing OCR jobs for user %s, requeueing: %s", user_id, str(e))
+                outcomes = [e] * len(user_jobs)
+            except Exception as e:
+                db.session.rollback()
+                logging.error("Error processing OCR jobs for user %s: %s", user_id, str(e))
+                outcomes = [e] if len(user_jobs) == 1 else OcrJobService._extract_each(user_id, user_jobs)
+
+            for job, outcome in zip(user_jobs, outcomes):
+                try:
+                    OcrJobService._record(job, worker_id, outcome)
+                except Exception as e:
+                    # Left in processing; requeue_stale picks it up after the timeout
+                    db.session.rollback()
+                    logging.error("Error recording OCR job %s: %s", job.id, str(e))
+            logging.info("Processed %s OCR jobs for user %s.", len(user_jobs), user_id)
+        return jobs
+
+
+ocr_job_service = OcrJobService()
@@ -7,29 +7,40 @@ import re
 from typing import List, Dict, Optional
 from app.config import Config
 from app.utils.helpers import extract_highest_amount, extract_amount_from_lines, match_store
+from app.utils.metrics import track_ocr
 from app.services.story_category_service import StoreCategoryService
-from paddleocr import PaddleOCR
 
 class OCRService:
     """Service for extracting text and data from ticket images using PaddleOCR."""
     
     def __init__(self, languages: List[str] = Config.OCR_LANGUAGES):
         """Initialize OCR service with specified languages."""
-        ocr = PaddleOCR(use_angle_cls=True, lang='es')
-        self.reader = ocr
+        self._reader = None
         # self.languages = languages
+
+    @property
+    def reader(self):
+        """PaddleOCR model, imported and loaded on first use so importing the service stays cheap."""
+        if self._reader is None:
+            from paddleocr import PaddleOCR
+            self._reader = PaddleOCR(use_angle_cls=True, lang='es')
+        return self._reader
     
     def extract_text(self, image_path: str) -> str:
         """Extract raw text from image."""
+        return self.extract_text_batch([image_path])[0]
+    
+    def extract_text_batch(self, image_paths: List[str]) -> List[str]:
+        """Extract raw text from several images in a single OCR call."""
         try:
-            # Read image
-            response = self.reader.ocr(image_path)
+            # Read images; PaddleOCR batches list inputs through the model
+            with track_ocr():
+                response = self.reader.ocr(image_paths)
 
             # Extract only plain text from OCR response
-            # texts = [line[1][0] for line in response[0]]
-            texts = response[0]['rec_texts']
-            logging.info(f"OCR response: {texts}")
-            return "\n".join(texts)
+            texts = [result['rec_texts'] for result in response]
+            logging.debug("OCR response: %s", texts)
+            return ["\n".join(lines) for lines in texts]
         except Exception as e:
             raise Exception(f"{str(e)}")
     
@@ -38,20 +49,31 @@ class OCRService:
         Extract structured data from ticket image.
         Returns dictionary with extracted information.
         """
+        return self.extract_ticket_data_batch([image_path])[0]
+    
+    def extract_ticket_data_batch(self, image_paths: List[str]) -> List[Dict]:
+        """
+        Extract structured data from several ticket images.
+        Returns one dictionary per image, in the same order.
+        """
         try:
             # Extract raw text
-            raw_text = self.extract_text(image_path)
+            raw_texts = self.extract_text_batch(image_paths)
             
-            # Parse the text to extract structured data
-            ticket_data = self._parse_ticket_text(raw_text)
-            # ticket_data['raw_text'] = raw_text
-            # logging.info(f"Extracted ticket data: {ticket_data}")
-            return ticket_data
+            # Store keywords are loaded once for the whole batch
+            store_categories = self._load_store_categories()
+            return [self._parse_ticket_text(raw_text, store_categories) for raw_text in raw_texts]
             
         except Exception as e:
             raise Exception(f"{str(e)}")
 
-    def _parse_ticket_text(self, text: str) -> Dict:
+    @staticmethod
+    def _load_store_categories() -> Dict[str, str]:
+        """Load the store name to category mapping used for matching."""
+        store_categories = StoreCategoryService.get_all_store_categories()
+        return {category.store_name: category.category for category in store_categories}
+
+    def _parse_ticket_text(self, text: str, store_categories_dict: Optional[Dict[str, str]] = None) -> Dict:
         """Parse raw OCR text to extract structured ticket information."""
         data = {
             'payment_concept': None,
@@ -113,8 +135,8 @@ class OCRService:
                     data['payment_date'] = match.group(1)
                     break
 
-        store_categories = StoreCategoryService.get_all_store_categories()
-        store_categories_dict = {category.store_name: category.category for category in store_categories}
+        if store_categories_dict is None:
+            store_categories_dict = self._load_store_categories()
         store_keyword, category = match_store(lines, store_categories_dict)
         
         if store_keyword and category:
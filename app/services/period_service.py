@@ -0,0 +1,153 @@
+"""
+Service layer for comparing totals across consecutive periods.
+"""
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import case, func
+from app.extensions import db
+
+PERIODS = ('week', 'month', 'quarter', 'year')
+MAX_PERIODS = 60
+
+MONTH_NAMES = {
+    1: 'Jan', 2: 'Feb', 3: 'Mar', 4: 'Apr',
+    5: 'May', 6: 'Jun', 7: 'Jul', 8: 'Aug',
+    9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dec'
+}
+
+
+class PeriodService:
+    """Service for fetching totals of N consecutive periods in one grouped query."""
+
+    @staticmethod
+    def _shift_month(year: int, month: int, months: int) -> Tuple[int, int]:
+        index = year * 12 + (month - 1) + months
+        return index // 12, index % 12 + 1
+
+    @staticmethod
+    def validate_period_args(period: str, periods: int, trend_window: Optional[int] = None) -> Optional[str]:
+        """Return an error message for invalid comparison arguments, or None."""
+        if period not in PERIODS:
+            return f"period must be one of: {', '.join(PERIODS)}"
+        if not 1 <= periods <= MAX_PERIODS:
+            return f"periods must be between 1 and {MAX_PERIODS}"
+        if trend_window is not None and not 1 <= trend_window < MAX_PERIODS:
+            return f"trend_window must be between 1 and {MAX_PERIODS - 1}"
+        return None
+
+    @staticmethod
+    def period_start(day: date, period: str, offset: int = 0) -> date:
+        """Return the first day of the period containing ``day``, shifted by ``offset`` periods."""
+        if period == 'week':
+            return day - timedelta(days=day.weekday()) + timedelta(weeks=offset)
+        if period == 'month':
+            year, month = PeriodService._shift_month(day.year, day.month, offset)
+            return date(year, month, 1)
+        if period == 'quarter':
+            first_month = (day.month - 1) // 3 * 3 + 1
+            year, month = PeriodService._shift_month(day.year, first_month, offset * 3)
+            return date(year, month, 1)
+        if period == 'year':
+            return date(day.year + offset, 1, 1)
+        raise ValueError(f"Invalid period '{period}'. Allowed: {', '.join(PERIODS)}")
+
+    @staticmethod
+    def period_label(start: date, period: str) -> str:
+        """Human-readable label for the period starting on ``start``."""
+        if period == 'week':
+            iso_year, iso_week, _ = start.isocalendar()
+            return f"{iso_year}-W{iso_week:02d}"
+        if period == 'month':
+            return f"{start.year}-{start.month:02d}"
+        if period == 'quarter':
+            return f"{start.year}-Q{(start.month - 1) // 3 + 1}"
+        return str(start.year)
+
+    def get_period_totals(self, date_column, amount_column, filters: List, period: str = 'month',
+                          periods: int = 2, anchor: Optional[date] = None) -> List[Dict]:
+        """
+        Get totals for ``periods`` consecutive periods ending with the one containing ``anchor``.
+
+        Args:
+            date_column: Model date column to bucket on (e.g. Expense.payment_date)
+            amount_column: Model column to sum (e.g. Expense.total)
+            filters: Extra filter expressions, typically the user_id scope
+            period: One of 'week', 'month', 'quarter', 'year'
+            periods: Number of periods to return
+            anchor: Day inside the most recent period (default: today)
+
+        Returns:
+            List of dictionaries ordered oldest to newest with start, end, label and total
+        """
+        if periods < 1:
+            raise ValueError("periods must be at least 1")
+
+        anchor = anchor or date.today()
+        starts = [self.period_start(anchor, period, -offset) for offset in range(periods - 1, -1, -1)]
+        end = self.period_start(anchor, period, 1)
+
+        # Newest bucket first so the first matching branch wins
+        bucket = case(
+            *[(date_column >= start, index) for index, start in reversed(list(enumerate(starts)))]
+        )
+        rows = db.session.query(bucket, func.sum(amount_column)).filter(
+            *filters,
+            date_column >= starts[0],
+            date_column < end
+        ).group_by(bucket).all()
+        totals = {index: total or 0.0 for index, total in rows}
+
+        bounds = starts + [end]
+        return [
+            {
+                'label': self.period_label(start, period),
+                'start': start.isoformat(),
+                'end': (bounds[index + 1] - timedelta(days=1)).isoformat(),
+                'total': round(totals.get(index, 0.0), 2)
+            }
+            for index, start in enumerate(starts)
+        ]
+
+    def compare_periods(self, date_column, amount_column, filters: List, period: str = 'month',
+                        periods: int = 2, anchor: Optional[date] = None,
+                        trend_window: Optional[int] = None) -> Dict:
+        """
+        Compare the current period against the previous one and an optional trailing average.
+
+        Returns:
+            Dictionary with current/previous totals, percentage change, the per-period series
+            and, when ``trend_window`` is given, the average of that many preceding periods
+        """
+        periods = max(periods, 2, (trend_window or 0) + 1)
+        series = self.get_period_totals(date_column, amount_column, filters, period, periods, anchor)
+
+        current_total = series[-1]['total']
+        previous_total = series[-2]['total']
+
+        comparison = {
+            'period': period,
+            'current_total': current_total,
+            'previous_total': previous_total,
+            'percentage_change': self.percentage_change(current_total, previous_total),
+            'periods': series
+        }
+
+        if trend_window:
+            window = [item['total'] for item in series[-trend_window - 1:-1]]
+            trend_average = sum(window) / len(window)
+            comparison['trend_average'] = round(trend_average, 2)
+            comparison['trend_change'] = self.percentage_change(current_total, trend_average)
+
+        return comparison
+
+    @staticmethod
+    def percentage_change(current: float, previous: float) -> float:
+        """Percentage change from ``previous`` to ``current``; 100% when growing from zero."""
+        if previous > 0:
+            change = ((current - previous) / previous) * 100
+        else:
+            change = 0.0 if current == 0 else 100.0
+        return round(change, 2)
+
+
+period_service = PeriodService()
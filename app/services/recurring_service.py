@@ -0,0 +1,220 @@
+"""
+Service layer for recurring incomes and expenses.
+
+``run_due`` materialises every occurrence that is due, including ones missed
+while the scheduler was down. Each batch of rules is one transaction with bulk
+inserts and a single balance UPDATE per user. The rules are read FOR UPDATE so
+an overlapping run (the scheduler and a user's /recurring) waits for the
+other; where the database does not lock rows, the unique (rule, date)
+constraints on incomes and expenses reject the double booking and the batch is
+retried without the occurrences the other run already booked.
+"""
+import logging
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Optional, Set, Tuple
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from app.config import Config
+from app.extensions import db
+from app.models.expense import Expense
+from app.models.income import Income
+from app.models.recurring_rule import RecurringRule
+from app.models.user import User
+from app.utils.helpers import parse_date, expense_fingerprint
+
+FREQUENCY_STEPS = {
+    'daily': relativedelta(days=1),
+    'weekly': relativedelta(weeks=1),
+    'monthly': relativedelta(months=1),
+    'yearly': relativedelta(years=1),
+}
+MAX_CATCH_UP = 1000  # Occurrences per rule and run; the rest follow in the next batch
+
+
+class RecurringService:
+    """Service for managing recurring rules and materialising their occurrences."""
+
+    @staticmethod
+    def validate_rule_data(data: Dict) -> Optional[str]:
+        """Return an error message for invalid rule data, or None."""
+        if data.get('kind') not in RecurringRule.KINDS:
+            return f"kind must be one of: {', '.join(RecurringRule.KINDS)}"
+        if data.get('frequency', 'monthly') not in RecurringRule.FREQUENCIES:
+            return f"frequency must be one of: {', '.join(RecurringRule.FREQUENCIES)}"
+        if not data.get('name'):
+            return "name is required"
+        try:
+            if float(data.get('amount')) <= 0:
+                return "amount must be greater than 0"
+            if int(data.get('interval', 1)) < 1:
+                return "interval must be at least 1"
+        except (TypeError, ValueError):
+            return "amount and interval must be numbers"
+        for field in ('start_date', 'end_date'):
+            if data.get(field) and not parse_date(data[field]):
+                return f"Invalid date format: {field}"
+        start_date = parse_date(data.get('start_date') or date.today())
+        if data.get('end_date') and parse_date(data['end_date']) < start_date:
+            return "end_date must not be before start_date"
+        return None
+
+    @staticmethod
+    def occurrence_date(rule: RecurringRule, number: int) -> date:
+        """Date of the ``number``-th occurrence (0-based), counted from the start date."""
+        return rule.start_date + FREQUENCY_STEPS[rule.frequency] * (number * rule.interval)
+
+    @staticmethod
+    def create_rule(user_id: str, data: Dict) -> RecurringRule:
+        """Create a recurring rule; its first occurrence is on ``start_date``."""
+        rule = RecurringRule.from_dict({
+            **data,
+            'user_id': user_id,
+            'amount': float(data['amount']),
+            'interval': int(data.get('interval', 1)),
+            'category': (data.get('category') or 'uncategorized').lower() if data['kind'] == RecurringRule.KIND_EXPENSE else None,
+            'start_date': parse_date(data.get('start_date') or date.today()),
+            'end_date': parse_date(data['end_date']) if data.get('end_date') else None
+        })
+        db.session.add(rule)
+        db.session.commit()
+        return rule
+
+    @staticmethod
+    def get_rules(user_id: str, active_only: bool = True) -> List[RecurringRule]:
+        """Get the recurring rules of a user, next due first."""
+        query = RecurringRule.query.filter_by(user_id=user_id)
+        if active_only:
+            query = query.filter_by(active=True)
+        return query.order_by(RecurringRule.next_run.asc()).all()
+
+    @staticmethod
+    def deactivate_rule(user_id: str, rule_id: str) -> bool:
+        """Stop a rule; occurrences already booked are kept."""
+        updated = RecurringRule.query.filter_by(id=rule_id, user_id=user_id)\
+            .update({'active': False, 'next_run': None}, synchronize_session=False)
+        db.session.commit()
+        return bool(updated)
+
+    @staticmethod
+    def _occurrence_row(rule: RecurringRule, occurrence: date) -> Dict:
+        if rule.kind == RecurringRule.KIND_INCOME:
+            return {
+                'source': rule.name,
+                'amount': rule.amount,
+                'income_date': occurrence,
+                'description': rule.description,
+                'user_id': rule.user_id,
+                'recurring_rule_id': rule.id
+            }
+        return {
+            'payment_concept': rule.name,
+            'note': rule.description,
+            'category': rule.category,
+            'subtotal': rule.amount,
+            'tax': 0,
+            'total': rule.amount,
+            'payment_date': occurrence,
+            'fingerprint': expense_fingerprint(rule.name, rule.amount, occurrence),
+            'user_id': rule.user_id,
+            'recurring_rule_id': rule.id
+        }
+
+    @staticmethod
+    def run_due(today: Optional[date] = None, batch_size: int = None, user_id: Optional[str] = None) -> int:
+        """
+        Book every occurrence due up to ``today``.
+
+        Args:
+            today: Last day to materialise (default: today)
+            batch_size: Rules per transaction (default: RECURRING_BATCH_SIZE)
+            user_id: Only run the rules of this user
+
+        Returns:
+            Number of incomes and expenses created
+        """
+        today = today or date.today()
+        batch_size = batch_size or Config.RECURRING_BATCH_SIZE
+        created = 0
+
+        while True:
+            rules = RecurringService._due_rules(today, batch_size, user_id)
+            if not rules:
+                return created
+            try:
+                created += RecurringService._book(rules, today)
+            except IntegrityError:
+                # Another run committed some of these occurrences first: re-read
+                # the rules it left due and skip what is already booked
+                db.session.rollback()
+                rules = RecurringService._due_rules(today, batch_size, user_id)
+                booked = RecurringService._booked_occurrences(rules)
+                logging.info("Recurring run overlapped another; skipping %s booked occurrences.", len(booked))
+                created += RecurringService._book(rules, today, booked)
+
+    @staticmethod
+    def _due_rules(today: date, batch_size: int, user_id: Optional[str]) -> List[RecurringRule]:
+        query = RecurringRule.query.filter(RecurringRule.active.is_(True), RecurringRule.next_run <= today)
+        if user_id:
+            query = query.filter(RecurringRule.user_id == user_id)
+        return query.order_by(RecurringRule.next_run.asc()).limit(batch_size).with_for_update().all()
+
+    @staticmethod
+    def _booked_occurrences(rules: List[RecurringRule]) -> Set[Tuple[str, date]]:
+        """(rule id, date) of the occurrences of ``rules`` that are already saved."""
+        rule_ids = [rule.id for rule in rules]
+        if not rule_ids:
+            return set()
+        incomes = db.session.query(Income.recurring_rule_id, Income.income_date)\
+            .filter(Income.recurring_rule_id.in_(rule_ids))
+        expenses = db.session.query(Expense.recurring_rule_id, Expense.payment_date)\
+            .filter(Expense.recurring_rule_id.in_(rule_ids))
+        return {(rule_id, day) for rule_id, day in incomes.union_all(expenses).all()}
+
+    @staticmethod
+    def _book(rules: List[RecurringRule], today: date, booked: Set[Tuple[str, date]] = frozenset()) -> int:
+        """Insert the due occurrences of ``rules`` not in ``booked`` and advance the rules, in one transaction."""
+        income_rows, expense_rows = [], []
+        balance_deltas = defaultdict(float)
+        for rule in rules:
+            number = rule.occurrences
+            occurrence = RecurringService.occurrence_date(rule, number)
+            while occurrence <= today and (rule.end_date is None or occurrence <= rule.end_date) \
+                    and number - rule.occurrences < MAX_CATCH_UP:
+                if (rule.id, occurrence) not in booked:
+                    row = RecurringService._occurrence_row(rule, occurrence)
+                    if rule.kind == RecurringRule.KIND_INCOME:
+                        income_rows.append(row)
+                        balance_deltas[rule.user_id] += rule.amount
+                    else:
+                        expense_rows.append(row)
+                        balance_deltas[rule.user_id] -= rule.amount
+                number += 1
+                occurrence = RecurringService.occurrence_date(rule, number)
+
+            rule.occurrences = number
+            if rule.end_date is not None and occurrence > rule.end_date:
+                rule.next_run = None
+                rule.active = False
+            else:
+                rule.next_run = occurrence
+
+        try:
+            if income_rows:
+                db.session.execute(insert(Income), income_rows)
+            if expense_rows:
+                db.session.execute(insert(Expense), expense_rows)
+            for balance_user_id, delta in balance_deltas.items():
+                User.query.filter_by(id=balance_user_id).update(
+                    {'accumulated_balance': User.accumulated_balance + delta},
+                    synchronize_session=False
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return len(income_rows) + len(expense_rows)
+
+
+recurring_service = RecurringService()
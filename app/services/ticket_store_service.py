@@ -0,0 +1,287 @@
+"""
+Service layer for the content-addressed ticket image store.
+
+Images are named after the SHA-256 of their content and sharded as
+``FILE_FOLDER/ab/cd/<sha256>.webp``, so a receipt uploaded twice is stored
+once. At ingest the image is transcoded to WebP and thumbnails
+``<sha256>_<size>.webp`` are generated next to it; images Pillow cannot
+decode are kept as-is. The ``ticket_blobs`` table counts how many expenses
+point at each blob; blobs nobody references are removed by ``collect_garbage``.
+"""
+import glob
+import hashlib
+import logging
+import os
+import re
+import shutil
+import uuid
+from collections import Counter
+from datetime import timedelta
+from typing import Iterable, Optional
+from sqlalchemy.exc import IntegrityError
+from app.config import Config
+from app.extensions import db
+from app.models.ticket_blob import TicketBlob
+from app.utils.timestamps import database_now, db_now
+
+BLOB_NAME_PATTERN = re.compile(r'^[0-9a-f]{64}(\.[a-z0-9]{1,5})?$')
+HASH_CHUNK_SIZE = 1024 * 1024
+WEBP_EXTENSION = '.webp'
+
+
+class MissingTicketImageError(Exception):
+    """Raised when an expense points at a ticket image that is no longer stored."""
+
+    def __init__(self, file_names: list):
+        super().__init__(f"Ticket image no longer stored: {', '.join(file_names)}")
+        self.file_names = file_names
+
+
+class TicketStoreService:
+    """Service for storing, resolving and reclaiming ticket images."""
+
+    @staticmethod
+    def is_blob_name(file_name: str) -> bool:
+        """Whether ``file_name`` is a content-addressed blob name."""
+        return bool(file_name) and bool(BLOB_NAME_PATTERN.match(file_name))
+
+    @staticmethod
+    def blob_path(file_name: str) -> str:
+        """Sharded path of a blob inside the files directory."""
+        return os.path.join(Config.FILE_FOLDER, file_name[:2], file_name[2:4], file_name)
+
+    @staticmethod
+    def thumbnail_path(file_name: str, size: int) -> str:
+        """Path of the ``size`` px thumbnail of a blob."""
+        digest = os.path.splitext(file_name)[0]
+        return os.path.join(os.path.dirname(TicketStoreService.blob_path(file_name)), f"{digest}_{size}{WEBP_EXTENSION}")
+
+    @staticmethod
+    def resolve_path(user_id: str, file_name: str, size: Optional[int] = None) -> str:
+        """
+        Absolute path of an expense image, for blobs and legacy per-user files alike.
+
+        With ``size`` the matching thumbnail is returned when one exists; images
+        smaller than the thumbnail, and legacy files, fall back to the full image.
+        """
+        if TicketStoreService.is_blob_name(file_name):
+            if size:
+                thumbnail = TicketStoreService.thumbnail_path(file_name, size)
+                if os.path.exists(thumbnail):
+                    return os.path.abspath(thumbnail)
+            return os.path.abspath(TicketStoreService.blob_path(file_name))
+        # Images saved before the blob store live in FILE_FOLDER/<user_id>/
+        return os.path.abspath(os.path.join(Config.FILE_FOLDER, user_id, os.path.basename(file_name)))
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _save_atomic(image, destination: str):
+        temp_path = f"{destination}.{uuid.uuid4().hex}.tmp"
+        image.save(temp_path, 'WEBP', quality=Config.TICKET_WEBP_QUALITY, method=4)
+        os.replace(temp_path, destination)
+
+    @staticmethod
+    def _write_renditions(image_path: str, file_name: str) -> bool:
+        """Transcode an image to WebP plus thumbnails. Returns False if Pillow cannot read it."""
+        # Pillow is only needed at ingest (bot, worker), not on API startup
+        from PIL import Image, ImageOps
+        try:
+            with Image.open(image_path) as source:
+                image = ImageOps.exif_transpose(source)
+                if image.mode not in ('RGB', 'RGBA', 'L'):
+                    image = image.convert('RGB')
+                for size in Config.TICKET_THUMBNAIL_SIZES:
+                    if max(image.size) > size:
+                        thumbnail = image.copy()
+                        thumbnail.thumbnail((size, size))
+                        TicketStoreService._save_atomic(thumbnail, TicketStoreService.thumbnail_path(file_name, size))
+                # Full image last: its presence marks the renditions as complete
+                TicketStoreService._save_atomic(image, TicketStoreService.blob_path(file_name))
+            return True
+        except (OSError, ValueError) as e:
+            logging.warning("Could not transcode ticket image %s, storing original: %s", image_path, str(e))
+            return False
+
+    @staticmethod
+    def _link(image_path: str, destination: str):
+        temp_path = f"{destination}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.link(image_path, temp_path)
+        except OSError:
+            shutil.copyfile(image_path, temp_path)
+        # Atomic: concurrent writers of the same content simply replace each other
+        os.replace(temp_path, destination)
+
+    @staticmethod
+    def store(image_path: str) -> str:
+        """
+        Add an image to the store and return its blob name.
+
+        Nothing is written when the same content is already stored. Images are
+        transcoded to WebP with thumbnails; anything Pillow cannot decode is
+        hard-linked into place (copied only across filesystems). The source file
+        is left untouched, so callers still delete their temporary copy.
+        """
+        digest = TicketStoreService._hash_file(image_path)
+        for _ in range(2):
+            file_name = TicketStoreService._write_files(image_path, digest)
+            TicketStoreService._register(file_name)
+            # collect_garbage may have removed the files between the write and the
+            # registration; once registered they are kept for the grace period
+            if os.path.exists(TicketStoreService.blob_path(file_name)):
+                break
+        return file_name
+
+    @staticmethod
+    def _write_files(image_path: str, digest: str) -> str:
+        """Write the renditions of an image unless already stored. Returns the blob name."""
+        webp_name = f"{digest}{WEBP_EXTENSION}"
+        original_name = f"{digest}{os.path.splitext(image_path)[1].lower()}"
+
+        if os.path.exists(TicketStoreService.blob_path(webp_name)):
+            return webp_name
+        if os.path.exists(TicketStoreService.blob_path(original_name)):
+            return original_name
+        os.makedirs(os.path.dirname(TicketStoreService.blob_path(webp_name)), exist_ok=True)
+        if TicketStoreService._write_renditions(image_path, webp_name):
+            return webp_name
+        TicketStoreService._link(image_path, TicketStoreService.blob_path(original_name))
+        return original_name
+
+    @staticmethod
+    def _blob_files(file_name: str) -> list:
+        """The stored image and all of its thumbnails."""
+        path = TicketStoreService.blob_path(file_name)
+        digest = os.path.splitext(file_name)[0]
+        return [path] + glob.glob(os.path.join(os.path.dirname(path), f"{digest}_*{WEBP_EXTENSION}"))
+
+    @staticmethod
+    def _register(file_name: str):
+        """
+        Create the blob row, or refresh it so garbage collection waits for pending drafts.
+
+        The UPDATE waits for a ``collect_garbage`` transaction deleting the same
+        row; if that one wins, the row is inserted again.
+        """
+        touched = TicketBlob.query.filter_by(file_name=file_name).update(
+            {'updated_at': db_now()}, synchronize_session=False
+        )
+        db.session.commit()
+        if touched:
+            return
+        size = sum(os.path.getsize(path) for path in TicketStoreService._blob_files(file_name) if os.path.exists(path))
+        try:
+            db.session.add(TicketBlob(file_name=file_name, size=size))
+            db.session.commit()
+        except IntegrityError:
+            # Another process registered the same content first
+            db.session.rollback()
+
+    @staticmethod
+    def add_references(file_names: Iterable[Optional[str]]):
+        """
+        Count new expense references. Runs in the caller's transaction.
+
+        Raises:
+            MissingTicketImageError: if a blob was garbage-collected, e.g. for a
+                draft kept longer than ``TICKET_GC_GRACE_SECONDS``; the caller
+                should roll back instead of saving an expense without its image
+        """
+        counts = Counter(name for name in file_names if TicketStoreService.is_blob_name(name))
+        missing = []
+        for file_name, count in counts.items():
+            touched = TicketBlob.query.filter_by(file_name=file_name).update(
+                {'ref_count': TicketBlob.ref_count + count, 'updated_at': db_now()},
+                synchronize_session=False
+            )
+            if not touched:
+                missing.append(file_name)
+        if missing:
+            raise MissingTicketImageError(missing)
+
+    @staticmethod
+    def release(user_id: str, file_name: Optional[str]):
+        """
+        Drop one expense reference. Runs in the caller's transaction.
+
+        Unreferenced blobs are reclaimed by ``collect_garbage``; legacy per-user
+        files are not shared and are deleted right away.
+        """
+        if not file_name:
+            return
+        if TicketStoreService.is_blob_name(file_name):
+            TicketBlob.query.filter(
+                TicketBlob.file_name == file_name,
+                TicketBlob.ref_count > 0
+            ).update(
+                {'ref_count': TicketBlob.ref_count - 1, 'updated_at': db_now()},
+                synchronize_session=False
+            )
+            return
+        legacy_path = TicketStoreService.resolve_path(user_id, file_name)
+        try:
+            os.remove(legacy_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning("Could not delete ticket image %s: %s", legacy_path, str(e))
+
+    @staticmethod
+    def collect_garbage(grace_seconds: int = None) -> int:
+        """
+        Delete blobs that have had no references for ``grace_seconds``.
+
+        The grace period keeps images of drafts that are still being edited.
+        Each row is deleted only if it is still unreferenced and stale, and the
+        files are removed before that transaction commits: a concurrent
+        ``store`` or ``add_references`` of the same blob waits on the deleted
+        row, so it either refreshes the row first (and the blob is kept) or
+        finds it gone. ``store`` then writes the files again, while
+        ``add_references`` raises ``MissingTicketImageError``.
+
+        Returns:
+            Number of blobs removed
+        """
+        if grace_seconds is None:
+            grace_seconds = Config.TICKET_GC_GRACE_SECONDS
+        cutoff = database_now() - timedelta(seconds=grace_seconds)
+        candidates = [
+            row.file_name for row in db.session.query(TicketBlob.file_name).filter(
+                TicketBlob.ref_count == 0,
+                TicketBlob.updated_at < cutoff
+            ).all()
+        ]
+
+        removed = 0
+        for file_name in candidates:
+            # Re-check in the DELETE so a blob re-used meanwhile is kept
+            deleted = TicketBlob.query.filter(
+                TicketBlob.file_name == file_name,
+                TicketBlob.ref_count == 0,
+                TicketBlob.updated_at < cutoff
+            ).delete(synchronize_session=False)
+            if not deleted:
+                db.session.rollback()
+                continue
+            try:
+                for path in TicketStoreService._blob_files(file_name):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+            except OSError:
+                db.session.rollback()
+                raise
+            db.session.commit()
+            removed += 1
+        return removed
+
+
+ticket_store_service = TicketStoreService()
@@ -0,0 +1,88 @@
+"""
+Service layer for dashboard access and refresh tokens.
+
+Every token carries the user's ``token_version`` in its ``ver`` claim. Bumping
+the version (password change, logout) revokes every token issued before it.
+Validating a token never touches the database: the versions of users who
+revoked their tokens are cached in memory and re-read every
+TOKEN_REVOCATION_SYNC_SECONDS, so other API processes pick up a revocation
+within that interval.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from flask_jwt_extended import create_access_token, create_refresh_token
+from app.config import Config
+from app.extensions import db
+from app.models.user import User
+
+VERSION_CLAIM = 'ver'
+
+
+class TokenService:
+    """Service for issuing tokens and checking them against the revocation cache."""
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._synced_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def issue_tokens(user: User) -> Dict[str, str]:
+        """Create an access and a refresh token for a user."""
+        claims = {VERSION_CLAIM: user.token_version or 0}
+        return {
+            'access_token': create_access_token(identity=user.id, additional_claims=claims),
+            'refresh_token': create_refresh_token(identity=user.id, additional_claims=claims)
+        }
+
+    @staticmethod
+    def refresh_access_token(jwt_payload: Dict) -> str:
+        """Create a new access token from a valid refresh token's claims, without a DB read."""
+        return create_access_token(
+            identity=jwt_payload['sub'],
+            additional_claims={VERSION_CLAIM: jwt_payload.get(VERSION_CLAIM, 0)}
+        )
+
+    def sync(self, force: bool = False):
+        """Reload the revoked versions from the database when the cache is stale."""
+        now = time.monotonic()
+        if not force and self._synced_at is not None \
+                and now - self._synced_at < Config.TOKEN_REVOCATION_SYNC_SECONDS:
+            return
+        with self._lock:
+            if not force and self._synced_at is not None \
+                    and now - self._synced_at < Config.TOKEN_REVOCATION_SYNC_SECONDS:
+                return
+            rows = db.session.query(User.id, User.token_version).filter(User.token_version > 0).all()
+            self._versions = dict(rows)
+            self._synced_at = time.monotonic()
+            logging.debug("Token revocation cache synced: %s users", len(rows))
+
+    def is_revoked(self, jwt_payload: Dict) -> bool:
+        """Whether a token was issued before its user's current token version."""
+        self.sync()
+        current = self._versions.get(jwt_payload.get('sub'), 0)
+        return jwt_payload.get(VERSION_CLAIM, 0) < current
+
+    def revoke_user_tokens(self, user_id: str) -> int:
+        """Invalidate every token issued to a user. Returns the new token version."""
+        User.query.filter_by(id=user_id).update(
+            {'token_version': User.token_version + 1}, synchronize_session=False
+        )
+        db.session.commit()
+        version = db.session.query(User.token_version).filter_by(id=user_id).scalar() or 0
+        with self._lock:
+            self._versions[user_id] = version
+        logging.info("Tokens revoked for user %s (version %s)", user_id, version)
+        return version
+
+    def clear(self):
+        """Drop the cache; the next check reloads it."""
+        with self._lock:
+            self._versions = {}
+            self._synced_at = None
+
+
+token_service = TokenService()
@@ -26,7 +26,7 @@ class UserService:
 
         user = User.query.filter_by(telegram_id=telegram_id).first()
         if user:
-            logging.info(f"User found: {telegram_id} - {first_name=}")
+            logging.info("User found: %s - first_name=%r", telegram_id, first_name)
             return user
 
         user = User(
@@ -44,7 +44,7 @@ class UserService:
 
         db.session.commit()
 
-        logging.info(f"New user created: {telegram_id} - {first_name}")
+        logging.info("New user created: %s - %s", telegram_id, first_name)
         return user
     
     @staticmethod
@@ -71,11 +71,6 @@ class UserService:
         """Retrieve a user by their Telegram ID."""
         return User.query.filter_by(telegram_id=telegram_id).first()
     
-    @staticmethod
-    def get_user_by_token(token: str) -> User:
-        """Retrieve a user by their token."""
-        return User.query.filter_by(vinculation_token=token).first()
-    
     @staticmethod
     def get_user_by_email(email: str) -> User:
         """Retrieve a user by their email."""
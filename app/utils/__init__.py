@@ -5,12 +5,14 @@ from .helpers import (
     calculate_tax_from_total, calculate_total_from_subtotal, clean_ocr_text,
     create_response, parse_date, clean_image, delete_file, format_log_json, extract_highest_amount,
     extract_amount_from_lines, match_store, hash_password, verify_password, generate_secure_token,
-    generate_vinculation_token, utc_now, utc_timestamp, to_datetime
+    generate_vinculation_token, utc_now, utc_timestamp, to_datetime, normalize_concept, expense_fingerprint,
+    requested_version
 )
 from .messages_templates import (
     welcome_message, help_message, expense_message, edit_message, handle_message, income_command, income_help_message,
     balance_message, summary_message, link_account_message, new_balance_message, expense_help_message, income_help_message,
-    dashboard_message
+    dashboard_message, album_message, pending_drafts_message, duplicate_expense_message,
+    recurring_help_message, recurring_message, forecast_message, anomaly_message
 )
 
 __all__ = [
@@ -20,8 +22,9 @@ __all__ = [
     'create_response', 'parse_date', 'clean_image', 'delete_file', 'format_log_json',
     'extract_highest_amount', 'extract_amount_from_lines', 'match_store', 'hash_password', 
     'verify_password', 'generate_secure_token', 'generate_vinculation_token',
-    'utc_now', 'utc_timestamp', 'to_datetime',
+    'utc_now', 'utc_timestamp', 'to_datetime', 'normalize_concept', 'expense_fingerprint', 'requested_version',
     'welcome_message', 'help_message', 'expense_message', 'edit_message', 'handle_message', 'income_command', 'income_help_message',
     'balance_message', 'summary_message', 'link_account_message', 'new_balance_message', 'expense_help_message', 'income_help_message',
-    'dashboard_message'
+    'dashboard_message', 'album_message', 'pending_drafts_message', 'duplicate_expense_message',
+    'recurring_help_message', 'recurring_message', 'forecast_message', 'anomaly_message'
 ]
\ No newline at end of file
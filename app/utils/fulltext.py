@@ -0,0 +1,108 @@
+"""
+Full-text search over expense text columns.
+
+MySQL uses the FULLTEXT index declared on the Expense model. SQLite gets an
+FTS5 table kept in sync by triggers; it is created here because neither
+``create_all`` nor migrations know about virtual tables. The implicit
+``rowid`` of ``expenses`` (keyed by a BINARY(16) id) may be renumbered by
+``VACUUM``, so FTS5 rows are keyed by ``expenses_fts_keys.id``, an
+INTEGER PRIMARY KEY mapped to the expense id, which never changes.
+"""
+
+import logging
+import re
+from typing import List
+from sqlalchemy import Table, event, inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+FTS_COLUMNS = ('payment_concept', 'note', 'category')
+SQLITE_FTS_TABLE = 'expenses_fts'
+SQLITE_FTS_KEYS_TABLE = 'expenses_fts_keys'
+MAX_SEARCH_TERMS = 10
+
+_columns = ', '.join(FTS_COLUMNS)
+_new_values = ', '.join(f'new.{column}' for column in FTS_COLUMNS)
+_new_assignments = ', '.join(f'{column} = new.{column}' for column in FTS_COLUMNS)
+_expense_values = ', '.join(f'expenses.{column}' for column in FTS_COLUMNS)
+_TRIGGERS = [f'{SQLITE_FTS_TABLE}_ai', f'{SQLITE_FTS_TABLE}_ad', f'{SQLITE_FTS_TABLE}_au']
+
+
+def _key_of(expense_id: str) -> str:
+    return f"(SELECT id FROM {SQLITE_FTS_KEYS_TABLE} WHERE expense_id = {expense_id})"
+
+
+SQLITE_FTS_DDL = [
+    f"CREATE TABLE IF NOT EXISTS {SQLITE_FTS_KEYS_TABLE} (id INTEGER PRIMARY KEY, expense_id BLOB NOT NULL UNIQUE)",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5("
+    f"{_columns}, tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {_TRIGGERS[0]} AFTER INSERT ON expenses BEGIN "
+    f"INSERT INTO {SQLITE_FTS_KEYS_TABLE}(expense_id) VALUES (new.id); "
+    f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, {_columns}) VALUES ({_key_of('new.id')}, {_new_values}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {_TRIGGERS[1]} AFTER DELETE ON expenses BEGIN "
+    f"DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = {_key_of('old.id')}; "
+    f"DELETE FROM {SQLITE_FTS_KEYS_TABLE} WHERE expense_id = old.id; END",
+    f"CREATE TRIGGER IF NOT EXISTS {_TRIGGERS[2]} AFTER UPDATE OF {_columns} ON expenses BEGIN "
+    f"UPDATE {SQLITE_FTS_TABLE} SET {_new_assignments} WHERE rowid = {_key_of('new.id')}; END",
+]
+
+
+def rebuild_sqlite_fts(connection: Connection):
+    """Re-index every expense into the FTS5 table."""
+    connection.execute(text(f"DELETE FROM {SQLITE_FTS_TABLE}"))
+    connection.execute(text(f"DELETE FROM {SQLITE_FTS_KEYS_TABLE}"))
+    connection.execute(text(f"INSERT INTO {SQLITE_FTS_KEYS_TABLE}(expense_id) SELECT id FROM expenses"))
+    connection.execute(text(
+        f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, {_columns}) "
+        f"SELECT {SQLITE_FTS_KEYS_TABLE}.id, {_expense_values} FROM {SQLITE_FTS_KEYS_TABLE} "
+        f"JOIN expenses ON expenses.id = {SQLITE_FTS_KEYS_TABLE}.expense_id"
+    ))
+
+
+def _drop_rowid_index(connection: Connection):
+    """Drop the earlier index keyed by the expenses rowid, so it is recreated with stable keys."""
+    for trigger in _TRIGGERS:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    connection.execute(text(f"DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}"))
+
+
+def ensure_sqlite_fts(connection: Connection):
+    """Create the FTS5 table, its key table and triggers if missing, indexing existing expenses."""
+    created = not inspect(connection).has_table(SQLITE_FTS_KEYS_TABLE)
+    if created:
+        _drop_rowid_index(connection)
+    for statement in SQLITE_FTS_DDL:
+        connection.execute(text(statement))
+    if created:
+        rebuild_sqlite_fts(connection)
+        logging.info("Created SQLite full-text index %s", SQLITE_FTS_TABLE)
+
+
+def _after_expenses_create(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        ensure_sqlite_fts(connection)
+
+
+def configure_sqlite_fts(engine: Engine, expenses_table: Table):
+    """Install the FTS5 index now if the expenses table exists, and whenever it is created."""
+    if engine.dialect.name != 'sqlite':
+        return
+    if not event.contains(expenses_table, 'after_create', _after_expenses_create):
+        event.listen(expenses_table, 'after_create', _after_expenses_create)
+    with engine.begin() as connection:
+        if inspect(connection).has_table(expenses_table.name):
+            ensure_sqlite_fts(connection)
+
+
+def search_terms(query: str) -> List[str]:
+    """Split a free-text query into words, dropping search operators and punctuation."""
+    return re.findall(r'\w+', query.lower())[:MAX_SEARCH_TERMS]
+
+
+def sqlite_match_query(terms: List[str]) -> str:
+    """FTS5 MATCH expression requiring every term as a prefix: ``"star"* "cafe"*``."""
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def mysql_boolean_query(terms: List[str]) -> str:
+    """MySQL boolean-mode expression requiring every term as a prefix: ``+star* +cafe*``."""
+    return ' '.join(f'+{term}*' for term in terms)
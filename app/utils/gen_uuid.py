@@ -1,19 +1,70 @@
-from sqlalchemy.dialects.mysql import CHAR
-from sqlalchemy.types import TypeDecorator
+"""
+Primary key type and generator.
+
+Keys are stored as 16-byte ``BINARY(16)`` values instead of 36-character
+strings, and new keys are time-ordered UUIDv7s, so inserts append to the end
+of the primary key index instead of splitting random pages. The type converts
+at the boundary: it binds UUID strings (or ``uuid.UUID``) and returns the
+canonical string form, so the rest of the app keeps handling ids as strings.
+"""
+
+import os
+import threading
+import time
+import uuid
+from sqlalchemy.types import BINARY, TypeDecorator
+
+_RANDOM_BITS = 74  # rand_a (12) + rand_b (62)
+_lock = threading.Lock()
+_last_ms = 0
+_last_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Time-ordered UUID (RFC 9562 version 7): 48-bit Unix milliseconds, then random bits.
+
+    Within one millisecond the random part is incremented, so ids generated by
+    this process are strictly increasing.
+    """
+    global _last_ms, _last_counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms <= _last_ms:
+            ms, counter = _last_ms, _last_counter + 1
+            if counter >> _RANDOM_BITS:
+                ms, counter = ms + 1, 0
+        else:
+            # Top bit left clear so the counter has room to grow within the millisecond
+            counter = int.from_bytes(os.urandom(10), 'big') & ((1 << (_RANDOM_BITS - 1)) - 1)
+        _last_ms, _last_counter = ms, counter
+    value = (ms << 80) | (0x7 << 76) | ((counter >> 62) << 64) | (0b10 << 62) | (counter & ((1 << 62) - 1))
+    return uuid.UUID(int=value)
+
+
+def new_id() -> str:
+    """New primary key value."""
+    return str(uuid7())
+
 
 class GUID(TypeDecorator):
-    """Platform-independent GUID/UUID type for SQLAlchemy."""
-    impl = CHAR
+    """UUID stored as BINARY(16), exposed to Python as its canonical string."""
+    impl = BINARY(16)
+    cache_ok = True
 
     def load_dialect_impl(self, dialect):
-        return dialect.type_descriptor(CHAR(36))
+        return dialect.type_descriptor(BINARY(16))
 
     def process_bind_param(self, value, dialect):
         if value is None:
             return value
-        if not isinstance(value, str):
-            return str(value)
-        return value
+        if isinstance(value, uuid.UUID):
+            return value.bytes
+        if isinstance(value, (bytes, bytearray)) and len(value) == 16:
+            return bytes(value)
+        return uuid.UUID(str(value)).bytes
 
     def process_result_value(self, value, dialect):
-        return value
+        if value is None:
+            return value
+        return str(uuid.UUID(bytes=bytes(value)))
@@ -8,12 +8,12 @@ import os
 import re
 import secrets
 import difflib
+import unicodedata
 from datetime import datetime, date, timezone
 from typing import Dict, Any, List, Optional, Union
 from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
-from PIL import Image, ImageEnhance
 from app.config import Config
+from app.utils.passwords import password_hasher
 
 def generate_secure_filename(original_file_name: str) -> str:
     """Generate a secure file_name with timestamp."""
@@ -34,6 +34,8 @@ def format_tax(tax_rate: float = 16) -> str:
 
 def clean_image(image_path: str) -> str:
     """Clean and preprocess the ticket image."""
+    # Pillow is only needed by the bot and worker, not on API startup
+    from PIL import Image, ImageEnhance
     img = Image.open(image_path)
     img = img.convert('L')  # white and black
     enhancer = ImageEnhance.Contrast(img)
@@ -60,12 +62,24 @@ def parse_date(date_input: Union[str, date, datetime]) -> Optional[date]:
     
     return None
 
+def normalize_concept(concept: Optional[str]) -> str:
+    """Uppercase, strip accents and collapse punctuation/whitespace: 'Café  oxxo.' -> 'CAFE OXXO'."""
+    text = unicodedata.normalize('NFKD', concept or '').encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.sub(r'[^A-Z0-9]+', ' ', text.upper()).split())
+
+def expense_fingerprint(concept: Optional[str], total: Optional[float],
+                        payment_date: Optional[Union[str, date]]) -> str:
+    """SHA-256 of the normalised concept, total and payment date of an expense."""
+    payment_date = parse_date(payment_date) if payment_date else None
+    key = f"{normalize_concept(concept)}|{float(total or 0):.2f}|{payment_date.isoformat() if payment_date else ''}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
 def delete_file(file_path: str):
     """Helper to delete a temporary file."""
     try:
         if os.path.exists(file_path):
             os.unlink(file_path)
-            logging.info(f"Deleted temporary file: {file_path}")
+            logging.info("Deleted temporary file: %s", file_path)
     except Exception as e:
         if "No such file" in str(e):
             pass  # File already deleted
@@ -197,7 +211,6 @@ def extract_emails(text: str) -> list:
     email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
     return re.findall(email_pattern, text)
 
-# TODO: Not in use yet
 def mask_sensitive_data(data: Dict[str, Any]) -> Dict[str, Any]:
     """Mask sensitive data in dictionary for logging."""
     sensitive_keys = ['password', 'token', 'secret', 'key', 'api_key']
@@ -252,7 +265,7 @@ def utc_timestamp() -> str:
 
 def hash_password(password: str) -> str:
     """
-    Hash a password using Werkzeug's secure password hashing.
+    Hash a password with the calibrated PBKDF2 settings.
     
     Args:
         password: Plain text password to hash
@@ -260,14 +273,7 @@ def hash_password(password: str) -> str:
     Returns:
         Hashed password string
     """
-    if not password:
-        raise ValueError("Password cannot be empty")
-    
-    return generate_password_hash(
-        password, 
-        method='pbkdf2:sha256',
-        salt_length=16
-    )
+    return password_hasher.hash(password)
 
 def verify_password(password: str, password_hash: str) -> bool:
     """
@@ -280,10 +286,7 @@ def verify_password(password: str, password_hash: str) -> bool:
     Returns:
         True if password matches hash, False otherwise
     """
-    if not password or not password_hash:
-        return False
-    
-    return check_password_hash(password_hash, password)
+    return password_hasher.verify(password, password_hash)
 
 def generate_secure_token(length: int = 32) -> str:
     """
@@ -348,3 +351,27 @@ def to_datetime(value):
         return None
     # Si es None u otro tipo
     return None
+
+def requested_version(data: Dict[str, Any], if_match: Optional[str] = None) -> Optional[int]:
+    """
+    Version a client last read, from the body's ``version`` or an ``If-Match`` header.
+
+    Args:
+        data: Request body
+        if_match: Value of the If-Match header, e.g. ``"3"`` or ``W/"3"``
+
+    Returns:
+        The version, or None if the client sent none
+
+    Raises:
+        ValueError: if the version is not an integer
+    """
+    version = data.get('version')
+    if version is None and if_match and if_match.strip() != '*':
+        version = if_match.strip().removeprefix('W/').strip('"')
+    if version is None:
+        return None
+    try:
+        return int(version)
+    except (TypeError, ValueError):
+        raise ValueError("version must be an integer")
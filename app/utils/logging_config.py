@@ -1,45 +1,175 @@
 """
 Logging configuration for the application.
+
+Records are pushed to an in-memory queue by a ``QueueHandler`` attached to the
+root logger and written out by a ``QueueListener`` running on its own thread,
+so console and file I/O never happen on request or event-loop threads.
+
+A forked child (e.g. a gunicorn worker forked after ``setup_logging`` ran in
+the master) inherits the handler but not the listener thread, so it gets a
+fresh queue and listener of its own right after the fork.
 """
 
+import atexit
+import json
 import logging
-import sys
 import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+EXTERNAL_LIBS = ["telegram", "httpx", "requests", "paddleocr", "paddle", "paddlex"]
+TEXT_FORMAT = '%(asctime)s | %(levelname)s | %(message)s'
+
+_listener = None
+_queue_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'timestamp': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload['exception'] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Keep only a fraction of DEBUG records; other levels always pass."""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = max(0.0, min(1.0, rate))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class ExternalLibFilter(logging.Filter):
+    """Route records by whether they come from one of ``EXTERNAL_LIBS``."""
+
+    def __init__(self, external: bool):
+        super().__init__()
+        self.external = external
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        is_external = record.name.split('.', 1)[0] in EXTERNAL_LIBS
+        return is_external == self.external
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves ``%``-style interpolation to the listener thread.
+
+    The stock handler formats every record before enqueueing it. Here the
+    message is only merged eagerly when its arguments are mutable objects that
+    could change before the listener gets to them.
+    """
+
+    IMMUTABLE_ARGS = (str, int, float, bool, type(None), bytes)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        args = record.args
+        if args and not all(isinstance(arg, self.IMMUTABLE_ARGS) for arg in _iter_args(args)):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def _iter_args(args):
+    if isinstance(args, dict):
+        return args.values()
+    return args
+
+
+def _make_formatter(log_format: str) -> logging.Formatter:
+    if log_format == 'json':
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def _make_file_handler(path: str, max_bytes: int, backup_count: int) -> RotatingFileHandler:
+    log_dir = os.path.dirname(path)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    return RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+
 
 def setup_logging():
     """Setup logging configuration for the application."""
+    global _listener, _queue_handler
+
+    # Stop a listener started by a previous call before replacing it
+    stop_logging()
+
     # Clean any handler created before
     for handler in logging.root.handlers[:]:
         logging.root.removeHandler(handler)
 
+    level = getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper(), logging.INFO)
+    formatter = _make_formatter(os.getenv('LOG_FORMAT', 'text').lower())
+    max_bytes = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    backup_count = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    debug_sample_rate = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', 1.0))
+
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(logging.Formatter('%(asctime)s | %(levelname)s | %(message)s'))
+    console_handler.setLevel(level)
+    console_handler.setFormatter(formatter)
+    console_handler.addFilter(ExternalLibFilter(external=False))
 
     # Principal handler
     LOG_BOT_FILE = os.getenv('LOG_BOT_FILE', os.path.join('logs', 'bot.log'))
-    file_handler = logging.FileHandler(LOG_BOT_FILE, encoding='utf-8')
-    file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(logging.Formatter('%(asctime)s | %(levelname)s | %(message)s'))
+    file_handler = _make_file_handler(LOG_BOT_FILE, max_bytes, backup_count)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(formatter)
+    file_handler.addFilter(ExternalLibFilter(external=False))
 
     # External libraries handler
     EXTERNAL_LOG_FILE = os.getenv('LOG_BOT_EXTERNAL_LIBS_FILE', os.path.join('logs', 'external_libs.log'))
-    external_handler = logging.FileHandler(EXTERNAL_LOG_FILE, encoding='utf-8')
+    external_handler = _make_file_handler(EXTERNAL_LOG_FILE, max_bytes, backup_count)
     external_handler.setLevel(logging.INFO)
-    external_handler.setFormatter(logging.Formatter('%(asctime)s | %(levelname)s | %(message)s'))
+    external_handler.setFormatter(formatter)
+    external_handler.addFilter(ExternalLibFilter(external=True))
+
+    # Every logger only enqueues; the listener thread does the actual I/O
+    log_queue = queue.SimpleQueue()
+    queue_handler = _queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(DebugSamplingFilter(debug_sample_rate))
+
+    _listener = QueueListener(
+        log_queue, console_handler, file_handler, external_handler,
+        respect_handler_level=True
+    )
+    _listener.start()
 
     # Config loggers
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
+    root_logger.setLevel(level)
+    root_logger.addHandler(queue_handler)
 
-    for lib in ["telegram", "httpx", "requests", "paddleocr", "paddle", "paddlex"]:
+    for lib in EXTERNAL_LIBS:
         lib_logger = logging.getLogger(lib)
         lib_logger.handlers = []
         lib_logger.propagate = False
-        lib_logger.addHandler(external_handler)
+        lib_logger.addHandler(queue_handler)
 
     os.environ["GLOG_minloglevel"] = "2"
     os.environ["FLAGS_log_level"] = "3"
@@ -50,3 +180,28 @@ def setup_logging():
     logging.info("Bot log folder set to: %s", LOG_BOT_FILE)
     logging.info("External libraries log folder set to: %s", EXTERNAL_LOG_FILE)
 
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+_queue_handler = None
+
+
+def _restart_listener_after_fork():
+    """Give a forked child its own queue and listener thread; the parent's thread does not survive the fork."""
+    global _listener
+    if _listener is None:
+        return
+    # A fresh queue: the inherited one may hold parent records or a lock taken mid-fork
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+atexit.register(stop_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
@@ -18,16 +18,20 @@ def help_message() -> str:
     📋 <b>Bot Commands:</b>
     /edit - Edit the data: /edit &lt;field&gt; &lt;value&gt;
     /save - Confirm and save the last processed expense
+    /save_all - Save every pending draft from an album at once
     /expenses - List your saved expenses
     /expense - Add a new expense manually: /expense &lt;payment_concept&gt; &lt;amount&gt; &lt;payment_date&gt; &lt;category&gt; &lt;note&gt (Optional);
     /income - Add a new income entry: /income &lt;source&gt; &lt;amount&gt; &lt;income_date&gt; (Optional) &lt;description&gt; (Optional)
     /incomes - List your income entries
+    /recurring - List or add recurring incomes and expenses (see /help_recurring)
     /balance - Show your current balance
     /summary - Show a summary of your expenses and incomes
+    /forecast - Project your end-of-month balance and spend
     /link_account - Link your Telegram account with the web app
     /help - Show this help
     /help_expense - Help for /expense command
     /help_income - Help for /income command
+    /help_recurring - Help for /recurring command
     /dashboard - Access your dashboard
 
     <b>How does it work?</b>
@@ -62,6 +66,34 @@ def edit_message() -> str:
 
     return message
 
+def album_message(processed: int, failed: int = 0) -> str:
+    """Summary after processing an album of tickets."""
+    message = f"✅ <b>{processed} tickets processed successfully!</b>\n"
+    if failed:
+        message += f"❌ {failed} images could not be processed.\n"
+    message += "I'll show them one by one: /edit and /save each, or send <b>/save_all</b> to save every draft at once."
+
+    return message
+
+def pending_drafts_message(remaining: int) -> str:
+    """Header shown before the next draft of an album."""
+    return f"📄 <b>Next ticket</b> ({remaining} more pending)"
+
+def duplicate_expense_message(existing: dict) -> str:
+    """Warning shown when a draft matches an expense that is already saved."""
+    message = "⚠️ <b>This ticket looks like one you already saved:</b>\n"
+    message += f"{existing['payment_concept']} - {format_currency(existing['total'] or 0)} on {existing['payment_date']}\n"
+    message += "Send <b>/save</b> again to save it anyway, or <b>/cancel</b> to discard it."
+
+    return message
+
+def anomaly_message(category: str, score: float, mean: float) -> str:
+    """Warning shown when a saved expense is far above the category's usual amount."""
+    message = f"⚠️ <b>Unusual expense</b> for {category.capitalize()}: "
+    message += f"{score:.1f} standard deviations above your average of {format_currency(mean)}."
+
+    return message
+
 def income_command(data: dict) -> str:
     """Handle /income command."""
     message = f"<b>source</b>: {data.source.capitalize()}\n"
@@ -114,6 +146,39 @@ def income_help_message() -> str:
     """
     return message
 
+def recurring_help_message() -> str:
+    """Help message for /recurring command."""
+    message = """
+    🔁 <b>Recurring incomes and expenses</b>
+    Use the command format:
+    /recurring - List your active rules
+    /recurring &lt;income|expense&gt; &lt;frequency&gt; &lt;amount&gt; &lt;name&gt;
+    /recurring stop &lt;number&gt; - Stop a rule from the list
+
+    <b>Parameters:</b>
+    - <b>frequency</b>: daily, weekly, monthly or yearly
+    - <b>amount</b>: Amount of each occurrence
+    - <b>name</b>: Income source or expense concept
+
+    The first occurrence is booked today, then on the same day every period.
+
+    <b>Example:</b>
+    /recurring income monthly 15000 Salary
+    /recurring expense monthly 199 NETFLIX
+    """
+    return message
+
+def recurring_message(rules: list) -> str:
+    """Numbered list of active recurring rules."""
+    if not rules:
+        return "You have no recurring incomes or expenses. See /help_recurring"
+    message = "🔁 <b>Your recurring rules:</b>\n\n"
+    for number, rule in enumerate(rules, start=1):
+        sign = '+' if rule.kind == 'income' else '-'
+        message += f"{number}. {rule.name} {sign}{format_currency(rule.amount)} {rule.frequency}, next {rule.next_run}\n"
+
+    return message
+
 def balance_message(data: dict) -> str:
     """Generate balance summary message."""
     month_names = {
@@ -137,6 +202,25 @@ def balance_message(data: dict) -> str:
 
     return message
 
+def forecast_message(data: dict) -> str:
+    """End-of-month forecast message."""
+    message = f"🔮 <b>Forecast for {data['month']:02d}/{data['year']}</b>\n\n"
+    message += f"📥 <b>Incomes so far:</b> {format_currency(data['month_to_date']['incomes'])}\n"
+    message += f"📤 <b>Expenses so far:</b> {format_currency(data['month_to_date']['expenses'])}\n"
+    message += f"📈 <b>Expected incomes:</b> {format_currency(data['expected_remaining']['incomes'])}\n"
+    message += f"📉 <b>Expected expenses:</b> {format_currency(data['expected_remaining']['expenses'])}\n"
+    message += "─" * 30 + "\n"
+    message += f"🔄 <b>Projected month net:</b> {format_currency(data['projected_month_net'])}\n"
+    message += f"💰 <b>Projected balance:</b> {format_currency(data['projected_balance'])}\n"
+
+    top_categories = data['categories'][:5]
+    if top_categories:
+        message += "\n<b>Projected spend by category:</b>\n"
+        for item in top_categories:
+            message += f"• {item['category'].capitalize()}: {format_currency(item['projected_total'])}\n"
+
+    return message
+
 def summary_message(summary: dict, data: dict) -> str:
     """Generate financial summary message."""
     month_names = {
@@ -0,0 +1,352 @@
+"""
+Request-level instrumentation for the Flask API.
+
+Collects per-endpoint latency histograms and SQLAlchemy query counts/time in
+process memory, renders them in Prometheus text format and adds a
+``Server-Timing`` header to every response. OCR runs in worker.py, which
+records its own histogram.
+
+With several processes (gunicorn workers, worker.py), set METRICS_MULTIPROC_DIR:
+each process then writes its histograms to ``<dir>/<pid>.json`` every
+METRICS_FLUSH_SECONDS and ``/metrics`` renders the sum over all files, so a
+scrape sees the same totals whichever worker answers it and includes the OCR
+worker. Files of exited processes are folded into ``archive.json`` so their
+counts are kept.
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import Flask, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+OCR_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Used by gunicorn.conf.py and worker.py when METRICS_MULTIPROC_DIR is unset, so both meet in one place
+DEFAULT_MULTIPROC_DIR = os.path.join(tempfile.gettempdir(), 'expense-api-metrics')
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Iterable[float]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            self.version += 1
+            series = self._series.get(labels)
+            if series is None:
+                # [bucket counts..., +Inf count, sum]
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def snapshot(self) -> Dict[Tuple[str, ...], list]:
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+    def render(self, snapshot: Optional[Dict[Tuple[str, ...], list]] = None) -> str:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        if snapshot is None:
+            snapshot = self.snapshot()
+        for labels, series in sorted(snapshot.items()):
+            base = ['%s="%s"' % (name, _escape(value)) for name, value in zip(self.label_names, labels)]
+            bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+            for bound, count in zip(bounds, series):
+                lines.append('%s_bucket{%s} %s' % (self.name, ','.join(base + ['le="%s"' % bound]), count))
+            label_str = '{%s}' % ','.join(base) if base else ''
+            lines.append(f'{self.name}_sum{label_str} {series[-1]}')
+            lines.append(f'{self.name}_count{label_str} {series[len(self.buckets)]}')
+        return '\n'.join(lines)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+Snapshot = Dict[str, Dict[Tuple[str, ...], list]]
+
+
+def _merge(target: Snapshot, source: Snapshot):
+    """Add every series of ``source`` into ``target``."""
+    for name, series_by_labels in source.items():
+        merged = target.setdefault(name, {})
+        for labels, series in series_by_labels.items():
+            current = merged.get(labels)
+            merged[labels] = list(series) if current is None else [a + b for a, b in zip(current, series)]
+
+
+class SharedMetricsStore:
+    """Histogram snapshots shared between processes through JSON files in a directory."""
+
+    ARCHIVE = 'archive.json'
+    LOCK = '.lock'
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _read(self, name: str) -> Snapshot:
+        try:
+            with open(self._path(name), 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return {metric: {tuple(labels): series for labels, series in rows} for metric, rows in data.items()}
+
+    def _write(self, name: str, snapshot: Snapshot):
+        data = {metric: [[list(labels), series] for labels, series in rows.items()] for metric, rows in snapshot.items()}
+        temp_path = self._path(f'.{name}.{os.getpid()}.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(temp_path, self._path(name))
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        # Readers and the archiver must not see a process file both archived and still present
+        import fcntl
+        with open(self._path(self.LOCK), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _process_files(self) -> List[str]:
+        return [name for name in os.listdir(self.directory) if name.endswith('.json') and name[:-5].isdigit()]
+
+    def write(self, pid: int, snapshot: Snapshot):
+        """Replace a live process's snapshot."""
+        self._write(f'{pid}.json', snapshot)
+
+    def collect(self) -> Snapshot:
+        """Sum of the archive and every live process's snapshot."""
+        with self._locked(exclusive=False):
+            merged = self._read(self.ARCHIVE)
+            for name in self._process_files():
+                _merge(merged, self._read(name))
+        return merged
+
+    def mark_process_dead(self, pid: int):
+        """Fold an exited process's counts into the archive."""
+        name = f'{pid}.json'
+        with self._locked(exclusive=True):
+            if not os.path.exists(self._path(name)):
+                return
+            archive = self._read(self.ARCHIVE)
+            _merge(archive, self._read(name))
+            self._write(self.ARCHIVE, archive)
+            os.remove(self._path(name))
+
+    def archive_dead_processes(self):
+        """Archive files left behind by processes that are no longer running (e.g. after a crash)."""
+        for name in self._process_files():
+            pid = int(name[:-5])
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                self.mark_process_dead(pid)
+            except PermissionError:
+                pass
+
+
+class MetricsRegistry:
+    """Process-wide collection of the API histograms."""
+
+    def __init__(self):
+        self.request_latency = Histogram(
+            'http_request_duration_seconds', 'Request latency by endpoint.',
+            ('method', 'endpoint', 'status'), LATENCY_BUCKETS
+        )
+        self.db_queries = Histogram(
+            'db_queries_per_request', 'SQL statements executed per request.',
+            ('method', 'endpoint'), QUERY_COUNT_BUCKETS
+        )
+        self.db_time = Histogram(
+            'db_query_duration_seconds_per_request', 'Time spent in SQL per request.',
+            ('method', 'endpoint'), LATENCY_BUCKETS
+        )
+        self.ocr_time = Histogram(
+            'ocr_duration_seconds', 'Time spent in one batched OCR model call (worker.py).',
+            (), OCR_BUCKETS
+        )
+        self.histograms = (self.request_latency, self.db_queries, self.db_time, self.ocr_time)
+        self.store: Optional[SharedMetricsStore] = None
+        self.flush_seconds = 1.0
+        self._flushed_versions: Optional[Tuple[int, ...]] = None
+        self._flusher_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def configure(self, directory: Optional[str], flush_seconds: float = 1.0):
+        """Share metrics through ``directory`` (METRICS_MULTIPROC_DIR); None keeps them per process."""
+        self.store = SharedMetricsStore(directory) if directory else None
+        self.flush_seconds = flush_seconds
+
+    def snapshot(self) -> Snapshot:
+        return {h.name: h.snapshot() for h in self.histograms}
+
+    def flush(self):
+        """Write this process's snapshot to the shared store if anything changed since the last write."""
+        if self.store is None:
+            return
+        with self._lock:
+            versions = tuple(h.version for h in self.histograms)
+            if versions == self._flushed_versions or not any(versions):
+                return
+            self.store.write(os.getpid(), self.snapshot())
+            self._flushed_versions = versions
+
+    def changed(self):
+        """Called after observations; starts this process's background flusher on first use."""
+        if self.store is None or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            # Started lazily so each forked worker gets its own thread
+            self._flusher_pid = os.getpid()
+            self._flushed_versions = None
+            threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def close(self):
+        """Write the last observations and fold this process's file into the archive."""
+        if self.store is None:
+            return
+        self.flush()
+        self.store.mark_process_dead(os.getpid())
+
+    def render(self) -> str:
+        if self.store is None:
+            return '\n'.join(h.render() for h in self.histograms) + '\n'
+        self.flush()
+        merged = self.store.collect()
+        return '\n'.join(h.render(merged.get(h.name, {})) for h in self.histograms) + '\n'
+
+
+metrics = MetricsRegistry()
+# Write the last observations before a clean exit; the daemon flusher may not get another turn
+atexit.register(metrics.flush)
+
+
+def _new_timings() -> Dict:
+    return {'start': time.perf_counter(), 'db_count': 0, 'db_time': 0.0}
+
+
+def _request_timings() -> Optional[Dict]:
+    if not has_request_context():
+        return None
+    timings = g.get('_timings')
+    if timings is None:
+        timings = g._timings = _new_timings()
+    return timings
+
+
+@contextmanager
+def track_ocr():
+    """Time an OCR call into the ``ocr_duration_seconds`` histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.ocr_time.observe(time.perf_counter() - start)
+        metrics.changed()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, so a failed statement leaves nothing behind on the pooled connection
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _record_query(context):
+    start = getattr(context, '_query_start', None)
+    if start is None:
+        return
+    context._query_start = None
+    timings = _request_timings()
+    if timings is not None:
+        timings['db_count'] += 1
+        timings['db_time'] += time.perf_counter() - start
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_query(context)
+
+
+def _handle_error(exception_context):
+    _record_query(exception_context.execution_context)
+
+
+def _server_timing(timings: Dict, total: float) -> str:
+    return ', '.join([
+        f'app;dur={total * 1000:.1f}',
+        f'db;dur={timings["db_time"] * 1000:.1f};desc="{timings["db_count"]} queries"',
+    ])
+
+
+def init_worker_metrics(app: Flask):
+    """
+    Publish the metrics of a process outside gunicorn (worker.py) to the shared
+    directory, so the API's ``/metrics`` includes them.
+    """
+    if not app.config.get('METRICS_ENABLED'):
+        return
+    directory = app.config.get('METRICS_MULTIPROC_DIR') or DEFAULT_MULTIPROC_DIR
+    metrics.configure(directory, app.config.get('METRICS_FLUSH_SECONDS', 1.0))
+    metrics.store.archive_dead_processes()
+    atexit.register(metrics.close)
+
+
+def init_metrics(app: Flask):
+    """Register request hooks and SQLAlchemy engine events on the app."""
+    metrics.configure(app.config.get('METRICS_MULTIPROC_DIR'), app.config.get('METRICS_FLUSH_SECONDS', 1.0))
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    @app.before_request
+    def _start_timer():
+        g._timings = _new_timings()
+
+    @app.after_request
+    def _record_request(response):
+        timings = _request_timings()
+        total = time.perf_counter() - timings['start']
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        if endpoint == '/metrics':
+            return response
+
+        metrics.request_latency.observe(total, request.method, endpoint, str(response.status_code))
+        metrics.db_queries.observe(timings['db_count'], request.method, endpoint)
+        metrics.db_time.observe(timings['db_time'], request.method, endpoint)
+        metrics.changed()
+        response.headers['Server-Timing'] = _server_timing(timings, total)
+        return response
@@ -0,0 +1,109 @@
+"""
+Password hashing shared by the User model and the auth endpoints.
+
+Hashes are Werkzeug ``pbkdf2:sha256:<iterations>`` strings. The iteration
+count is calibrated once per process so one hash takes about
+PASSWORD_HASH_TARGET_MS (never fewer than PASSWORD_HASH_MIN_ITERATIONS), or
+pinned with PASSWORD_HASH_ITERATIONS. Stored hashes that are weaker than the
+current setting are upgraded the next time their owner logs in.
+
+Hashing runs on a small thread pool (PBKDF2 releases the GIL) so at most
+PASSWORD_HASH_WORKERS hashes burn CPU at once; when PASSWORD_HASH_MAX_PENDING
+requests are already waiting, new ones fail fast with ``PasswordHasherBusy``.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+from werkzeug.security import check_password_hash, generate_password_hash
+from app.config import Config
+
+METHOD = 'pbkdf2:sha256'
+SALT_LENGTH = 16
+ITERATION_STEP = 10000  # Calibrated counts are rounded down to this step
+CALIBRATION_ITERATIONS = 20000
+
+T = TypeVar('T')
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already queued."""
+
+
+class PasswordHasher:
+    """Calibrated PBKDF2 hashing on a bounded thread pool."""
+
+    def __init__(self):
+        self.iterations: Optional[int] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[threading.BoundedSemaphore] = None
+        self._lock = threading.Lock()
+
+    @property
+    def method(self) -> str:
+        if self.iterations is None:
+            self.calibrate()
+        return f'{METHOD}:{self.iterations}'
+
+    def calibrate(self, target_ms: Optional[float] = None) -> int:
+        """Pick the iteration count for new hashes by timing PBKDF2 on this machine."""
+        if Config.PASSWORD_HASH_ITERATIONS:
+            self.iterations = Config.PASSWORD_HASH_ITERATIONS
+            return self.iterations
+        target_ms = target_ms or Config.PASSWORD_HASH_TARGET_MS
+        samples = []
+        for _ in range(3):
+            started = time.perf_counter()
+            generate_password_hash('calibration', method=f'{METHOD}:{CALIBRATION_ITERATIONS}', salt_length=SALT_LENGTH)
+            samples.append(time.perf_counter() - started)
+        per_iteration_ms = min(samples) * 1000 / CALIBRATION_ITERATIONS
+        iterations = int(target_ms / per_iteration_ms) // ITERATION_STEP * ITERATION_STEP
+        self.iterations = max(iterations, Config.PASSWORD_HASH_MIN_ITERATIONS)
+        logging.info("Password hashing calibrated: %s iterations (~%.0f ms)",
+                     self.iterations, self.iterations * per_iteration_ms)
+        return self.iterations
+
+    def _run(self, function: Callable[..., T], *args) -> T:
+        """Run a hashing call on the pool, rejecting it if the queue is full."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=Config.PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash'
+                )
+                self._slots = threading.BoundedSemaphore(Config.PASSWORD_HASH_WORKERS + Config.PASSWORD_HASH_MAX_PENDING)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy("Too many concurrent password checks")
+        try:
+            return self._executor.submit(function, *args).result(timeout=Config.PASSWORD_HASH_TIMEOUT_SECONDS)
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the current parameters."""
+        if not password:
+            raise ValueError("Password cannot be empty")
+        return self._run(generate_password_hash, password, self.method, SALT_LENGTH)
+
+    def verify(self, password: str, password_hash: Optional[str]) -> bool:
+        """Check a password against a stored hash of any supported method."""
+        if not password or not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: Optional[str]) -> bool:
+        """Whether a stored hash uses another algorithm or fewer iterations than the current setting."""
+        if not password_hash:
+            return False
+        method = password_hash.split('$', 1)[0]
+        name, _, iterations = method.rpartition(':')
+        if name != METHOD:
+            return True
+        try:
+            return int(iterations) < (self.iterations or self.calibrate())
+        except ValueError:
+            return True
+
+
+password_hasher = PasswordHasher()
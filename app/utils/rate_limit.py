@@ -0,0 +1,160 @@
+"""
+Sliding-window rate limiting for the auth endpoints.
+
+Each key (client IP, email) counts hits in fixed windows and the limit is
+checked against the sliding-window estimate
+``previous_window * (1 - elapsed_fraction) + current_window``, which needs two
+counters per key instead of a log of timestamps. The check runs before the
+view, so rejected requests cost a dict lookup, not a DB query or a password
+hash.
+
+Counters live in process memory by default. Set RATE_LIMIT_STORAGE_URL to a
+``redis://`` URL (Redis or a compatible server such as Valkey or KeyDB, with
+the ``redis`` package installed) to share them between API processes.
+"""
+
+import logging
+import math
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+from flask import jsonify, request
+from app.config import Config
+
+KEY_PREFIX = 'rl'
+
+
+def parse_limit(limit: str) -> Tuple[int, int]:
+    """Parse ``"<hits>/<seconds>"`` into (hits, seconds)."""
+    hits, _, seconds = limit.partition('/')
+    return int(hits), int(seconds or 60)
+
+
+class MemoryRateLimitStore:
+    """Window counters in a dict; expired counters are pruned as new windows start."""
+
+    def __init__(self):
+        self._counters: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def incr(self, key: str, ttl: int) -> int:
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_prune:
+                self._counters = {k: v for k, v in self._counters.items() if v[1] > now}
+                self._next_prune = now + ttl
+            count, expires = self._counters.get(key, (0, now + ttl))
+            count += 1
+            self._counters[key] = (count, expires)
+            return count
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            count, expires = self._counters.get(key, (0, 0.0))
+            return count if expires > time.monotonic() else 0
+
+    def clear(self):
+        with self._lock:
+            self._counters = {}
+
+
+class RedisRateLimitStore:
+    """Window counters in a Redis-compatible server (INCR + EXPIRE)."""
+
+    def __init__(self, url: str):
+        # Optional dependency, only needed when counters are shared between processes
+        import redis
+        self._client = redis.Redis.from_url(url)
+
+    def incr(self, key: str, ttl: int) -> int:
+        pipeline = self._client.pipeline()
+        pipeline.incr(key)
+        pipeline.expire(key, ttl)
+        return int(pipeline.execute()[0])
+
+    def get(self, key: str) -> int:
+        return int(self._client.get(key) or 0)
+
+    def clear(self):
+        for key in self._client.scan_iter(f'{KEY_PREFIX}:*'):
+            self._client.delete(key)
+
+
+class RateLimiter:
+    """Sliding-window counter over a pluggable store."""
+
+    def __init__(self, store=None):
+        self._store = store
+
+    @property
+    def store(self):
+        if self._store is None:
+            url = Config.RATE_LIMIT_STORAGE_URL
+            self._store = RedisRateLimitStore(url) if url else MemoryRateLimitStore()
+        return self._store
+
+    def hit(self, key: str, limit: int, window: int, now: Optional[float] = None) -> Tuple[bool, int]:
+        """
+        Count one hit for ``key``.
+
+        Returns:
+            (allowed, retry_after_seconds)
+        """
+        now = time.time() if now is None else now
+        bucket = int(now // window)
+        elapsed = (now % window) / window
+        current = self.store.incr(f'{KEY_PREFIX}:{key}:{bucket}', window * 2)
+        previous = self.store.get(f'{KEY_PREFIX}:{key}:{bucket - 1}')
+        estimate = previous * (1 - elapsed) + current
+        if estimate <= limit:
+            return True, 0
+        # Seconds until the previous window's share decays enough to admit a hit
+        if previous and current <= limit:
+            retry_after = math.ceil(window * (1 - elapsed) - window * (limit - current) / previous)
+        else:
+            retry_after = math.ceil(window * (1 - elapsed))
+        return False, max(retry_after, 1)
+
+
+rate_limiter = RateLimiter()
+
+
+def client_ip() -> str:
+    """Client address; put the app behind ProxyFix if a proxy sets X-Forwarded-For."""
+    return request.remote_addr or 'unknown'
+
+
+def request_email() -> Optional[str]:
+    """Email field of the JSON body, normalised, if any."""
+    data = request.get_json(silent=True)
+    email = data.get('email') if isinstance(data, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def rate_limit(scope: str) -> Callable:
+    """
+    Reject requests over AUTH_RATE_LIMIT_IP per client IP or AUTH_RATE_LIMIT_EMAIL
+    per email with 429 before the view runs. Apply it above ``jwt_required``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not Config.RATE_LIMIT_ENABLED:
+                return view(*args, **kwargs)
+            checks = [(f'{scope}:ip:{client_ip()}', Config.AUTH_RATE_LIMIT_IP)]
+            email = request_email()
+            if email:
+                checks.append((f'{scope}:email:{email}', Config.AUTH_RATE_LIMIT_EMAIL))
+            for key, limit in checks:
+                allowed, retry_after = rate_limiter.hit(key, *parse_limit(limit))
+                if not allowed:
+                    logging.warning("Rate limit exceeded for %s", key)
+                    return jsonify({
+                        'success': False,
+                        'error': 'Too many requests, try again later'
+                    }), 429, {'Retry-After': str(retry_after)}
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
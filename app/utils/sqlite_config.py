@@ -0,0 +1,47 @@
+"""
+SQLite tuning for embedded deployments and tests.
+"""
+
+import logging
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Applied to every new connection. WAL lets readers run alongside the single
+# writer, NORMAL sync is durable under WAL except on power loss, and the cache
+# and mmap sizes keep hot ledger pages in memory.
+SQLITE_PRAGMAS = {
+    'foreign_keys': 'ON',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+    'cache_size': -64000,  # 64 MB
+    'mmap_size': 268435456,  # 256 MB
+}
+
+
+def is_memory_database(url) -> bool:
+    """Return True for ``sqlite://`` and ``sqlite:///:memory:`` URLs."""
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record, memory: bool):
+    cursor = dbapi_connection.cursor()
+    try:
+        if not memory:
+            cursor.execute('PRAGMA journal_mode=WAL')
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def configure_sqlite(engine: Engine):
+    """Register the pragma hook on an SQLite engine; other backends are left untouched."""
+    if engine.dialect.name != 'sqlite':
+        return
+    memory = is_memory_database(engine.url)
+    event.listen(
+        engine, 'connect',
+        lambda dbapi_connection, connection_record: _set_sqlite_pragmas(dbapi_connection, connection_record, memory)
+    )
+    logging.info("SQLite database configured: %s", engine.url.database or ':memory:')
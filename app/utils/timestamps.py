@@ -0,0 +1,63 @@
+"""
+Database-generated created_at/updated_at columns.
+
+``db_now()`` renders the database's own clock with sub-second precision,
+so timestamps are set when the row is written rather than when a Python
+default was evaluated, and rows written in the same second still sort apart:
+
+- SQLite: ``strftime('%Y-%m-%d %H:%M:%f', 'now')`` (UTC, milliseconds)
+- MySQL: ``CURRENT_TIMESTAMP(6)`` into ``DATETIME(6)`` (session time zone, microseconds)
+- others: ``CURRENT_TIMESTAMP``
+
+Time-ordered queries should still add the primary key as a tiebreak so rows
+with equal timestamps come back in a stable order (see ``UserScopedRepository.page``).
+Cutoffs compared against these columns are computed from ``database_now()``
+so both sides use the same clock and time zone.
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+TIMESTAMP = DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql')
+
+
+class db_now(FunctionElement):
+    """Current timestamp from the database clock."""
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(db_now)
+def _db_now_default(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(db_now, 'sqlite')
+def _db_now_sqlite(element, compiler, **kw):
+    # Padded to microseconds to match how SQLAlchemy stores bound datetimes,
+    # so the text values compare correctly against query parameters
+    return "(strftime('%Y-%m-%d %H:%M:%f', 'now') || '000')"
+
+
+@compiles(db_now, 'mysql')
+def _db_now_mysql(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP(6)'
+
+
+def created_at_column() -> Column:
+    """``created_at`` set by the database on insert."""
+    return Column('created_at', TIMESTAMP, nullable=False, server_default=db_now())
+
+
+def updated_at_column() -> Column:
+    """``updated_at`` set by the database on insert and refreshed on every ORM update."""
+    return Column('updated_at', TIMESTAMP, nullable=False, server_default=db_now(), onupdate=db_now())
+
+
+def database_now() -> datetime:
+    """Current time on the database clock, for cutoffs compared with these columns."""
+    from app.extensions import db
+    return db.session.scalar(select(db_now()))
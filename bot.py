@@ -7,7 +7,6 @@ Command to run:
     python bot.py
 """
 
-from multiprocessing import context
 from app.utils.logging_config import setup_logging
 setup_logging()
 import logging
@@ -19,25 +18,32 @@ import tempfile
 import asyncio
 from datetime import date, datetime
 from dotenv import load_dotenv
-import uuid
 
 # Import from our refactored structure
 from app import create_app
-from app.services.expense_service import expense_service
+from app.services.expense_service import expense_service, DuplicateExpenseError
 from app.services.user_service import user_service
 from app.services.income_service import income_service
 from app.services.balance_service import balance_service
-from app.utils.helpers import delete_file, clean_image, parse_date, utc_now
+from app.services.recurring_service import recurring_service
+from app.services.forecast_service import forecast_service
+from app.services.anomaly_service import anomaly_service
+from app.services.link_token_service import link_token_service
+from app.services.ticket_store_service import MissingTicketImageError
+from app.utils.helpers import delete_file, clean_image, parse_date
 from app.utils.validators import validate_image_file
 from app.utils.messages_templates import (dashboard_message, expense_help_message, income_command, income_help_message, new_balance_message, welcome_message, help_message, expense_message,
-                                        edit_message, handle_message, balance_message, summary_message, link_account_message)
+                                        edit_message, handle_message, balance_message, summary_message, link_account_message, album_message,
+                                        pending_drafts_message, duplicate_expense_message,
+                                        recurring_help_message, recurring_message, forecast_message,
+                                        anomaly_message)
 
 # Load environment variables
 load_dotenv()
 FLASK_ENV = os.getenv('FLASK_ENV', 'development')
 
 # Create Flask app context for database operations
-flask_app = create_app(FLASK_ENV)
+flask_app = create_app(FLASK_ENV, api=False)
 
 # Get Telegram bot token from config
 TOKEN = flask_app.config.get('TELEGRAM_BOT_TOKEN')
@@ -45,6 +51,22 @@ TOKEN = flask_app.config.get('TELEGRAM_BOT_TOKEN')
 # Temporary storage for user expense data during editing
 TEMP_EXPENSE = {}
 
+# Drafts from an album waiting behind TEMP_EXPENSE, per user
+PENDING_EXPENSES = {}
+
+# Photo updates of albums being collected, per media_group_id
+MEDIA_GROUPS = {}
+
+# Telegram delivers album photos as separate updates; wait this long for the rest
+MEDIA_GROUP_WAIT_SECONDS = 1.5
+
+
+def process_tickets(update: Update, image_paths: list) -> list:
+    """Run OCR on ticket images for the sender; blocking, so handlers call it via asyncio.to_thread."""
+    with flask_app.app_context():
+        user = user_service.get_or_create_user(update)
+        return expense_service.process_ticket_images(user.id, image_paths)
+
 class ExpenseBot:
     """Telegram bot for expense management."""
     
@@ -59,6 +81,7 @@ class ExpenseBot:
         self.app.add_handler(CommandHandler("help", self.help_command))
         self.app.add_handler(CommandHandler("edit", self.edit_command))
         self.app.add_handler(CommandHandler("save", self.save_command))
+        self.app.add_handler(CommandHandler("save_all", self.save_all_command))
         self.app.add_handler(CommandHandler("expenses", self.expenses_command))
         self.app.add_handler(CommandHandler("cancel", self.cancel_command))
         self.app.add_handler(MessageHandler(filters.PHOTO, self.handle_photo))
@@ -67,8 +90,11 @@ class ExpenseBot:
         self.app.add_handler(CommandHandler("income", self.income_command))
         self.app.add_handler(CommandHandler("help_income", self.income_help_command))
         self.app.add_handler(CommandHandler("incomes", self.incomes_command))
+        self.app.add_handler(CommandHandler("recurring", self.recurring_command))
+        self.app.add_handler(CommandHandler("help_recurring", self.recurring_help_command))
         self.app.add_handler(CommandHandler("balance", self.balance_command))
         self.app.add_handler(CommandHandler("summary", self.summary_command))
+        self.app.add_handler(CommandHandler("forecast", self.forecast_command))
         self.app.add_handler(CommandHandler("link_account", self.link_account_command))
         self.app.add_handler(CommandHandler("dashboard", self.dashboard_command))
         self.app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_text))
@@ -116,7 +142,7 @@ class ExpenseBot:
 
         # Prepare response message
         message = expense_message(expense_data)
-        logging.info(f"Expense message edited for User {telegram_user_id}: {message}")
+        logging.debug("Expense message edited for User %s: %s", telegram_user_id, message)
         await self.reply_text(update, message)
 
         message = edit_message()
@@ -129,13 +155,25 @@ class ExpenseBot:
             return
 
         expense_data = TEMP_EXPENSE.pop(telegram_user_id)  # Remove after saving to avoid duplication
+        allow_duplicate = expense_data.pop('allow_duplicate', False)
         with flask_app.app_context():
             try:
-                expense = expense_service.create_expense(expense_data)
-                logging.info(f"Expense saved: ID {expense.id} for User {telegram_user_id} with data {expense_data}")
+                expense = expense_service.create_expense(expense_data, allow_duplicate=allow_duplicate)
+                logging.debug("Expense saved: ID %s for User %s with data %s", expense.id, telegram_user_id, expense_data)
                 await self.reply_text(update, f"✅ Expense saved successfully!\n\n")
+                await self._flag_outlier(update, expense)
+            except DuplicateExpenseError as e:
+                # Keep the draft; a second /save confirms it
+                logging.info("Duplicate of expense %s detected for User %s", e.existing.id, telegram_user_id)
+                TEMP_EXPENSE[telegram_user_id] = {**expense_data, 'allow_duplicate': True}
+                await self.reply_text(update, duplicate_expense_message(e.existing.to_dict()))
+                return
+            except MissingTicketImageError:
+                logging.info("Ticket image of draft expired for User %s", telegram_user_id)
+                await self.reply_text(update, "❌ The ticket image expired before the expense was saved. Please send the photo again.")
+                return
             except Exception as e:
-                logging.error(f"Error saving expense: {str(e)}")
+                logging.error("Error saving expense: %s", str(e))
                 await self.reply_text(update, f"❌ Error saving expense: {str(e)}")
 
             try:
@@ -144,12 +182,74 @@ class ExpenseBot:
                 if user:
                     user_upd = user_service.update_accumulated_balance(user.id, -expense.total)
                     message = new_balance_message(user_upd.accumulated_balance)
-                    logging.info(f"Updated accumulated balance for User {user.id}")
+                    logging.info("Updated accumulated balance for User %s", user.id)
                     await self.reply_text(update, message)
             except Exception as e:
-                logging.error(f"Error updating accumulated balance: {str(e)}")
+                logging.error("Error updating accumulated balance: %s", str(e))
                 await self.reply_text(update, f"❌ Error updating user accumulated balance: {str(e)}")
 
+        await self._show_next_pending(update, telegram_user_id)
+
+    async def save_all_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /save_all command - save the current draft and every pending album draft."""
+        telegram_user_id = update.effective_user.id
+        if telegram_user_id not in TEMP_EXPENSE:
+            await self.reply_text(update, "Nothing to save, please upload a ticket first.")
+            return
+
+        drafts = [TEMP_EXPENSE.pop(telegram_user_id)] + PENDING_EXPENSES.pop(telegram_user_id, [])
+        with flask_app.app_context():
+            try:
+                expenses = expense_service.create_expenses(drafts)
+                skipped = len(drafts) - len(expenses)
+                logging.info("Saved %s expenses for User %s, skipped %s duplicates", len(expenses), telegram_user_id, skipped)
+                message = f"✅ {len(expenses)} expenses saved successfully!\n"
+                if skipped:
+                    message += f"⚠️ {skipped} skipped because they were already saved.\n"
+                await self.reply_text(update, message)
+                for expense in expenses:
+                    await self._flag_outlier(update, expense)
+            except MissingTicketImageError as e:
+                logging.info("Ticket images of %s drafts expired for User %s", len(e.file_names), telegram_user_id)
+                await self.reply_text(update, "❌ Some ticket images expired before the expenses were saved. Please send the photos again.")
+                return
+            except Exception as e:
+                logging.error("Error saving expenses: %s", str(e))
+                await self.reply_text(update, f"❌ Error saving expenses: {str(e)}")
+                return
+
+            try:
+                # Update user's accumulated balance once for the whole album
+                user = user_service.get_user_by_telegram_id(str(telegram_user_id))
+                if user:
+                    user_upd = user_service.update_accumulated_balance(user.id, -sum(exp.total for exp in expenses))
+                    message = new_balance_message(user_upd.accumulated_balance)
+                    logging.info("Updated accumulated balance for User %s", user.id)
+                    await self.reply_text(update, message)
+            except Exception as e:
+                logging.error("Error updating accumulated balance: %s", str(e))
+                await self.reply_text(update, f"❌ Error updating user accumulated balance: {str(e)}")
+
+    async def _flag_outlier(self, update: Update, expense):
+        """Warn when a saved expense is far above the usual amount for its category."""
+        if not anomaly_service.is_outlier(expense.anomaly_score):
+            return
+        stat = anomaly_service.get_stat(expense.user_id, expense.category)
+        logging.info("Unusual expense %s (z=%s) for User %s", expense.id, expense.anomaly_score, expense.user_id)
+        await self.reply_text(update, anomaly_message(stat.category, expense.anomaly_score, stat.mean))
+
+    async def _show_next_pending(self, update: Update, telegram_user_id: int):
+        """Promote the next pending album draft to the editable draft and show it."""
+        pending = PENDING_EXPENSES.get(telegram_user_id)
+        if not pending:
+            PENDING_EXPENSES.pop(telegram_user_id, None)
+            return
+
+        TEMP_EXPENSE[telegram_user_id] = pending.pop(0)
+        await self.reply_text(update, pending_drafts_message(len(pending)))
+        await self.reply_text(update, expense_message(TEMP_EXPENSE[telegram_user_id]))
+        await self.reply_text(update, edit_message())
+
     async def expenses_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         telegram_user_id = update.effective_user.id
         with flask_app.app_context():
@@ -164,13 +264,13 @@ class ExpenseBot:
                     return
                 
                 message = "📋 <b>Your Expenses:</b>\n\n"
-                logging.info(f"Expenses for User {user.id}: {expenses}")
+                logging.debug("Expenses for User %s: %s", user.id, expenses)
                 for exp in expenses:
                     message += f"• Concept: {exp.payment_concept}, Total: ${exp.total:.2f}, Date: {exp.payment_date}\n"
                 
                 await self.reply_text(update, message)
             except Exception as e:
-                logging.error(f"Error retrieving expenses: {str(e)}")
+                logging.error("Error retrieving expenses: %s", str(e))
                 await self.reply_text(update, f"❌ Error retrieving expenses: {str(e)}")
 
     async def cancel_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -179,11 +279,22 @@ class ExpenseBot:
         if telegram_user_id in TEMP_EXPENSE:
             TEMP_EXPENSE.pop(telegram_user_id)
             await self.reply_text(update, "✅ Expense entry canceled.")
+            await self._show_next_pending(update, telegram_user_id)
         else:
             await self.reply_text(update, "No ongoing expense entry to cancel.")
 
     async def handle_photo(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle photo messages - process ticket images."""
+        media_group_id = update.message.media_group_id
+        if media_group_id:
+            # Album: collect its photos and OCR them together as one batch
+            updates = MEDIA_GROUPS.setdefault(media_group_id, [])
+            updates.append(update)
+            if len(updates) == 1:
+                await self.reply_text(update, "📸 Album received. Processing tickets... ⏳")
+                self.app.create_task(self._process_album(media_group_id))
+            return
+
         await self.reply_text(update, "📸 Image received. Processing ticket... ⏳")
 
         try:
@@ -199,7 +310,7 @@ class ExpenseBot:
             validation = validate_image_file(os.path.basename(temp_path))
 
             if not validation['valid']:
-                logging.warning(f"Invalid file uploaded: {validation['errors']}")
+                logging.warning("Invalid file uploaded: %s", validation['errors'])
                 await self.reply_text(update, f"❌ Invalid file: {', '.join(validation['errors'])}")
                 delete_file(temp_path)
                 return
@@ -207,14 +318,11 @@ class ExpenseBot:
             # Process ticket with Flask app context
             with flask_app.app_context():
                 try:
-                    # Get or create user
-                    user = user_service.get_or_create_user(update)
-
                     # Clean and preprocess the ticket image
                     # temp_path = clean_image(temp_path)
 
-                    # Extract data using OCR
-                    expense_data = expense_service.process_ticket_image(user.id, temp_path)
+                    # Extract data using OCR off the event loop
+                    expense_data = (await asyncio.to_thread(process_tickets, update, [temp_path]))[0]
 
                     # Clean up temporary file
                     delete_file(temp_path)
@@ -233,13 +341,56 @@ class ExpenseBot:
                     
                 except Exception as e:
                     delete_file(temp_path)
-                    logging.error(f"Error processing ticket: {str(e)}")
+                    logging.error("Error processing ticket: %s", str(e))
                     await self.reply_text(update, f"❌ Error processing ticket: {str(e)}")
                     
         except Exception as e:
-            logging.error(f"Error downloading image: {str(e)}")
+            logging.error("Error downloading image: %s", str(e))
             await self.reply_text(update, f"❌ Error downloading image: {str(e)}")
 
+    async def _process_album(self, media_group_id: str):
+        """Wait for the rest of an album, then run OCR on all of its photos in one batch."""
+        await asyncio.sleep(MEDIA_GROUP_WAIT_SECONDS)
+        updates = MEDIA_GROUPS.pop(media_group_id, [])
+        if not updates:
+            return
+        first_update = updates[0]
+        telegram_user_id = first_update.effective_user.id
+
+        temp_paths = []
+        failed = 0
+        for update in updates:
+            try:
+                photo_file = await update.message.photo[-1].get_file()
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
+                    await photo_file.download_to_drive(tmp_file.name)
+                    temp_paths.append(tmp_file.name)
+            except Exception as e:
+                failed += 1
+                logging.error("Error downloading album image: %s", str(e))
+
+        if not temp_paths:
+            await self.reply_text(first_update, "❌ Error downloading album images.")
+            return
+
+        try:
+            drafts = await asyncio.to_thread(process_tickets, first_update, temp_paths)
+        except Exception as e:
+            logging.error("Error processing album %s: %s", media_group_id, str(e))
+            await self.reply_text(first_update, f"❌ Error processing tickets: {str(e)}")
+            return
+        finally:
+            for temp_path in temp_paths:
+                delete_file(temp_path)
+
+        logging.info("Processed album %s with %s tickets for User %s", media_group_id, len(drafts), telegram_user_id)
+        await self.reply_text(first_update, album_message(len(drafts), failed))
+
+        # The album drafts queue behind any draft the user is already editing
+        PENDING_EXPENSES.setdefault(telegram_user_id, []).extend(drafts)
+        if telegram_user_id not in TEMP_EXPENSE:
+            await self._show_next_pending(first_update, telegram_user_id)
+
     async def expense_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle manual expense entry."""
 
@@ -258,7 +409,7 @@ class ExpenseBot:
                     total = float(args[1])
                 except ValueError:
                     await self.reply_text(update, f"❌ The total must be a valid number: {args[1]}")
-                    logging.error(f"Invalid total for expense: {args[1]}")
+                    logging.error("Invalid total for expense: %s", args[1])
                     return
                 
                 try:
@@ -268,7 +419,7 @@ class ExpenseBot:
                     payment_date = date(current_year, month, day)
                 except ValueError:
                     await self.reply_text(update, f"❌ The date must be in DD-MM format: {args[2]}")
-                    logging.error(f"Invalid date for expense: {args[2]}")
+                    logging.error("Invalid date for expense: %s", args[2])
                     return
                 
                 category = args[3] if len(args) >= 4 else 'uncategorized'
@@ -296,7 +447,7 @@ class ExpenseBot:
                 await self.reply_text(update, message)
                 
             except Exception as e:
-                logging.error(f"Error saving expense: {str(e)}")
+                logging.error("Error saving expense: %s", str(e))
                 await self.reply_text(update, f"❌ Error saving expense: {str(e)}")
 
     async def expense_help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -323,7 +474,7 @@ class ExpenseBot:
                     amount = float(context.args[1])
                 except ValueError:
                     await self.reply_text(update, f"❌ The amount must be a valid number: {context.args[1]}")
-                    logging.error(f"Invalid amount for income: {context.args[1]}")
+                    logging.error("Invalid amount for income: %s", context.args[1])
                     return
                 
                 income_date = date.today()
@@ -356,13 +507,13 @@ class ExpenseBot:
                 }
 
                 income = income_service.create_income(income_data)
-                logging.info(f"Income saved for User {user.id} with data {income}")
+                logging.debug("Income saved for User %s with data %s", user.id, income)
                 message = "✅ <b>Income Saved successfully!</b>\n\n"
                 await self.reply_text(update, message)
                 message = income_command(income)
                 await self.reply_text(update, message)
             except Exception as e:
-                logging.error(f"Error saving income: {str(e)}")
+                logging.error("Error saving income: %s", str(e))
                 await self.reply_text(update, f"❌ Error saving income: {str(e)}")
 
             try:
@@ -371,10 +522,10 @@ class ExpenseBot:
                 if user:
                     user_upd = user_service.update_accumulated_balance(user.id, amount)
                     message = new_balance_message(user_upd.accumulated_balance)
-                    logging.info(f"Updated accumulated balance for User {user.id}")
+                    logging.info("Updated accumulated balance for User %s", user.id)
                     await self.reply_text(update, message)
             except Exception as e:
-                logging.error(f"Error updating accumulated balance: {str(e)}")
+                logging.error("Error updating accumulated balance: %s", str(e))
                 await self.reply_text(update, f"❌ Error updating user accumulated balance: {str(e)}")
 
     async def income_help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -398,16 +549,65 @@ class ExpenseBot:
                     return
 
                 message = "📋 <b>Your Incomes:</b>\n\n"
-                logging.info(f"Incomes for User {user.id}: {incomes}")
+                logging.debug("Incomes for User %s: %s", user.id, incomes)
                 await self.reply_text(update, message) 
                 for inc in incomes:
                     message = income_command(inc) + "\n"
                     await self.reply_text(update, message)  
                 
             except Exception as e:
-                logging.error(f"Error retrieving incomes: {str(e)}")
+                logging.error("Error retrieving incomes: %s", str(e))
                 await self.reply_text(update, f"❌ Error retrieving incomes: {str(e)}")
 
+    async def recurring_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /recurring command - list, add or stop recurring incomes and expenses."""
+        args = context.args or []
+        with flask_app.app_context():
+            try:
+                user = user_service.get_or_create_user(update)
+
+                if not args:
+                    await self.reply_text(update, recurring_message(recurring_service.get_rules(user.id)))
+                    return
+
+                if args[0].lower() == 'stop':
+                    rules = recurring_service.get_rules(user.id)
+                    if len(args) != 2 or not args[1].isdigit() or not 1 <= int(args[1]) <= len(rules):
+                        await self.reply_text(update, "❌ Send /recurring stop &lt;number&gt; with a number from /recurring")
+                        return
+                    rule = rules[int(args[1]) - 1]
+                    recurring_service.deactivate_rule(user.id, rule.id)
+                    await self.reply_text(update, f"✅ Recurring {rule.kind} <b>{rule.name}</b> stopped.")
+                    return
+
+                if len(args) < 4:
+                    await self.reply_text(update, "Invalid format.")
+                    await self.reply_text(update, recurring_help_message())
+                    return
+
+                data = {
+                    'kind': args[0].lower(),
+                    'frequency': args[1].lower(),
+                    'amount': args[2],
+                    'name': ' '.join(args[3:])
+                }
+                error = recurring_service.validate_rule_data(data)
+                if error:
+                    await self.reply_text(update, f"❌ {error}")
+                    return
+
+                rule = recurring_service.create_rule(user.id, data)
+                booked = recurring_service.run_due(user_id=user.id)
+                logging.info("Recurring rule %s created for User %s, booked %s", rule.id, user.id, booked)
+                await self.reply_text(update, f"✅ Recurring {rule.kind} <b>{rule.name}</b> saved. Next on {rule.next_run}.")
+            except Exception as e:
+                logging.error("Error in recurring_command: %s", str(e))
+                await self.reply_text(update, f"❌ Error managing recurring rules: {str(e)}")
+
+    async def recurring_help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /help_recurring command."""
+        await self.reply_text(update, recurring_help_message())
+
     async def balance_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
         Handle /balance command - Show current month balance
@@ -419,13 +619,31 @@ class ExpenseBot:
                 balance_data = balance_service.get_monthly_balance(user.id)
 
                 message = balance_message(balance_data)
-                logging.info(f"Balance for User {user.id}: {balance_data}")
+                logging.debug("Balance for User %s: %s", user.id, balance_data)
                 await self.reply_text(update, message)
                 
             except Exception as e:
-                logging.error(f"Error in balance_command: {str(e)}")
+                logging.error("Error in balance_command: %s", str(e))
                 await self.reply_text(update, "❌ Error to calculate balance.")
 
+    async def forecast_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Handle /forecast command - Project end-of-month balance and category spend
+        """
+        with flask_app.app_context():
+            try:
+                user = user_service.get_or_create_user(update)
+
+                forecast = forecast_service.forecast_month(user.id)
+
+                message = forecast_message(forecast)
+                logging.debug("Forecast for User %s: %s", user.id, forecast)
+                await self.reply_text(update, message)
+
+            except Exception as e:
+                logging.error("Error in forecast_command: %s", str(e))
+                await self.reply_text(update, "❌ Error calculating forecast.")
+
     async def summary_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
         Handle /resumen command - Show financial summary with categories
@@ -438,10 +656,10 @@ class ExpenseBot:
                 balance_data = summary['balance']
 
                 message = summary_message(summary, balance_data)
-                logging.info(f"Summary for User {user.id}: {summary}")
+                logging.debug("Summary for User %s: %s", user.id, summary)
                 await self.reply_text(update, message)                
             except Exception as e:
-                logging.error(f"Error in summary_command: {str(e)}")
+                logging.error("Error in summary_command: %s", str(e))
                 await self.reply_text(update, "❌ Error to generate summary.")
 
     async def link_account_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -459,18 +677,12 @@ class ExpenseBot:
                     await self.reply_text(update, message)
                     return
 
-                token = uuid.uuid4().hex
-                user.vinculation_token = token
-                user.vinculation_token_created = utc_now()
-                user_service.update_user(user.id, {
-                    "vinculation_token": user.vinculation_token,
-                    "vinculation_token_created": user.vinculation_token_created
-                })
+                token = link_token_service.issue(user.id)
                 message = link_account_message(token)
-                logging.info(f"Link token generated for User {user.id}: {token}")
+                logging.info("Link token generated for User %s", user.id)
                 await self.reply_text(update, message)
             except Exception as e:
-                logging.error(f"Error generating link token: {str(e)}")
+                logging.error("Error generating link token: %s", str(e))
                 await self.reply_text(update, f"❌ Error generating link token: {str(e)}")
 
     async def dashboard_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -486,7 +698,7 @@ class ExpenseBot:
     def run(self):
         """Start the bot."""
         logging.info("Starting Expense Management Bot...")
-        logging.info(f"Token {'configured' if self.token else 'not configured'}")
+        logging.info("Token %s", 'configured' if self.token else 'not configured')
         self.app.run_polling()
 
 
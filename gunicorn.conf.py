@@ -0,0 +1,96 @@
+"""
+Gunicorn settings for serving the API in production.
+
+Command to run (gunicorn picks this file up from the working directory):
+    gunicorn -c gunicorn.conf.py
+
+Workers default to ``2 * cores + 1`` processes with GUNICORN_THREADS threads
+each, so requests waiting on the database or a password hash do not hold a
+whole process. The app factory runs once in the master (``preload_app``):
+workers fork with the routes, SQLite setup and password calibration already
+done, and each drops the inherited database connections to open its own.
+
+Reloads are graceful: ``kill -HUP <master pid>`` starts fresh workers and lets
+the old ones finish their requests (up to GUNICORN_GRACEFUL_TIMEOUT). Because
+the app is preloaded, deploying new code needs ``kill -USR2 <master pid>``
+(starts a new master with the new code) followed by ``kill -TERM`` on the old
+master once the new one is up.
+
+With more than one worker, RATE_LIMIT_STORAGE_URL must point to Redis while
+rate limiting is enabled: per-process counters would multiply the limits by
+the number of workers, so the server refuses to start instead.
+
+Workers write logs through the queue listener that ``setup_logging`` restarts
+in every forked child, and publish metrics to METRICS_MULTIPROC_DIR (a
+directory under the system temp folder unless set), so ``/metrics`` reports
+the totals of all workers, plus the OCR histogram of worker.py when it uses
+the same directory.
+"""
+
+import multiprocessing
+import os
+import tempfile
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Must be set before gunicorn preloads the app and its Config reads it, so the
+# app is not imported here; same default as app.utils.metrics.DEFAULT_MULTIPROC_DIR
+if not os.getenv('METRICS_MULTIPROC_DIR'):
+    os.environ['METRICS_MULTIPROC_DIR'] = os.path.join(tempfile.gettempdir(), 'expense-api-metrics')
+
+wsgi_app = 'run:app'
+bind = f"{os.getenv('HOST', '127.0.0.1')}:{os.getenv('PORT', '5000')}"
+
+workers = int(os.getenv('WEB_CONCURRENCY') or multiprocessing.cpu_count() * 2 + 1)
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then to cap slow memory growth; jitter avoids restarting them all at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+
+
+def on_starting(server):
+    """
+    Refuse per-process rate limit counters with several workers, and fold
+    metrics left by workers of a previous run into the archive.
+    """
+    from app.config import Config
+    from app.utils.metrics import SharedMetricsStore
+    if server.cfg.workers > 1 and Config.RATE_LIMIT_ENABLED and not Config.RATE_LIMIT_STORAGE_URL:
+        # In-memory counters would let each worker admit the full limit
+        raise RuntimeError(
+            f"{server.cfg.workers} workers need shared rate limit counters: set RATE_LIMIT_STORAGE_URL "
+            "to a redis:// URL, or run one worker (WEB_CONCURRENCY=1)"
+        )
+    SharedMetricsStore(os.environ['METRICS_MULTIPROC_DIR']).archive_dead_processes()
+
+
+def when_ready(server):
+    server.log.info("API ready: %s workers x %s threads on %s",
+                    server.cfg.workers, server.cfg.threads, ', '.join(server.cfg.bind))
+
+
+def post_fork(server, worker):
+    """Drop the database connections opened by the master while preloading the app."""
+    from app.extensions import db
+    flask_app = worker.app.wsgi()
+    with flask_app.app_context():
+        db.engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    """Keep an exited worker's metrics in the archive instead of a file per dead pid."""
+    from app.utils.metrics import SharedMetricsStore
+    SharedMetricsStore(os.environ['METRICS_MULTIPROC_DIR']).mark_process_dead(worker.pid)
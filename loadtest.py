@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Load test for the REST API against the local SQLite database.
+
+Seeds a load-test user with a synthetic ledger into the configured database
+(the app's SQLite file when DATABASE_URL is unset), logs in once, then runs
+``--clients`` client processes, each sending authenticated GET requests over
+one keep-alive connection for ``--duration`` seconds. Prints requests/second
+and latency percentiles per endpoint.
+
+Command to run (start the API first, e.g. ``gunicorn -c gunicorn.conf.py``):
+    python loadtest.py --seed 20000 --clients 8 --duration 30
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+LOADTEST_EMAIL = 'loadtest@example.com'
+LOADTEST_PASSWORD = 'loadtest-password'
+
+ENDPOINTS = [
+    '/api/expenses?limit=50',
+    '/api/incomes?limit=50',
+    '/api/balance/total',
+    '/api/balance/monthly',
+    '/api/balance/summary',
+    '/api/expenses/statistics',
+]
+
+
+def seed(expenses: int):
+    """Create the load-test user with ``expenses`` expenses (and 1/20 as many incomes) if it has none yet."""
+    from sqlalchemy import insert
+    from app import create_app
+    from app.extensions import db
+    from app.models import Expense, Income, User
+    from tests.benchmarks.datasets import expense_rows, income_rows
+
+    flask_app = create_app(os.getenv('FLASK_ENV', 'development'), api=False)
+    with flask_app.app_context():
+        db.create_all()
+        user = User.query.filter_by(email=LOADTEST_EMAIL).first()
+        if user is None:
+            user = User(telegram_id='loadtest', email=LOADTEST_EMAIL, is_linked=True)
+            user.set_password(LOADTEST_PASSWORD)
+            db.session.add(user)
+            db.session.commit()
+        if Expense.query.filter_by(user_id=user.id).first() is None and expenses:
+            db.session.execute(insert(Expense), expense_rows([user.id], expenses))
+            db.session.execute(insert(Income), income_rows([user.id], max(1, expenses // 20)))
+            db.session.commit()
+        print(f"Seeded {LOADTEST_EMAIL}: {Expense.query.filter_by(user_id=user.id).count()} expenses")
+
+
+def connect(base_url: str) -> http.client.HTTPConnection:
+    parts = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    return connection_class(parts.hostname, parts.port, timeout=30)
+
+
+def login(base_url: str) -> str:
+    connection = connect(base_url)
+    body = json.dumps({'email': LOADTEST_EMAIL, 'password': LOADTEST_PASSWORD})
+    try:
+        connection.request('POST', '/api/login', body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+    except OSError as e:
+        sys.exit(f"Cannot reach the API at {base_url}: {e}")
+    payload = json.loads(response.read() or b'{}')
+    if response.status != 200:
+        sys.exit(f"Login failed ({response.status}): {payload.get('error')}")
+    return payload['access_token']
+
+
+def run_client(base_url: str, token: str, duration: float, offset: int) -> Dict[str, Tuple[List[float], int]]:
+    """Send requests round-robin over ENDPOINTS until ``duration`` elapses. Returns latencies and errors per endpoint."""
+    headers = {'Authorization': f'Bearer {token}'}
+    results = {path: ([], 0) for path in ENDPOINTS}
+    connection = connect(base_url)
+    deadline = time.perf_counter() + duration
+    i = offset
+    while time.perf_counter() < deadline:
+        path = ENDPOINTS[i % len(ENDPOINTS)]
+        i += 1
+        started = time.perf_counter()
+        ok = False
+        # A worker restarting (reload, max_requests) closes idle keep-alive
+        # connections; retry once on a new connection as HTTP clients do
+        for _ in range(2):
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+                break
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = connect(base_url)
+        latencies, errors = results[path]
+        if ok:
+            latencies.append(time.perf_counter() - started)
+        else:
+            results[path] = (latencies, errors + 1)
+    connection.close()
+    return results
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def report(results: List[Dict[str, Tuple[List[float], int]]], elapsed: float):
+    print(f'{"endpoint":<30} {"requests":>9} {"errors":>7} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    all_latencies, all_errors = [], 0
+    for path in ENDPOINTS:
+        latencies = [sample for result in results for sample in result[path][0]]
+        errors = sum(result[path][1] for result in results)
+        all_latencies.extend(latencies)
+        all_errors += errors
+        print(f'{path:<30} {len(latencies):>9} {errors:>7} {len(latencies) / elapsed:>9.1f} '
+              f'{percentile(latencies, 50) * 1000:>8.2f} {percentile(latencies, 95) * 1000:>8.2f} '
+              f'{percentile(latencies, 99) * 1000:>8.2f}')
+    print(f'{"total":<30} {len(all_latencies):>9} {all_errors:>7} {len(all_latencies) / elapsed:>9.1f} '
+          f'{percentile(all_latencies, 50) * 1000:>8.2f} {percentile(all_latencies, 95) * 1000:>8.2f} '
+          f'{percentile(all_latencies, 99) * 1000:>8.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default=f"http://{os.getenv('HOST', '127.0.0.1')}:{os.getenv('PORT', '5000')}")
+    parser.add_argument('--seed', type=int, default=20000, help='expenses to seed for the load-test user (0 to skip)')
+    parser.add_argument('--clients', type=int, default=os.cpu_count() or 1, help='concurrent client processes')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to run')
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.seed)
+    token = login(args.url)
+
+    print(f"Running {args.clients} clients for {args.duration:.0f}s against {args.url}")
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.clients) as pool:
+        futures = [pool.submit(run_client, args.url, token, args.duration, i) for i in range(args.clients)]
+        results = [future.result() for future in futures]
+    report(results, time.perf_counter() - started)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Copy a database with CHAR(36) UUID keys into the BINARY(16) key schema.
+
+Creates the current schema in an empty target database, then streams every
+table across in foreign-key order. Ids are read as strings from the source
+and converted by the models' GUID type on insert; columns the current models
+no longer have are dropped. Point DATABASE_URL at the target afterwards.
+
+Command to run (stop the API, bot, worker and scheduler first):
+    python migrate_keys.py <source_database_url> <target_database_url>
+"""
+
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from app.utils.logging_config import setup_logging
+setup_logging()
+import logging
+
+from sqlalchemy import MetaData, create_engine, select
+from app.extensions import db
+from app.utils.fulltext import configure_sqlite_fts, rebuild_sqlite_fts
+import app.models  # noqa: F401 - registers every table on db.metadata
+
+BATCH_SIZE = 5000
+
+
+def copy_table(source, target, table, source_table) -> int:
+    """Copy the columns both schemas share, in batches. Returns the number of rows."""
+    columns = [column.name for column in table.columns if column.name in source_table.columns]
+    copied = 0
+    with source.connect() as reader, target.begin() as writer:
+        result = reader.execution_options(stream_results=True).execute(
+            select(*[source_table.columns[name] for name in columns])
+        )
+        for rows in result.partitions(BATCH_SIZE):
+            writer.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+            copied += len(rows)
+    return copied
+
+
+def main(source_url: str, target_url: str):
+    """Create the schema in the target and copy every table from the source."""
+    source = create_engine(source_url)
+    target = create_engine(target_url)
+    source_metadata = MetaData()
+    source_metadata.reflect(bind=source)
+
+    if target.dialect.name == 'sqlite':
+        configure_sqlite_fts(target, db.metadata.tables['expenses'])
+    db.metadata.create_all(target)
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in source_metadata.tables:
+            logging.info("Skipping %s: not in the source database.", table.name)
+            continue
+        copied = copy_table(source, target, table, source_metadata.tables[table.name])
+        logging.info("Copied %s rows of %s.", copied, table.name)
+
+    if target.dialect.name == 'sqlite':
+        with target.begin() as connection:
+            rebuild_sqlite_fts(connection)
+    logging.info("Done. Set DATABASE_URL to %s.", target.url.render_as_string(hide_password=True))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    main(sys.argv[1], sys.argv[2])
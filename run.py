@@ -1,15 +1,21 @@
 #!/usr/bin/env python3
 """
 Entry point for the Dashboard Expense Management Flask application.
+
+``python run.py`` starts Flask's development server. In production serve
+``run:app`` with gunicorn instead: ``gunicorn -c gunicorn.conf.py``.
 """
 
 import os
-from app import create_app
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+from app.utils.logging_config import setup_logging
+setup_logging()
+from app import create_app
+
 # Create Flask application using factory pattern
 app = create_app()
 
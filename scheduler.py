@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Scheduler for recurring incomes and expenses.
+Books every occurrence that is due, catching up on anything missed while it
+was stopped, then sleeps for RECURRING_POLL_SECONDS. Each run also purges
+expired account-linking tokens.
+
+Command to run:
+    python scheduler.py
+"""
+
+import os
+import signal
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from app.utils.logging_config import setup_logging
+setup_logging()
+import logging
+
+from app import create_app
+from app.services.recurring_service import recurring_service
+from app.services.link_token_service import link_token_service
+
+FLASK_ENV = os.getenv('FLASK_ENV', 'development')
+
+# Create Flask app context for database operations
+flask_app = create_app(FLASK_ENV, api=False)
+
+
+class RecurringScheduler:
+    """Run due recurring rules on a fixed interval."""
+
+    def __init__(self, poll_seconds: float):
+        self.poll_seconds = poll_seconds
+        self.stopped = threading.Event()
+
+    def stop(self, signum=None, frame=None):
+        """Finish the current run, then exit."""
+        logging.info("Stopping recurring scheduler...")
+        self.stopped.set()
+
+    def run(self):
+        """Start the scheduler loop."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        with flask_app.app_context():
+            logging.info("Recurring scheduler started (every %s seconds).", self.poll_seconds)
+            while not self.stopped.is_set():
+                try:
+                    created = recurring_service.run_due()
+                    if created:
+                        logging.info("Booked %s recurring incomes and expenses.", created)
+                except Exception as e:
+                    logging.error("Error running recurring rules: %s", str(e))
+                try:
+                    link_token_service.purge_expired()
+                except Exception as e:
+                    logging.error("Error purging link tokens: %s", str(e))
+                self.stopped.wait(self.poll_seconds)
+
+
+def main():
+    """Main function to run the scheduler."""
+    scheduler = RecurringScheduler(flask_app.config['RECURRING_POLL_SECONDS'])
+    scheduler.run()
+
+
+if __name__ == '__main__':
+    main()
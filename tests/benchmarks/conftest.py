@@ -0,0 +1,146 @@
+"""
+Fixtures for the benchmark suite.
+
+The ledger is seeded once per session into the testing profile's in-memory
+SQLite database, so the suite runs offline. Sizes can be scaled with ``BENCH_EXPENSES``/``BENCH_OCR_TICKETS``
+and every budget with ``BENCH_BUDGET_SCALE`` (e.g. ``2`` on slow CI runners).
+"""
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import pytest
+
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-benchmark-secret')
+
+pytest.importorskip('flask_sqlalchemy')
+
+from tests.benchmarks.datasets import expense_rows, income_rows, load_store_keywords
+
+BENCH_EXPENSES = int(os.getenv('BENCH_EXPENSES', 100_000))
+BENCH_OCR_TICKETS = int(os.getenv('BENCH_OCR_TICKETS', 2_000))
+BUDGET_SCALE = float(os.getenv('BENCH_BUDGET_SCALE', 1.0))
+
+BENCH_USER_ID = '00000000-0000-4000-8000-000000000001'
+OTHER_USER_IDS = [f'00000000-0000-4000-8000-00000000000{i}' for i in range(2, 6)]
+
+_results: List['BenchResult'] = []
+
+
+@dataclass
+class BenchResult:
+    name: str
+    rounds: int
+    ops: int
+    total_s: float
+    p50_ms: float
+    p95_ms: float
+
+    @property
+    def throughput(self) -> float:
+        return self.ops / self.total_s if self.total_s else float('inf')
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+@pytest.fixture
+def bench(request):
+    """
+    Time ``fn`` over several rounds and record throughput and p95 latency.
+
+    ``ops_per_round`` is how many logical operations one call performs (e.g.
+    tickets parsed), used for throughput. When ``p95_budget_ms`` is given the
+    test fails if the measured p95 exceeds it (times ``BENCH_BUDGET_SCALE``).
+    """
+    def run(fn: Callable, *args, rounds: int = 20, warmup: int = 2, ops_per_round: int = 1,
+            p95_budget_ms: Optional[float] = None, **kwargs):
+        for _ in range(warmup):
+            fn(*args, **kwargs)
+        samples = []
+        value = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            value = fn(*args, **kwargs)
+            samples.append(time.perf_counter() - start)
+        result = BenchResult(
+            name=request.node.name,
+            rounds=rounds,
+            ops=rounds * ops_per_round,
+            total_s=sum(samples),
+            p50_ms=_percentile(samples, 50) * 1000,
+            p95_ms=_percentile(samples, 95) * 1000,
+        )
+        _results.append(result)
+        if p95_budget_ms is not None:
+            budget = p95_budget_ms * BUDGET_SCALE
+            assert result.p95_ms <= budget, f'{result.name}: p95 {result.p95_ms:.2f}ms exceeds budget {budget:.2f}ms'
+        return value
+    return run
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    from app.extensions import db
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture(scope='session')
+def store_keywords(app):
+    """Seed the default store categories and return them as a dict."""
+    from app.extensions import db
+    from app.models import StoreCategory, User
+
+    keywords = load_store_keywords()
+    db.session.add(User(id=BENCH_USER_ID, telegram_id='bench'))
+    db.session.flush()
+    db.session.add_all(
+        StoreCategory(store_name=name, category=category, user_id=BENCH_USER_ID)
+        for name, category in keywords.items()
+    )
+    db.session.commit()
+    return keywords
+
+
+@pytest.fixture(scope='session')
+def ledger(app, store_keywords):
+    """Seed ``BENCH_EXPENSES`` expenses (about half for the bench user) plus incomes."""
+    from sqlalchemy import insert
+    from app.extensions import db
+    from app.models import Expense, Income, User
+
+    db.session.add_all(User(id=user_id, telegram_id=f'bench-{i}') for i, user_id in enumerate(OTHER_USER_IDS))
+    db.session.commit()
+
+    owners = [BENCH_USER_ID] * len(OTHER_USER_IDS) + OTHER_USER_IDS
+    db.session.execute(insert(Expense), expense_rows(owners, BENCH_EXPENSES))
+    db.session.execute(insert(Income), income_rows(owners, max(1, BENCH_EXPENSES // 20)))
+    db.session.commit()
+    return BENCH_USER_ID
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark: performance benchmark over synthetic data')
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    terminalreporter.section('benchmarks')
+    terminalreporter.write_line(f'{"name":<45} {"rounds":>6} {"ops/s":>12} {"p50 ms":>9} {"p95 ms":>9}')
+    for r in _results:
+        terminalreporter.write_line(
+            f'{r.name:<45} {r.rounds:>6} {r.throughput:>12.1f} {r.p50_ms:>9.2f} {r.p95_ms:>9.2f}'
+        )
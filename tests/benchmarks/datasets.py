@@ -0,0 +1,101 @@
+"""
+Deterministic synthetic datasets for the benchmark suite.
+"""
+import json
+import os
+import random
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+DEFAULT_CATEGORIES_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'app', 'json', 'default_categories.json')
+
+NOISE_WORDS = ['SUCURSAL', 'RFC', 'CAJA', 'CAJERO', 'FOLIO', 'ARTICULOS', 'GRACIAS POR SU COMPRA', 'IVA INCLUIDO']
+PRODUCTS = ['LECHE', 'PAN', 'HUEVO', 'CAFE', 'REFRESCO', 'GALLETAS', 'JABON', 'ARROZ', 'FRIJOL', 'TORTILLAS']
+EXPENSE_CATEGORIES = ['supermercado', 'conveniencia', 'restaurantes', 'transporte', 'servicios', 'salud', 'uncategorized']
+
+
+def load_store_keywords() -> Dict[str, str]:
+    """Load the bundled store -> category mapping used by new users."""
+    with open(DEFAULT_CATEGORIES_PATH, 'r', encoding='utf-8') as f:
+        return {row['store_name']: row['category'] for row in json.load(f)}
+
+
+def _mangle(text: str, rng: random.Random) -> str:
+    """Introduce OCR-like character errors into a store name."""
+    chars = list(text)
+    for _ in range(rng.randint(0, 2)):
+        i = rng.randrange(len(chars))
+        chars[i] = rng.choice('0OIl1S5B8 ')
+    return ''.join(chars)
+
+
+def ocr_line_sets(count: int, store_names: List[str], seed: int = 42) -> List[List[str]]:
+    """Generate ``count`` ticket-like OCR outputs as lists of lines."""
+    rng = random.Random(seed)
+    tickets = []
+    for _ in range(count):
+        lines = []
+        store = rng.choice(store_names)
+        roll = rng.random()
+        if roll < 0.6:
+            lines.append(store)
+        elif roll < 0.85:
+            lines.append(_mangle(store, rng))
+        else:
+            lines.append(f'TIENDA {rng.randint(1, 9999)}')
+        lines.extend(rng.sample(NOISE_WORDS, 3))
+        day = date(2025, 1, 1) + timedelta(days=rng.randint(0, 364))
+        lines.append(day.strftime('%d/%m/%Y') + f' {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}')
+        subtotal = 0.0
+        for _ in range(rng.randint(3, 25)):
+            price = round(rng.uniform(5, 300), 2)
+            subtotal += price
+            lines.append(f'{rng.choice(PRODUCTS)} {rng.randint(1, 5)} $ {price:.2f}')
+        lines.append(f'SUBTOTAL $ {subtotal:.2f}')
+        lines.append(f'IVA $ {subtotal * 0.16:.2f}')
+        lines.append(f'TOTAL M.N. $ {subtotal * 1.16:.2f}')
+        tickets.append(lines)
+    return tickets
+
+
+def expense_rows(user_ids: List[str], count: int, seed: int = 7) -> List[Dict]:
+    """Generate ``count`` expense rows spread over three years and ``user_ids``."""
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=3 * 365)
+    rows = []
+    for _ in range(count):
+        payment_date = start + timedelta(days=rng.randint(0, 3 * 365))
+        total = round(rng.lognormvariate(5, 1), 2)
+        rows.append({
+            'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'user_id': rng.choice(user_ids),
+            'payment_concept': rng.choice(PRODUCTS),
+            'category': rng.choice(EXPENSE_CATEGORIES),
+            'subtotal': round(total / 1.16, 2),
+            'tax': 16,
+            'total': total,
+            'payment_date': payment_date,
+            'created_at': datetime.combine(payment_date, datetime.min.time()),
+            'updated_at': datetime.combine(payment_date, datetime.min.time()),
+        })
+    return rows
+
+
+def income_rows(user_ids: List[str], count: int, seed: int = 11) -> List[Dict]:
+    """Generate ``count`` income rows spread over three years and ``user_ids``."""
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=3 * 365)
+    rows = []
+    for _ in range(count):
+        income_date = start + timedelta(days=rng.randint(0, 3 * 365))
+        rows.append({
+            'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'user_id': rng.choice(user_ids),
+            'source': rng.choice(['SALARY', 'FREELANCE', 'REFUND', 'SALE']),
+            'amount': round(rng.uniform(500, 30000), 2),
+            'income_date': income_date,
+            'created_at': datetime.combine(income_date, datetime.min.time()),
+            'updated_at': datetime.combine(income_date, datetime.min.time()),
+        })
+    return rows
@@ -0,0 +1,48 @@
+"""
+Benchmarks for balance and expense aggregates over a seeded ledger.
+"""
+import pytest
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.fixture(scope='module')
+def balance_service():
+    from app.services.balance_service import balance_service
+    return balance_service
+
+
+@pytest.fixture(scope='module')
+def expense_service():
+    from app.services.expense_service import expense_service
+    return expense_service
+
+
+def test_total_balance(bench, ledger, balance_service):
+    result = bench(balance_service.get_total_balance, ledger, p95_budget_ms=1500)
+    assert 'total_balance' in result
+
+
+def test_monthly_balance(bench, ledger, balance_service):
+    result = bench(balance_service.get_monthly_balance, ledger, p95_budget_ms=150)
+    assert result['total_expenses'] >= 0
+
+
+def test_financial_summary(bench, ledger, balance_service):
+    result = bench(balance_service.get_financial_summary, ledger, p95_budget_ms=500)
+    assert 'all_categories' in result
+
+
+def test_daily_balance_chart(bench, ledger, balance_service):
+    result = bench(balance_service.get_daily_balance_chart, ledger, p95_budget_ms=1000)
+    assert result
+
+
+def test_monthly_expenses(bench, ledger, expense_service):
+    result = bench(expense_service.get_monthly_expenses, ledger, p95_budget_ms=700)
+    assert 'total_expenses' in result
+
+
+def test_expense_statistics(bench, ledger, expense_service):
+    result = bench(expense_service.get_expense_statistics, ledger, percentiles=[50, 95], p95_budget_ms=1500)
+    assert result['total_expenses'] > 0
@@ -0,0 +1,42 @@
+"""
+Benchmarks for OCR text parsing and store matching.
+"""
+import pytest
+
+from tests.benchmarks.conftest import BENCH_OCR_TICKETS
+from tests.benchmarks.datasets import ocr_line_sets
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.fixture(scope='module')
+def tickets(store_keywords):
+    return ocr_line_sets(BENCH_OCR_TICKETS, list(store_keywords))
+
+
+@pytest.fixture(scope='module')
+def parser():
+    from app.services.ocr_service import OCRService
+
+    # The OCR model is only loaded on first use, which parsing never triggers
+    return OCRService()
+
+
+def test_match_store(bench, tickets, store_keywords):
+    from app.utils.helpers import match_store
+
+    def run():
+        return [match_store(lines, store_keywords) for lines in tickets]
+
+    matches = bench(run, rounds=5, warmup=1, ops_per_round=len(tickets), p95_budget_ms=0.25 * len(tickets))
+    assert sum(1 for store, _ in matches if store) > len(tickets) // 2
+
+
+def test_parse_ticket_text(bench, tickets, parser):
+    texts = ['\n'.join(lines) for lines in tickets]
+
+    def run():
+        return [parser._parse_ticket_text(text) for text in texts]
+
+    parsed = bench(run, rounds=3, warmup=1, ops_per_round=len(texts), p95_budget_ms=3 * len(texts))
+    assert all(data['total'] is not None for data in parsed)
@@ -0,0 +1,71 @@
+"""
+Cold-start import budgets for the API and the bot.
+
+Each process is started fresh with ``python -X importtime`` so the measurement
+includes every module it loads. The API must never pull in the OCR, imaging or
+symbolic-math stacks; the bot may use them, but only once a ticket arrives.
+"""
+import os
+import subprocess
+import sys
+from typing import Dict
+
+import pytest
+
+from tests.benchmarks.conftest import BUDGET_SCALE
+
+pytestmark = pytest.mark.benchmark
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+HEAVY_PACKAGES = ('paddleocr', 'paddle', 'paddlex', 'PIL', 'cv2', 'sympy')
+
+API_STARTUP = "from app import create_app; create_app('testing')"
+BOT_STARTUP = "import bot"
+
+
+def import_profile(code: str, cwd: str) -> Dict[str, float]:
+    """Run ``code`` in a new interpreter and return cumulative import time (ms) per module."""
+    # Run outside the repo so the log and upload folders land in ``cwd``
+    python_path = os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')]))
+    env = dict(os.environ, FLASK_ENV='testing', PYTHONPATH=python_path)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=cwd, env=env, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        profile[name.rstrip()] = int(cumulative) / 1000
+    return profile
+
+
+def total_ms(profile: Dict[str, float]) -> float:
+    # Top-level imports have a single space before the name; nested ones are indented further
+    return sum(ms for name, ms in profile.items() if not name.startswith('  '))
+
+
+def loaded_heavy_packages(profile: Dict[str, float]):
+    return sorted({name.strip().split('.')[0] for name in profile} & set(HEAVY_PACKAGES))
+
+
+def test_api_startup_skips_heavy_packages(tmp_path):
+    profile = import_profile(API_STARTUP, str(tmp_path))
+    assert loaded_heavy_packages(profile) == []
+
+
+def test_api_startup_budget(tmp_path):
+    elapsed = total_ms(import_profile(API_STARTUP, str(tmp_path)))
+    budget = 1500 * BUDGET_SCALE
+    assert elapsed <= budget, f'API import time {elapsed:.0f}ms exceeds budget {budget:.0f}ms'
+
+
+def test_bot_startup_loads_ocr_lazily(tmp_path):
+    pytest.importorskip('telegram')
+    profile = import_profile(BOT_STARTUP, str(tmp_path))
+    assert loaded_heavy_packages(profile) == []
+    assert not any(name.strip().startswith('app.api') for name in profile)
+    budget = 2000 * BUDGET_SCALE
+    assert total_ms(profile) <= budget, f'bot import time {total_ms(profile):.0f}ms exceeds budget {budget:.0f}ms'
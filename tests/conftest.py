@@ -0,0 +1,84 @@
+"""
+Shared fixtures: a fresh app on the testing profile (in-memory SQLite) per test,
+users and their JWT headers.
+"""
+import os
+import uuid
+
+import pytest
+
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-test-secret-key-test-secret')
+# Tests only need valid hashes, not slow ones
+os.environ.setdefault('PASSWORD_HASH_ITERATIONS', '1000')
+
+pytest.importorskip('flask_sqlalchemy')
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    from app import create_app
+    from app.config import Config
+    from app.extensions import db
+    from app.services.token_service import token_service
+    from app.utils.rate_limit import rate_limiter
+
+    monkeypatch.setattr(Config, 'FILE_FOLDER', str(tmp_path / 'tickets'))
+    monkeypatch.setattr(Config, 'OCR_JOB_FOLDER', str(tmp_path / 'pending'))
+    app = create_app('testing')
+    token_service.clear()
+    rate_limiter.store.clear()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """Create a linked user with an email and password."""
+    from app.extensions import db
+    from app.models import User
+
+    def make(email=None, password='correct-horse-battery', linked=True):
+        user = User(telegram_id=uuid.uuid4().hex[:16], email=email or f'{uuid.uuid4().hex[:8]}@example.com',
+                    is_linked=linked)
+        user.set_password(password)
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def auth_headers(app):
+    """Authorization header with a fresh access token for a user."""
+    from app.services.token_service import token_service
+
+    def headers(user):
+        return {'Authorization': f"Bearer {token_service.issue_tokens(user)['access_token']}"}
+    return headers
+
+
+@pytest.fixture
+def make_expense(app):
+    from app.services.expense_service import expense_service
+
+    def make(user, **data):
+        values = {'payment_concept': 'Coffee', 'total': 50.0, 'category': 'restaurantes', **data}
+        return expense_service.create_expense({**values, 'user_id': user.id}, allow_duplicate=True)
+    return make
+
+
+@pytest.fixture
+def make_income(app):
+    from app.services.income_service import income_service
+
+    def make(user, **data):
+        return income_service.create_income({'source': 'SALARY', 'amount': 1000.0, **data, 'user_id': user.id})
+    return make
@@ -0,0 +1,108 @@
+"""
+Running per-category statistics (Welford) behind the unusual-expense flag.
+"""
+import statistics
+
+import pytest
+
+from app.config import Config
+from app.extensions import db
+from app.models import Expense
+from app.models.category_stat import CategoryStat
+from app.services.anomaly_service import AnomalyService, anomaly_service
+
+TOTALS = [120.0, 80.5, 99.9, 310.0, 45.25, 150.0, 87.0]
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user()
+
+
+def _expense(user, total, category='Restaurantes'):
+    return Expense(user_id=user.id, payment_concept='Test', total=total, category=category)
+
+
+def _stat(user, category='restaurantes'):
+    db.session.expire_all()
+    return db.session.get(CategoryStat, (user.id, category))
+
+
+def test_observe_matches_sample_statistics(user):
+    for total in TOTALS:
+        anomaly_service.observe(_expense(user, total))
+    db.session.commit()
+
+    stat = _stat(user)
+    assert stat.count == len(TOTALS)
+    assert stat.mean == pytest.approx(statistics.mean(TOTALS))
+    assert stat.variance == pytest.approx(statistics.variance(TOTALS))
+
+
+def test_observe_then_forget_round_trips(user):
+    for total in TOTALS:
+        anomaly_service.observe(_expense(user, total))
+    for total in TOTALS[4:]:
+        anomaly_service.forget(user.id, 'RESTAURANTES', total)
+    db.session.commit()
+
+    stat = _stat(user)
+    assert stat.count == 4
+    assert stat.mean == pytest.approx(statistics.mean(TOTALS[:4]))
+    assert stat.variance == pytest.approx(statistics.variance(TOTALS[:4]))
+
+    for total in TOTALS[:4]:
+        anomaly_service.forget(user.id, 'restaurantes', total)
+    db.session.commit()
+
+    stat = _stat(user)
+    assert (stat.count, stat.mean, stat.m2) == (0, 0.0, 0.0)
+
+
+def test_outlier_is_scored_after_min_samples(user, monkeypatch):
+    monkeypatch.setattr(Config, 'ANOMALY_MIN_SAMPLES', 5)
+    scores = [anomaly_service.observe(_expense(user, total)) for total in (100.0, 102.0, 98.0, 101.0, 99.0)]
+    outlier = _expense(user, 500.0)
+
+    score = anomaly_service.observe(outlier)
+
+    assert scores == [None] * 5
+    assert outlier.anomaly_score == score
+    assert anomaly_service.is_outlier(score)
+
+
+def test_first_expense_of_category_tolerates_concurrent_insert(user, monkeypatch):
+    locked_stat = AnomalyService._locked_stat
+    calls = []
+
+    def concurrent_first_insert(user_id, category):
+        # Another transaction inserts the row right after this one found none
+        if not calls:
+            calls.append(category)
+            stat = locked_stat(user_id, category)
+            db.session.execute(CategoryStat.__table__.insert().values(
+                user_id=user_id, category=category, count=1, mean=10.0, m2=0.0
+            ))
+            return stat
+        return locked_stat(user_id, category)
+    monkeypatch.setattr(AnomalyService, '_locked_stat', staticmethod(concurrent_first_insert))
+
+    anomaly_service.observe(_expense(user, 30.0))
+    db.session.commit()
+
+    stat = _stat(user)
+    assert (stat.count, stat.mean) == (2, 20.0)
+
+
+def test_rebuild_matches_incremental_statistics(user, make_expense):
+    for total in TOTALS:
+        make_expense(user, total=total, category='restaurantes')
+    incremental = _stat(user)
+    incremental = (incremental.count, incremental.mean, incremental.variance)
+
+    assert anomaly_service.rebuild(user.id) == 1
+
+    rebuilt = _stat(user)
+    assert rebuilt.count == incremental[0]
+    assert rebuilt.mean == pytest.approx(incremental[1])
+    assert rebuilt.variance == pytest.approx(incremental[2])
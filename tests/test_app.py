@@ -0,0 +1,39 @@
+"""
+Application factory: database selection, SQLite schema bootstrap and error responses.
+"""
+import pytest
+from sqlalchemy import inspect
+
+from app import create_app
+from app.config import config
+from app.extensions import db
+from app.services.expense_service import ExpenseService
+
+
+def test_fresh_sqlite_file_gets_its_schema(tmp_path, monkeypatch):
+    monkeypatch.setattr(config['testing'], 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path / "fresh.db"}')
+
+    app = create_app('testing', api=False)
+
+    with app.app_context():
+        tables = set(inspect(db.engine).get_table_names())
+        db.engine.dispose()
+    assert {'users', 'expenses', 'incomes', 'expenses_fts'} <= tables
+
+
+def test_production_requires_database_url(monkeypatch):
+    monkeypatch.setattr(config['production'], 'SQLALCHEMY_DATABASE_URI', None)
+
+    with pytest.raises(RuntimeError, match='DATABASE_URL'):
+        create_app('production', api=False)
+
+
+def test_server_errors_hide_exception_details(client, make_user, auth_headers, monkeypatch):
+    def broken(user_id, limit):
+        raise RuntimeError('connection to db-internal:3306 refused')
+    monkeypatch.setattr(ExpenseService, 'get_all_expenses', staticmethod(broken))
+
+    response = client.get('/api/expenses', headers=auth_headers(make_user()))
+
+    assert response.status_code == 500
+    assert response.get_json() == {'success': False, 'error': 'Internal server error'}
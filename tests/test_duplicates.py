@@ -0,0 +1,110 @@
+"""
+Duplicate detection when saving expenses.
+"""
+import pytest
+
+from app.extensions import db
+from app.models import Expense
+from app.models.ticket_blob import TicketBlob
+from app.services.expense_service import DuplicateExpenseError, expense_service
+from app.utils.helpers import expense_fingerprint, normalize_concept
+
+BLOB = 'a' * 64 + '.webp'
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user()
+
+
+@pytest.fixture
+def blob(app):
+    """Register BLOB in the ticket store so expenses can reference it."""
+    db.session.add(TicketBlob(file_name=BLOB, size=0))
+    db.session.commit()
+    return BLOB
+
+
+@pytest.mark.parametrize('concept, expected', [
+    ('Café  oxxo.', 'CAFE OXXO'),
+    ('  starbucks-coffee #123 ', 'STARBUCKS COFFEE 123'),
+    ('Ñandú, S.A. de C.V.', 'NANDU S A DE C V'),
+    ('...', ''),
+    (None, ''),
+])
+def test_normalize_concept(concept, expected):
+    assert normalize_concept(concept) == expected
+
+
+def test_fingerprint_ignores_spelling_but_not_amount_or_date():
+    base = expense_fingerprint('Café  oxxo.', 120.5, '2026-05-01')
+
+    assert expense_fingerprint('CAFE OXXO', 120.50, '2026-05-01') == base
+    assert expense_fingerprint('Cafe Oxxo', 120.51, '2026-05-01') != base
+    assert expense_fingerprint('Cafe Oxxo', 120.5, '2026-05-02') != base
+
+
+def test_duplicate_post_returns_409(client, user, auth_headers):
+    body = {'payment_concept': 'Café  oxxo.', 'total': 120.5, 'payment_date': '2026-05-01'}
+    created = client.post('/api/expenses', json=body, headers=auth_headers(user))
+
+    duplicate = client.post('/api/expenses', json={**body, 'payment_concept': 'CAFE OXXO'}, headers=auth_headers(user))
+
+    assert created.status_code == 201
+    assert duplicate.status_code == 409
+    assert duplicate.get_json()['duplicate_of']['id'] == created.get_json()['expense']['id']
+    assert Expense.query.count() == 1
+
+
+def test_allow_duplicate_saves_anyway(client, user, auth_headers):
+    body = {'payment_concept': 'Oxxo', 'total': 35.0, 'payment_date': '2026-05-01'}
+    client.post('/api/expenses', json=body, headers=auth_headers(user))
+
+    response = client.post('/api/expenses?allow_duplicate=true', json=body, headers=auth_headers(user))
+
+    assert response.status_code == 201
+    assert Expense.query.count() == 2
+
+
+def test_same_expense_of_another_user_is_not_a_duplicate(user, make_user, make_expense):
+    make_expense(user, payment_concept='Oxxo', total=35.0, payment_date='2026-05-01')
+    other = make_user()
+
+    expense_service.create_expense({'payment_concept': 'Oxxo', 'total': 35.0, 'payment_date': '2026-05-01',
+                                    'user_id': other.id})
+
+    assert Expense.query.count() == 2
+
+
+def test_same_ticket_image_is_a_duplicate(user, make_expense, blob):
+    make_expense(user, payment_concept='Walmart', total=300.0, file_name=BLOB)
+
+    with pytest.raises(DuplicateExpenseError):
+        expense_service.create_expense({'payment_concept': 'Walmart Super', 'total': 310.0,
+                                        'file_name': BLOB, 'user_id': user.id})
+
+
+def test_create_expenses_skips_duplicates_within_the_batch(user, make_expense, blob):
+    make_expense(user, payment_concept='Saved', total=10.0, payment_date='2026-05-01')
+    drafts = [
+        {'payment_concept': 'Café  oxxo.', 'total': 20.0, 'payment_date': '2026-05-01'},
+        {'payment_concept': 'CAFE OXXO', 'total': 20.0, 'payment_date': '2026-05-01'},
+        {'payment_concept': 'Ticket A', 'total': 30.0, 'file_name': BLOB},
+        {'payment_concept': 'Ticket B', 'total': 40.0, 'file_name': BLOB},
+        {'payment_concept': 'saved', 'total': 10.0, 'payment_date': '2026-05-01'},
+        {'payment_concept': 'Other', 'total': 50.0, 'payment_date': '2026-05-01'},
+    ]
+
+    created = expense_service.create_expenses([{**draft, 'user_id': user.id} for draft in drafts])
+
+    assert [expense.payment_concept for expense in created] == ['Café  oxxo.', 'Ticket A', 'Other']
+    assert Expense.query.count() == 4
+
+
+def test_create_expenses_allow_duplicates_keeps_all(user):
+    drafts = [{'payment_concept': 'Oxxo', 'total': 20.0, 'payment_date': '2026-05-01', 'user_id': user.id}] * 3
+
+    created = expense_service.create_expenses(drafts, allow_duplicates=True)
+
+    assert len(created) == 3
+    assert Expense.query.count() == 3
@@ -0,0 +1,136 @@
+"""
+End-to-end checks of the gunicorn profile: logs and metrics from forked workers.
+"""
+import http.client
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+pytest.importorskip('gunicorn')
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason='gunicorn needs a POSIX system')
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKERS = 3
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _request(port: int, method: str, path: str, body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+        response = connection.getresponse()
+        return response.status, response.read().decode()
+    finally:
+        connection.close()
+
+
+def _env(tmp_path, **overrides) -> dict:
+    """Environment for gunicorn.conf.py against a temporary SQLite file."""
+    env = dict(
+        os.environ,
+        FLASK_ENV='production',
+        JWT_SECRET_KEY='gunicorn-test-secret-key-gunicorn-test',
+        DATABASE_URL=f"sqlite:///{tmp_path / 'api.db'}",
+        FILE_FOLDER=str(tmp_path / 'tickets'),
+        OCR_JOB_FOLDER=str(tmp_path / 'pending'),
+        LOG_BOT_FILE=str(tmp_path / 'logs' / 'bot.log'),
+        LOG_BOT_EXTERNAL_LIBS_FILE=str(tmp_path / 'logs' / 'external_libs.log'),
+        METRICS_MULTIPROC_DIR=str(tmp_path / 'metrics'),
+        METRICS_FLUSH_SECONDS='0.1',
+        PASSWORD_HASH_ITERATIONS='1000',
+        RATE_LIMIT_ENABLED='false',
+        WEB_CONCURRENCY=str(WORKERS),
+        GUNICORN_THREADS='2',
+    )
+    env.update(overrides)
+    return env
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Run gunicorn.conf.py with several workers."""
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}'],
+        cwd=REPO_ROOT, env=_env(tmp_path), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            break
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                pytest.fail(f'gunicorn did not start: {process.stderr.read().decode()[-2000:]}')
+            time.sleep(0.1)
+    yield port, tmp_path
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def _wait_for(predicate, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.1)
+    return True
+
+
+def test_worker_logs_reach_file(server):
+    port, tmp_path = server
+    log_file = tmp_path / 'logs' / 'bot.log'
+
+    for _ in range(WORKERS * 2):
+        status, _ = _request(port, 'POST', '/api/login', {})
+        assert status == 400
+
+    def logged():
+        return log_file.exists() and 'Login attempt with missing credentials' in log_file.read_text(encoding='utf-8')
+
+    assert _wait_for(logged), 'a worker log line never reached the file handler'
+
+
+def test_metrics_are_summed_across_workers(server):
+    port, _ = server
+    requests = WORKERS * 4
+    for _ in range(requests):
+        _request(port, 'POST', '/api/login', {})
+
+    pattern = re.compile(r'^http_request_duration_seconds_count\{method="POST",endpoint="/api/login",status="400"\} (\d+)$', re.M)
+
+    def count():
+        match = pattern.search(_request(port, 'GET', '/metrics')[1])
+        return int(match.group(1)) if match else 0
+
+    assert _wait_for(lambda: count() == requests)
+    # Every scrape sees the same total, whichever worker serves it
+    assert {count() for _ in range(WORKERS * 2)} == {requests}
+
+
+def test_refuses_per_process_rate_limits_with_several_workers(tmp_path):
+    env = _env(tmp_path, RATE_LIMIT_ENABLED='true', RATE_LIMIT_STORAGE_URL='')
+    result = subprocess.run(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{_free_port()}'],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=60
+    )
+
+    assert result.returncode != 0
+    assert 'RATE_LIMIT_STORAGE_URL' in result.stderr
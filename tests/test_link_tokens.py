@@ -0,0 +1,46 @@
+"""
+Account-linking tokens: expiry and purging on the database clock.
+"""
+from datetime import timedelta
+
+import pytest
+
+from app.config import Config
+from app.extensions import db
+from app.models.link_token import LinkToken
+from app.services.link_token_service import link_token_service
+from app.utils.timestamps import database_now
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user(linked=False)
+
+
+def _expire(token):
+    link = link_token_service.get(token)
+    link.expires_at = database_now() - timedelta(seconds=1)
+    db.session.commit()
+    return link
+
+
+def test_issued_token_expires_after_configured_minutes(user):
+    token = link_token_service.issue(user.id)
+
+    link = link_token_service.get(token)
+    assert not link.is_expired()
+    expected = database_now() + timedelta(minutes=Config.TOKEN_EXPIRATION_MINUTES)
+    assert abs(link.expires_at - expected) < timedelta(seconds=5)
+    assert link.is_expired(link.expires_at)
+
+
+def test_purge_removes_only_expired_tokens(user, make_user):
+    expired = link_token_service.issue(user.id)
+    valid = link_token_service.issue(make_user(linked=False).id)
+    assert _expire(expired).is_expired()
+
+    assert link_token_service.purge_expired() == 1
+
+    assert link_token_service.get(expired) is None
+    assert link_token_service.get(valid) is not None
+    assert LinkToken.query.count() == 1
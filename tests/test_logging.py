@@ -0,0 +1,61 @@
+"""
+Tests for the queued logging pipeline.
+"""
+import logging
+import os
+
+import pytest
+
+from app.utils import logging_config
+from app.utils.logging_config import EXTERNAL_LIBS, setup_logging, stop_logging
+
+
+@pytest.fixture
+def log_files(tmp_path, monkeypatch):
+    """Point the log files at ``tmp_path`` and restore the root logger afterwards."""
+    main_log = tmp_path / 'bot.log'
+    monkeypatch.setenv('LOG_BOT_FILE', str(main_log))
+    monkeypatch.setenv('LOG_BOT_EXTERNAL_LIBS_FILE', str(tmp_path / 'external_libs.log'))
+    monkeypatch.setenv('LOG_FORMAT', 'text')
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    saved_libs = {lib: (logging.getLogger(lib).handlers[:], logging.getLogger(lib).propagate) for lib in EXTERNAL_LIBS}
+    yield main_log
+    stop_logging()
+    root.handlers[:] = saved_handlers
+    root.setLevel(saved_level)
+    for lib, (handlers, propagate) in saved_libs.items():
+        logging.getLogger(lib).handlers[:] = handlers
+        logging.getLogger(lib).propagate = propagate
+
+
+def test_root_logger_record_reaches_file(log_files):
+    setup_logging()
+    logging.warning("written by %s", 'the listener')
+    stop_logging()
+
+    assert 'WARNING | written by the listener' in log_files.read_text(encoding='utf-8')
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_forked_child_record_reaches_file(log_files):
+    setup_logging()
+    parent_listener = logging_config._listener
+
+    pid = os.fork()
+    if pid == 0:
+        # Child: log through the root logger, flush its own listener, exit without pytest teardown
+        code = 1
+        try:
+            if logging_config._listener is not parent_listener and logging_config._listener._thread.is_alive():
+                logging.error("from child %s", os.getpid())
+                stop_logging()
+                code = 0
+        finally:
+            os._exit(code)
+
+    _, status = os.waitpid(pid, 0)
+    stop_logging()
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert f'ERROR | from child {pid}' in log_files.read_text(encoding='utf-8')
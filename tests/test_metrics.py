@@ -0,0 +1,90 @@
+"""
+The /metrics endpoint, Server-Timing headers and metrics published by worker.py.
+"""
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.config import Config
+from app.extensions import db
+from app.utils.metrics import OCR_BUCKETS, SharedMetricsStore, metrics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER_CODE = """
+import sys
+from flask import Flask
+from app.utils.metrics import init_worker_metrics, track_ocr
+
+app = Flask('worker')
+app.config.update(METRICS_ENABLED=True, METRICS_MULTIPROC_DIR=sys.argv[1], METRICS_FLUSH_SECONDS=60)
+init_worker_metrics(app)
+with track_ocr():
+    pass
+"""
+
+
+@pytest.fixture
+def shared_dir(tmp_path):
+    directory = str(tmp_path / 'metrics')
+    metrics.configure(directory)
+    yield directory
+    metrics.configure(None)
+
+
+def test_metrics_answers_loopback_without_token(client, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_TOKEN', '')
+
+    local = client.get('/metrics')
+    remote = client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.5'})
+
+    assert local.status_code == 200
+    assert '# TYPE http_request_duration_seconds histogram' in local.get_data(as_text=True)
+    assert remote.status_code == 403
+
+
+def test_metrics_requires_token_when_set(client, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_TOKEN', 'scrape-secret')
+    remote = {'REMOTE_ADDR': '10.0.0.5'}
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'}, environ_base=remote)
+    assert response.status_code == 200
+
+
+def test_server_timing_reports_app_and_db(client, make_user, auth_headers):
+    response = client.get('/api/expenses', headers=auth_headers(make_user()))
+
+    timing = response.headers['Server-Timing']
+    assert re.fullmatch(r'app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"', timing)
+
+
+def test_failed_statement_is_timed_without_leaking_state(app):
+    with app.test_request_context():
+        with pytest.raises(OperationalError):
+            db.session.execute(text('SELECT * FROM no_such_table'))
+        db.session.rollback()
+        db.session.execute(text('SELECT 1'))
+
+        assert g._timings['db_count'] == 2
+        assert not db.session.connection().info.get('_query_start')
+
+def test_worker_ocr_timings_reach_api_metrics(client, shared_dir):
+    subprocess.run([sys.executable, '-c', WORKER_CODE, shared_dir], cwd=REPO_ROOT, check=True,
+                   env=dict(os.environ, PYTHONPATH=REPO_ROOT))
+
+    # The exited worker's file was folded into the archive
+    assert sorted(name for name in os.listdir(shared_dir) if name.endswith('.json')) == ['archive.json']
+    worker_count = SharedMetricsStore(shared_dir).collect()['ocr_duration_seconds'][()][len(OCR_BUCKETS)]
+    assert worker_count == 1
+
+    local_count = metrics.ocr_time.snapshot().get((), [0] * (len(OCR_BUCKETS) + 1))[len(OCR_BUCKETS)]
+    body = client.get('/metrics').get_data(as_text=True)
+    assert f'ocr_duration_seconds_count {local_count + 1}' in body
@@ -0,0 +1,179 @@
+"""
+Claiming, processing and requeueing of queued OCR jobs.
+"""
+import io
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.config import Config
+from app.extensions import db
+from app.models.ocr_job import OcrJob
+from app.services.expense_service import ExpenseService
+from app.services.ocr_job_service import ocr_job_service
+
+
+@pytest.fixture
+def make_job(make_user, tmp_path):
+    user = make_user()
+
+    def make(status=OcrJob.STATUS_QUEUED, attempts=0):
+        image_path = tmp_path / f'{len(list(tmp_path.glob("*.jpg")))}.jpg'
+        image_path.write_bytes(b'ticket')
+        job = OcrJob(user_id=user.id, image_path=str(image_path), status=status, attempts=attempts)
+        db.session.add(job)
+        db.session.commit()
+        return job
+    return make
+
+
+def _make_stale(*jobs):
+    OcrJob.query.filter(OcrJob.id.in_([job.id for job in jobs]))\
+        .update({'updated_at': datetime(2000, 1, 1)}, synchronize_session=False)
+    db.session.commit()
+
+
+def _status(job):
+    db.session.expire_all()
+    return db.session.get(OcrJob, job.id).status
+
+
+def test_claim_counts_attempts(make_job):
+    job = make_job()
+
+    claimed = ocr_job_service.claim_batch('worker-1')
+
+    assert [row.id for row in claimed] == [job.id]
+    assert claimed[0].attempts == 1
+    assert claimed[0].claimed_by == 'worker-1'
+    assert ocr_job_service.claim_batch('worker-2') == []
+
+
+def test_requeue_stale_jobs(make_job):
+    stale = make_job(OcrJob.STATUS_PROCESSING, attempts=1)
+    exhausted = make_job(OcrJob.STATUS_PROCESSING, attempts=3)
+    running = make_job(OcrJob.STATUS_PROCESSING, attempts=1)
+    queued = make_job()
+    _make_stale(stale, exhausted, queued)
+
+    assert ocr_job_service.requeue_stale(timeout_seconds=60, max_attempts=3) == 1
+
+    assert _status(stale) == OcrJob.STATUS_QUEUED
+    assert _status(running) == OcrJob.STATUS_PROCESSING
+    assert _status(queued) == OcrJob.STATUS_QUEUED
+    assert _status(exhausted) == OcrJob.STATUS_FAILED
+    assert db.session.get(OcrJob, exhausted.id).error == 'Gave up after 3 attempts'
+    assert not os.path.exists(exhausted.image_path)
+    assert os.path.exists(stale.image_path)
+
+
+def test_job_crashing_every_worker_fails_after_max_attempts(make_job):
+    job = make_job()
+
+    for attempt in range(1, 3):
+        assert [row.id for row in ocr_job_service.claim_batch(f'worker-{attempt}')] == [job.id]
+        # The worker dies mid-batch and the job times out
+        _make_stale(job)
+        ocr_job_service.requeue_stale(timeout_seconds=60, max_attempts=2)
+
+    assert _status(job) == OcrJob.STATUS_FAILED
+    assert ocr_job_service.claim_batch('worker-3') == []
+
+
+@pytest.fixture
+def ocr(monkeypatch):
+    """Fake OCR: a draft per image, failing for images listed in ``ocr.bad``."""
+    class FakeOcr:
+        bad = set()
+        error = ValueError
+        calls = []
+
+        def __call__(self, user_id, image_paths):
+            self.calls.append(list(image_paths))
+            if self.bad & set(image_paths):
+                raise self.error('cannot read ticket')
+            return [{'payment_concept': 'OXXO', 'total': 35.0, 'file_name': None} for _ in image_paths]
+    fake = FakeOcr()
+    monkeypatch.setattr(ExpenseService, 'process_ticket_images', staticmethod(fake))
+    return fake
+
+
+def test_bad_image_fails_only_its_own_job(make_job, ocr):
+    good, bad = make_job(), make_job()
+    ocr.bad = {bad.image_path}
+
+    ocr_job_service.process(ocr_job_service.claim_batch('worker-1'), 'worker-1')
+
+    assert (_status(good), _status(bad)) == (OcrJob.STATUS_DONE, OcrJob.STATUS_FAILED)
+    assert len(ocr.calls) == 3
+    assert not os.path.exists(good.image_path)
+    assert not os.path.exists(bad.image_path)
+
+
+def test_transient_error_requeues_jobs_and_keeps_images(make_job, ocr, monkeypatch):
+    monkeypatch.setattr(Config, 'OCR_JOB_MAX_ATTEMPTS', 2)
+    jobs = [make_job(), make_job()]
+    ocr.bad = {job.image_path for job in jobs}
+    ocr.error = lambda message: OperationalError('SELECT 1', {}, ConnectionError(message))
+
+    ocr_job_service.process(ocr_job_service.claim_batch('worker-1'), 'worker-1')
+
+    assert [_status(job) for job in jobs] == [OcrJob.STATUS_QUEUED] * 2
+    assert all(os.path.exists(job.image_path) for job in jobs)
+
+    ocr_job_service.process(ocr_job_service.claim_batch('worker-2'), 'worker-2')
+
+    assert [_status(job) for job in jobs] == [OcrJob.STATUS_FAILED] * 2
+    assert db.session.get(OcrJob, jobs[0].id).error.startswith('Gave up after 2 attempts')
+
+
+def test_missing_drafts_are_retried_per_job(make_job, ocr, monkeypatch):
+    jobs = [make_job(), make_job()]
+    monkeypatch.setattr(ExpenseService, 'process_ticket_images',
+                        staticmethod(lambda user_id, image_paths: [{'total': 1.0, 'file_name': None}]))
+
+    ocr_job_service.process(ocr_job_service.claim_batch('worker-1'), 'worker-1')
+
+    assert [_status(job) for job in jobs] == [OcrJob.STATUS_DONE] * 2
+
+
+def test_worker_that_lost_its_claim_leaves_the_job_alone(make_job, ocr):
+    job = make_job()
+    claimed = ocr_job_service.claim_batch('worker-1')
+    # worker-1 runs past the timeout and worker-2 takes the job over
+    _make_stale(job)
+    ocr_job_service.requeue_stale(timeout_seconds=60, max_attempts=3)
+    ocr_job_service.claim_batch('worker-2')
+
+    ocr_job_service.process(claimed, 'worker-1')
+
+    assert _status(job) == OcrJob.STATUS_PROCESSING
+    assert db.session.get(OcrJob, job.id).claimed_by == 'worker-2'
+    assert os.path.exists(job.image_path)
+
+def _upload(client, headers, *sizes):
+    files = [(io.BytesIO(b'\xff' * size), f'ticket-{i}.jpg') for i, size in enumerate(sizes)]
+    return client.post('/api/expenses/upload-tickets', data={'files': files},
+                       content_type='multipart/form-data', headers=headers)
+
+
+def test_batch_upload_accepts_album_larger_than_one_image(client, make_user, auth_headers):
+    user = make_user()
+
+    response = _upload(client, auth_headers(user), *[1024 * 1024] * 3)
+
+    assert response.status_code == 202
+    assert len(response.get_json()['job_ids']) == 3
+    assert OcrJob.query.filter_by(user_id=user.id).count() == 3
+
+
+def test_batch_upload_rejects_oversized_image(client, make_user, auth_headers, monkeypatch):
+    monkeypatch.setattr(Config, 'MAX_TICKET_FILE_SIZE', 1024)
+
+    response = _upload(client, auth_headers(make_user()), 512, 2048)
+
+    assert response.status_code == 413
+    assert 'ticket-1.jpg' in response.get_json()['error']
+    assert OcrJob.query.count() == 0
@@ -0,0 +1,77 @@
+"""
+Keyset paging of expenses and incomes by (created_at, id).
+"""
+from datetime import datetime
+
+import pytest
+
+from app.extensions import db
+from app.models import Expense, Income
+from app.repositories.user_scoped import decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user()
+
+
+def _pages(client, url, key, headers, limit):
+    """Follow ``next_cursor`` to the end; returns the list of pages of ids."""
+    pages, cursor = [], None
+    while True:
+        query = f'{url}?limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+        body = client.get(query, headers=headers).get_json()
+        pages.append([row['id'] for row in body[key]])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('model, url, key', [
+    (Expense, '/api/expenses', 'expenses'),
+    (Income, '/api/incomes', 'incomes'),
+])
+def test_pages_are_stable_with_shared_timestamps(client, user, auth_headers, make_expense, make_income,
+                                                 model, url, key):
+    make = make_expense if model is Expense else make_income
+    ids = [make(user).id for _ in range(7)]
+    model.query.update({'created_at': datetime(2026, 1, 1, 12, 0, 0)}, synchronize_session=False)
+    db.session.commit()
+
+    first = _pages(client, url, key, auth_headers(user), limit=3)
+    second = _pages(client, url, key, auth_headers(user), limit=3)
+
+    assert first == second
+    assert [len(page) for page in first] == [3, 3, 1]
+    flat = [row_id for page in first for row_id in page]
+    assert len(set(flat)) == len(flat)
+    assert sorted(flat) == sorted(ids)
+    # Ties are broken by id, newest (largest UUIDv7) first
+    assert flat == sorted(ids, reverse=True)
+
+
+def test_last_page_has_no_cursor(client, user, auth_headers, make_expense):
+    make_expense(user)
+    make_expense(user)
+
+    exact = client.get('/api/expenses?limit=2', headers=auth_headers(user)).get_json()
+    larger = client.get('/api/expenses?limit=5', headers=auth_headers(user)).get_json()
+
+    assert len(exact['expenses']) == 2
+    assert exact['next_cursor'] is None
+    assert larger['next_cursor'] is None
+
+
+@pytest.mark.parametrize('url', ['/api/expenses', '/api/incomes'])
+@pytest.mark.parametrize('cursor', ['not-a-cursor', 'W10', encode_cursor(datetime(2026, 1, 1), 'x')[:-3] + '!!!'])
+def test_malformed_cursor_is_rejected(client, user, auth_headers, url, cursor):
+    response = client.get(f'{url}?limit=2&cursor={cursor}', headers=auth_headers(user))
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2026, 3, 4, 5, 6, 7, 891000)
+
+    assert decode_cursor(encode_cursor(timestamp, 'abc')) == (timestamp, 'abc')
@@ -0,0 +1,65 @@
+"""
+Sliding-window throttling of the auth endpoints.
+"""
+import pytest
+
+from app.config import Config
+from app.utils.rate_limit import MemoryRateLimitStore, RateLimiter
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(Config, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(Config, 'AUTH_RATE_LIMIT_IP', '6/60')
+    monkeypatch.setattr(Config, 'AUTH_RATE_LIMIT_EMAIL', '2/60')
+
+
+def _login(client, email, password='wrong-password'):
+    return client.post('/api/login', json={'email': email, 'password': password})
+
+
+def test_email_limit_returns_429_with_retry_after(client, make_user, limits):
+    user = make_user()
+
+    statuses = [_login(client, user.email).status_code for _ in range(2)]
+    rejected = _login(client, user.email)
+
+    assert statuses == [401, 401]
+    assert rejected.status_code == 429
+    assert rejected.get_json() == {'success': False, 'error': 'Too many requests, try again later'}
+    assert 1 <= int(rejected.headers['Retry-After']) <= 60
+
+
+def test_email_limit_is_per_email(client, make_user, limits):
+    throttled, other = make_user(), make_user(password='other-password')
+    for _ in range(2):
+        _login(client, throttled.email)
+
+    # The same address in another spelling shares the counter
+    assert _login(client, f'  {throttled.email.upper()} ').status_code == 429
+    assert _login(client, other.email, 'other-password').status_code == 200
+
+
+def test_ip_limit_spans_emails(client, limits):
+    statuses = [_login(client, f'user{i}@example.com').status_code for i in range(7)]
+
+    assert statuses == [401] * 6 + [429]
+
+
+def test_disabled_limiter_never_rejects(client, make_user, limits, monkeypatch):
+    monkeypatch.setattr(Config, 'RATE_LIMIT_ENABLED', False)
+    user = make_user()
+
+    assert {_login(client, user.email).status_code for _ in range(5)} == {401}
+
+
+def test_sliding_window_estimate():
+    limiter = RateLimiter(MemoryRateLimitStore())
+    window_start = 6000.0
+
+    assert [limiter.hit('k', 4, 60, now=window_start + 1)[0] for _ in range(4)] == [True] * 4
+    assert limiter.hit('k', 4, 60, now=window_start + 2) == (False, 58)
+    # Half-way through the next window half of the previous 5 hits still count: 2.5 + 1
+    assert limiter.hit('k', 4, 60, now=window_start + 90)[0] is True
+    # 2.5 + 2 is over the limit until the previous share decays to 2, 6 seconds later
+    assert limiter.hit('k', 4, 60, now=window_start + 90) == (False, 6)
@@ -0,0 +1,84 @@
+"""
+Booking of recurring incomes and expenses by ``run_due``.
+"""
+from datetime import date
+
+import pytest
+
+from app.extensions import db
+from app.models import Expense, Income, User
+from app.services.recurring_service import recurring_service
+
+TODAY = date(2026, 4, 15)
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user()
+
+
+def _balance(user):
+    db.session.expire_all()
+    return db.session.get(User, user.id).accumulated_balance or 0.0
+
+
+def _rent(user, **data):
+    return recurring_service.create_rule(user.id, {
+        'kind': 'expense', 'name': 'Rent', 'amount': 900.0, 'category': 'servicios',
+        'frequency': 'monthly', 'start_date': '2026-01-31', **data
+    })
+
+
+def test_catch_up_books_missed_occurrences_once(user):
+    _rent(user)
+    recurring_service.create_rule(user.id, {'kind': 'income', 'name': 'Salary', 'amount': 2000.0,
+                                            'frequency': 'monthly', 'start_date': '2026-03-01'})
+
+    assert recurring_service.run_due(today=TODAY) == 5
+    assert recurring_service.run_due(today=TODAY) == 0
+
+    # Month ends are computed from the start date, so they do not drift to the 28th
+    assert sorted(row.payment_date for row in Expense.query.all()) == [
+        date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31)
+    ]
+    assert sorted(row.income_date for row in Income.query.all()) == [date(2026, 3, 1), date(2026, 4, 1)]
+    assert _balance(user) == pytest.approx(2 * 2000.0 - 3 * 900.0)
+
+
+def test_run_due_is_scoped_to_user(user, make_user):
+    other = make_user()
+    _rent(user)
+    _rent(other)
+
+    assert recurring_service.run_due(today=TODAY, user_id=user.id) == 3
+
+    assert {row.user_id for row in Expense.query.all()} == {user.id}
+    assert recurring_service.run_due(today=TODAY) == 3
+
+
+def test_overlapping_run_skips_occurrences_booked_by_the_other(user):
+    rule = _rent(user)
+    # The other run (e.g. the scheduler) booked February before this run read the rule
+    db.session.add(Expense(user_id=user.id, payment_concept='Rent', total=900.0, category='servicios',
+                           payment_date=date(2026, 2, 28), recurring_rule_id=rule.id))
+    db.session.commit()
+
+    assert recurring_service.run_due(today=TODAY) == 2
+
+    assert sorted(row.payment_date for row in Expense.query.all()) == [
+        date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31)
+    ]
+    db.session.expire_all()
+    assert (rule.occurrences, rule.next_run) == (3, date(2026, 4, 30))
+    assert _balance(user) == pytest.approx(-2 * 900.0)
+    assert recurring_service.run_due(today=TODAY) == 0
+
+
+def test_rule_ends_after_end_date(user):
+    rule = _rent(user, end_date='2026-02-28')
+
+    assert recurring_service.run_due(today=TODAY) == 2
+
+    db.session.expire_all()
+    assert rule.active is False
+    assert rule.next_run is None
@@ -0,0 +1,61 @@
+"""
+Full-text search of expenses through the SQLite FTS5 index.
+"""
+import pytest
+from sqlalchemy import text
+
+from app.extensions import db
+from app.models import Expense
+from app.services.expense_service import expense_service
+from app.utils.fulltext import SQLITE_FTS_KEYS_TABLE, SQLITE_FTS_TABLE, ensure_sqlite_fts
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user()
+
+
+def _found(user, query):
+    return [expense.payment_concept for expense, score in expense_service.search_expenses(user.id, query)['results']]
+
+
+def test_index_follows_inserts_updates_and_deletes(user, make_expense):
+    coffee = make_expense(user, payment_concept='Starbucks Reforma', category='cafe')
+    make_expense(user, payment_concept='OXXO', note='cafe de olla')
+
+    assert sorted(_found(user, 'caf')) == ['OXXO', 'Starbucks Reforma']
+
+    expense_service.update_expense(user.id, coffee.id, {'payment_concept': 'Cielito Querido'})
+    assert _found(user, 'starbucks') == []
+    assert _found(user, 'cielito') == ['Cielito Querido']
+
+    expense_service.delete_expense(user.id, coffee.id)
+    assert _found(user, 'caf') == ['OXXO']
+    assert db.session.execute(text(f"SELECT count(*) FROM {SQLITE_FTS_KEYS_TABLE}")).scalar() == 1
+
+
+def test_search_survives_renumbered_rowids(user, make_expense):
+    make_expense(user, payment_concept='Starbucks')
+    make_expense(user, payment_concept='Walmart')
+
+    # VACUUM may renumber the implicit rowid of tables without an INTEGER PRIMARY KEY
+    db.session.execute(text("UPDATE expenses SET rowid = rowid + 1000"))
+    db.session.commit()
+
+    assert _found(user, 'walmart') == ['Walmart']
+    assert _found(user, 'starbucks') == ['Starbucks']
+
+
+def test_rowid_keyed_index_is_replaced(user, make_expense):
+    make_expense(user, payment_concept='Starbucks')
+    with db.engine.begin() as connection:
+        # The earlier layout: external content keyed by the expenses rowid
+        connection.execute(text(f"DROP TABLE {SQLITE_FTS_KEYS_TABLE}"))
+        connection.execute(text(f"DROP TABLE {SQLITE_FTS_TABLE}"))
+        connection.execute(text(f"CREATE VIRTUAL TABLE {SQLITE_FTS_TABLE} USING fts5("
+                                "payment_concept, note, category, content='expenses', content_rowid='rowid')"))
+
+        ensure_sqlite_fts(connection)
+
+    assert Expense.query.count() == 1
+    assert _found(user, 'starbucks') == ['Starbucks']
@@ -0,0 +1,32 @@
+"""
+The expense statistics endpoint and its percentile parameter.
+"""
+import pytest
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user()
+
+
+def test_percentiles_of_expense_totals(client, user, make_expense, auth_headers):
+    for total in (10.0, 20.0, 30.0, 40.0):
+        make_expense(user, total=total)
+
+    response = client.get('/api/expenses/statistics?percentiles=50,100', headers=auth_headers(user))
+
+    assert response.status_code == 200
+    assert response.get_json()['statistics']['percentiles'] == {'50.0': 20.0, '100.0': 40.0}
+
+
+@pytest.mark.parametrize('percentiles, message', [
+    ('50,high', 'percentiles must be numbers'),
+    ('50,', 'percentiles must be numbers'),
+    ('50,150', 'between 0 and 100'),
+    ('-5', 'between 0 and 100'),
+])
+def test_invalid_percentiles_are_rejected(client, user, auth_headers, percentiles, message):
+    response = client.get(f'/api/expenses/statistics?percentiles={percentiles}', headers=auth_headers(user))
+
+    assert response.status_code == 400
+    assert message in response.get_json()['error']
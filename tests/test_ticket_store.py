@@ -0,0 +1,187 @@
+"""
+Reference counting and garbage collection of content-addressed ticket images.
+"""
+import os
+from datetime import datetime
+
+import pytest
+
+from app.extensions import db
+from app.models import Expense
+from app.models.ocr_job import OcrJob
+from app.models.ticket_blob import TicketBlob
+from app.services.expense_service import expense_service
+from app.services.ocr_job_service import ocr_job_service
+from app.services.ticket_store_service import MissingTicketImageError, TicketStoreService, ticket_store_service
+
+pytestmark = pytest.mark.usefixtures('app')
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user()
+
+
+@pytest.fixture
+def image(tmp_path):
+    """A ticket upload Pillow cannot decode, so it is stored as-is."""
+    uploads = tmp_path / 'uploads'
+    uploads.mkdir()
+
+    def make(content=b'ticket'):
+        path = uploads / f'{len(list(uploads.iterdir()))}.jpg'
+        path.write_bytes(content)
+        return str(path)
+    return make
+
+
+def _refs(file_name):
+    db.session.expire_all()
+    blob = db.session.get(TicketBlob, file_name)
+    return blob.ref_count if blob else None
+
+
+def _make_stale(file_name):
+    TicketBlob.query.filter_by(file_name=file_name).update({'updated_at': datetime(2000, 1, 1)})
+    db.session.commit()
+
+
+def test_same_content_is_stored_once(image):
+    first = ticket_store_service.store(image(b'same'))
+    second = ticket_store_service.store(image(b'same'))
+
+    assert first == second
+    assert ticket_store_service.is_blob_name(first)
+    assert os.path.exists(ticket_store_service.blob_path(first))
+    assert TicketBlob.query.count() == 1
+    assert _refs(first) == 0
+
+
+def test_references_follow_expenses(user, image, make_expense):
+    file_name = ticket_store_service.store(image())
+
+    kept = make_expense(user, file_name=file_name)
+    expense_service.create_expenses([{'payment_concept': f'Draft {i}', 'total': 10.0 + i,
+                                      'file_name': file_name, 'user_id': user.id} for i in range(2)],
+                                    allow_duplicates=True)
+    assert _refs(file_name) == 3
+
+    for expense in Expense.query.filter(Expense.id != kept.id).all():
+        expense_service.delete_expense(user.id, expense.id)
+    assert _refs(file_name) == 1
+
+    expense_service.delete_expense(user.id, kept.id)
+    ticket_store_service.release(user.id, file_name)
+    assert _refs(file_name) == 0
+
+
+def test_gc_removes_only_stale_unreferenced_blobs(user, image, make_expense):
+    orphan = ticket_store_service.store(image(b'orphan'))
+    fresh = ticket_store_service.store(image(b'fresh'))
+    referenced = ticket_store_service.store(image(b'referenced'))
+    make_expense(user, file_name=referenced)
+    _make_stale(orphan)
+    _make_stale(referenced)
+
+    assert ticket_store_service.collect_garbage(grace_seconds=60) == 1
+
+    assert _refs(orphan) is None
+    assert not os.path.exists(ticket_store_service.blob_path(orphan))
+    for kept in (fresh, referenced):
+        assert _refs(kept) is not None
+        assert os.path.exists(ticket_store_service.blob_path(kept))
+
+
+def test_gc_keeps_blob_stored_again_before_the_delete(image):
+    file_name = ticket_store_service.store(image(b'again'))
+    _make_stale(file_name)
+
+    # A new upload of the same content refreshes the row before GC gets to it
+    ticket_store_service.store(image(b'again'))
+
+    assert ticket_store_service.collect_garbage(grace_seconds=60) == 0
+    assert os.path.exists(ticket_store_service.blob_path(file_name))
+
+
+def test_store_recovers_files_removed_by_a_concurrent_gc(image, monkeypatch):
+    file_name = ticket_store_service.store(image(b'raced'))
+    _make_stale(file_name)
+    register = TicketStoreService._register
+    calls = []
+
+    def gc_then_register(name):
+        # GC deletes the row and its files after store found them in place
+        if not calls:
+            assert ticket_store_service.collect_garbage(grace_seconds=60) == 1
+        calls.append(name)
+        register(name)
+    monkeypatch.setattr(TicketStoreService, '_register', staticmethod(gc_then_register))
+
+    assert ticket_store_service.store(image(b'raced')) == file_name
+
+    assert len(calls) == 2
+    assert _refs(file_name) == 0
+    assert os.path.exists(ticket_store_service.blob_path(file_name))
+
+
+def _finished_job(user, file_name):
+    job = OcrJob(user_id=user.id, image_path='unused.jpg', status=OcrJob.STATUS_PROCESSING)
+    db.session.add(job)
+    db.session.commit()
+    return ocr_job_service.complete(job, {'payment_concept': 'OXXO', 'total': 35.0, 'file_name': file_name})
+
+
+def test_post_accepts_own_ticket_image(client, user, image, auth_headers):
+    file_name = ticket_store_service.store(image())
+    _finished_job(user, file_name)
+
+    response = client.post('/api/expenses', json={'payment_concept': 'OXXO', 'total': 35.0, 'file_name': file_name},
+                           headers=auth_headers(user))
+
+    assert response.status_code == 201
+    assert response.get_json()['expense']['file_name'] == file_name
+    assert _refs(file_name) == 1
+
+
+@pytest.mark.parametrize('owner', ['other user', 'nobody'])
+def test_post_rejects_foreign_ticket_image(client, user, make_user, image, auth_headers, owner):
+    file_name = ticket_store_service.store(image())
+    if owner == 'other user':
+        _finished_job(make_user(), file_name)
+
+    response = client.post('/api/expenses', json={'payment_concept': 'OXXO', 'total': 35.0, 'file_name': file_name},
+                           headers=auth_headers(user))
+
+    assert response.status_code == 400
+    assert Expense.query.count() == 0
+    assert _refs(file_name) == 0
+
+
+def test_draft_outliving_the_grace_period_is_not_saved(client, user, image, auth_headers):
+    file_name = ticket_store_service.store(image())
+    _finished_job(user, file_name)
+    # The user confirms the draft only after garbage collection reclaimed its image
+    _make_stale(file_name)
+    assert ticket_store_service.collect_garbage(grace_seconds=60) == 1
+
+    response = client.post('/api/expenses', json={'payment_concept': 'OXXO', 'total': 35.0, 'file_name': file_name},
+                           headers=auth_headers(user))
+
+    assert response.status_code == 400
+    assert 'expired' in response.get_json()['error']
+    assert Expense.query.count() == 0
+
+
+def test_batch_with_expired_image_saves_nothing(user, image):
+    kept = ticket_store_service.store(image(b'kept'))
+    expired = ticket_store_service.store(image(b'expired'))
+    _make_stale(expired)
+    ticket_store_service.collect_garbage(grace_seconds=60)
+
+    with pytest.raises(MissingTicketImageError) as error:
+        expense_service.create_expenses([{'payment_concept': name, 'total': 10.0, 'file_name': name, 'user_id': user.id}
+                                         for name in (kept, expired)])
+
+    assert error.value.file_names == [expired]
+    assert Expense.query.count() == 0
+    assert _refs(kept) == 0
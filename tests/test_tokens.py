@@ -0,0 +1,89 @@
+"""
+Revocation of dashboard tokens through the user's ``token_version``.
+"""
+import pytest
+
+from app.config import Config
+from app.extensions import db
+from app.models import User
+from app.services.token_service import token_service
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user(password='correct-horse-battery')
+
+
+def _bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _expenses(client, access_token):
+    return client.get('/api/expenses', headers=_bearer(access_token))
+
+
+def _refresh(client, refresh_token):
+    return client.post('/api/refresh', headers=_bearer(refresh_token))
+
+
+def test_logout_revokes_access_and_refresh_tokens(client, user):
+    tokens = token_service.issue_tokens(user)
+    assert _expenses(client, tokens['access_token']).status_code == 200
+
+    assert client.post('/api/logout', headers=_bearer(tokens['refresh_token'])).status_code == 200
+
+    assert _expenses(client, tokens['access_token']).status_code == 401
+    assert _refresh(client, tokens['refresh_token']).status_code == 401
+    assert _expenses(client, token_service.issue_tokens(user)['access_token']).status_code == 200
+
+
+def test_change_password_revokes_other_sessions(client, user):
+    other_session = token_service.issue_tokens(user)
+    current = token_service.issue_tokens(user)
+
+    response = client.post('/api/change-password', headers=_bearer(current['access_token']), json={
+        'email': user.email, 'current_password': 'correct-horse-battery', 'new_password': 'battery-staple-horse'
+    })
+
+    assert response.status_code == 200
+    assert _expenses(client, other_session['access_token']).status_code == 401
+    assert _refresh(client, other_session['refresh_token']).status_code == 401
+    assert _expenses(client, response.get_json()['access_token']).status_code == 200
+    assert _refresh(client, response.get_json()['refresh_token']).status_code == 200
+
+
+def test_refreshed_token_keeps_version(client, user):
+    tokens = token_service.issue_tokens(user)
+    access_token = _refresh(client, tokens['refresh_token']).get_json()['access_token']
+    assert _expenses(client, access_token).status_code == 200
+
+    token_service.revoke_user_tokens(user.id)
+
+    assert _expenses(client, access_token).status_code == 401
+
+
+def test_version_bump_by_another_process_is_seen_after_sync(client, user, monkeypatch):
+    monkeypatch.setattr(Config, 'TOKEN_REVOCATION_SYNC_SECONDS', 3600)
+    tokens = token_service.issue_tokens(user)
+    assert _expenses(client, tokens['access_token']).status_code == 200
+
+    # Another API process revokes: only the database changes, not this cache
+    User.query.filter_by(id=user.id).update({'token_version': User.token_version + 1})
+    db.session.commit()
+    assert _expenses(client, tokens['access_token']).status_code == 200
+
+    token_service.sync(force=True)
+
+    assert _expenses(client, tokens['access_token']).status_code == 401
+    assert _refresh(client, tokens['refresh_token']).status_code == 401
+
+
+def test_cache_resyncs_after_interval(client, user, monkeypatch):
+    tokens = token_service.issue_tokens(user)
+    assert _expenses(client, tokens['access_token']).status_code == 200
+
+    User.query.filter_by(id=user.id).update({'token_version': User.token_version + 1})
+    db.session.commit()
+    monkeypatch.setattr(Config, 'TOKEN_REVOCATION_SYNC_SECONDS', 0)
+
+    assert _expenses(client, tokens['access_token']).status_code == 401
@@ -0,0 +1,89 @@
+"""
+Every expense and income route only sees rows of the user in the JWT.
+"""
+import pytest
+
+from app.extensions import db
+from app.models.ticket_blob import TicketBlob
+
+
+@pytest.fixture
+def owner(make_user):
+    return make_user()
+
+
+@pytest.fixture
+def intruder(make_user):
+    return make_user()
+
+
+@pytest.mark.parametrize('method', ['GET', 'PUT', 'PATCH', 'DELETE'])
+def test_other_users_expense_is_not_found(client, owner, intruder, make_expense, auth_headers, method):
+    expense = make_expense(owner, payment_concept='Rent', total=900.0)
+    body = {'total': 1.0} if method in ('PUT', 'PATCH') else None
+
+    response = client.open(f'/api/expenses/{expense.id}', method=method, json=body, headers=auth_headers(intruder))
+
+    assert response.status_code == 404
+    response = client.get(f'/api/expenses/{expense.id}', headers=auth_headers(owner))
+    assert response.status_code == 200
+    assert response.get_json()['expense']['total'] == 900.0
+
+
+@pytest.mark.parametrize('method', ['PUT', 'PATCH', 'DELETE'])
+def test_other_users_income_is_not_found(client, owner, intruder, make_income, auth_headers, method):
+    income = make_income(owner, amount=2500.0)
+    body = {'amount': 1.0} if method != 'DELETE' else None
+
+    response = client.open(f'/api/incomes/{income.id}', method=method, json=body, headers=auth_headers(intruder))
+
+    assert response.status_code == 404
+    incomes = client.get('/api/incomes', headers=auth_headers(owner)).get_json()['incomes']
+    assert [(row['id'], row['amount']) for row in incomes] == [(income.id, 2500.0)]
+
+
+def test_other_users_ticket_file_is_not_found(client, owner, intruder, make_expense, auth_headers):
+    file_name = '0' * 64 + '.webp'
+    db.session.add(TicketBlob(file_name=file_name, size=0))
+    db.session.commit()
+    expense = make_expense(owner, file_name=file_name)
+
+    response = client.get(f'/api/file/ticket/{expense.id}', headers=auth_headers(intruder))
+
+    assert response.status_code == 404
+
+
+def test_lists_only_contain_own_rows(client, owner, intruder, make_expense, make_income, auth_headers):
+    make_expense(owner, payment_concept='Owner expense')
+    make_income(owner, source='Owner income')
+    mine = make_expense(intruder, payment_concept='Intruder expense')
+
+    expenses = client.get('/api/expenses', headers=auth_headers(intruder)).get_json()['expenses']
+    paged = client.get('/api/expenses?limit=10', headers=auth_headers(intruder)).get_json()['expenses']
+    incomes = client.get('/api/incomes?limit=10', headers=auth_headers(intruder)).get_json()['incomes']
+
+    assert [row['id'] for row in expenses] == [mine.id]
+    assert [row['id'] for row in paged] == [mine.id]
+    assert incomes == []
+
+
+def test_search_never_returns_other_users_rows(client, owner, intruder, make_expense, auth_headers):
+    make_expense(owner, payment_concept='Starbucks latte')
+    mine = make_expense(intruder, payment_concept='Starbucks espresso')
+
+    found = client.get('/api/expenses/search?q=starbucks', headers=auth_headers(intruder)).get_json()
+
+    assert found['total'] == 1
+    assert [row['id'] for row in found['expenses']] == [mine.id]
+
+
+def test_statistics_only_aggregate_own_rows(client, owner, intruder, make_expense, auth_headers):
+    make_expense(owner, total=1000.0, category='supermercado')
+    make_expense(owner, total=3000.0, category='servicios')
+    make_expense(intruder, total=40.0, category='transporte')
+
+    stats = client.get('/api/expenses/statistics', headers=auth_headers(intruder)).get_json()['statistics']
+
+    assert stats['total_expenses'] == 1
+    assert stats['total_amount'] == 40.0
+    assert set(stats['categories']) == {'transporte'}
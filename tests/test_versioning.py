@@ -0,0 +1,93 @@
+"""
+Optimistic concurrency of expense and income updates: a stale ``version`` gets
+a 409 with the current version instead of overwriting a concurrent edit.
+"""
+import pytest
+
+from app.utils.helpers import requested_version
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user()
+
+
+@pytest.fixture(params=['expense', 'income'])
+def resource(request, user, make_expense, make_income):
+    """(url, response key, field to change) of a row at version 1."""
+    if request.param == 'expense':
+        row = make_expense(user)
+        return f'/api/expenses/{row.id}', 'expense', 'total'
+    row = make_income(user)
+    return f'/api/incomes/{row.id}', 'income', 'amount'
+
+
+def test_update_bumps_version(client, user, auth_headers, resource):
+    url, key, field = resource
+
+    first = client.patch(url, json={field: 10.0, 'version': 1}, headers=auth_headers(user))
+    second = client.patch(url, json={field: 20.0}, headers=auth_headers(user))
+
+    assert first.status_code == 200
+    assert first.get_json()[key]['version'] == 2
+    assert second.status_code == 200
+    assert second.get_json()[key]['version'] == 3
+    assert second.get_json()[key][field] == 20.0
+
+
+@pytest.mark.parametrize('stale', [
+    {'json': {'version': 1}},
+    {'headers': {'If-Match': '"1"'}},
+    {'headers': {'If-Match': 'W/"1"'}},
+])
+def test_stale_version_conflicts(client, user, auth_headers, resource, stale):
+    url, key, field = resource
+    assert client.patch(url, json={field: 10.0}, headers=auth_headers(user)).status_code == 200
+
+    response = client.patch(url, json={field: 99.0, **stale.get('json', {})},
+                            headers={**auth_headers(user), **stale.get('headers', {})})
+
+    assert response.status_code == 409
+    assert response.get_json()['current_version'] == 2
+    assert client.patch(url, json={field: 30.0, 'version': 2}, headers=auth_headers(user)).get_json()[key][field] == 30.0
+
+
+def test_if_match_with_current_version_succeeds(client, user, auth_headers, resource):
+    url, key, field = resource
+
+    response = client.put(url, json={field: 10.0}, headers={**auth_headers(user), 'If-Match': 'W/"1"'})
+
+    assert response.status_code == 200
+    assert response.get_json()[key]['version'] == 2
+
+
+def test_nothing_to_update_is_rejected(client, user, auth_headers, resource):
+    url, _, _ = resource
+
+    response = client.patch(url, json={'unknown': 1}, headers=auth_headers(user))
+
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Nothing to update')
+
+
+def test_non_integer_version_is_rejected(client, user, auth_headers, resource):
+    url, _, field = resource
+
+    body = client.patch(url, json={field: 10.0, 'version': 'latest'}, headers=auth_headers(user))
+    header = client.patch(url, json={field: 10.0}, headers={**auth_headers(user), 'If-Match': '"abc"'})
+
+    assert body.status_code == 400
+    assert header.status_code == 400
+    assert body.get_json()['error'] == 'version must be an integer'
+
+
+@pytest.mark.parametrize('data, if_match, expected', [
+    ({'version': 3}, None, 3),
+    ({'version': '3'}, 'W/"7"', 3),
+    ({}, '"3"', 3),
+    ({}, 'W/"3"', 3),
+    ({}, '*', None),
+    ({}, None, None),
+])
+def test_requested_version(data, if_match, expected):
+    assert requested_version(data, if_match) == expected
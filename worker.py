@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+OCR worker for queued ticket uploads.
+Claims jobs created by POST /api/expenses/upload-ticket and runs OCR on them
+outside the API process. Several workers can run side by side. The worker
+also requeues jobs left behind by a crashed worker and garbage-collects
+ticket images that no expense references any more.
+
+Command to run:
+    python worker.py
+"""
+
+import os
+import signal
+import socket
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from app.utils.logging_config import setup_logging
+setup_logging()
+import logging
+
+from app import create_app
+from app.models.category_stat import CategoryStat
+from app.services.anomaly_service import anomaly_service
+from app.services.expense_service import expense_service
+from app.services.ocr_job_service import ocr_job_service
+from app.services.ticket_store_service import ticket_store_service
+from app.utils.metrics import init_worker_metrics
+
+FLASK_ENV = os.getenv('FLASK_ENV', 'development')
+
+# Create Flask app context for database operations
+flask_app = create_app(FLASK_ENV, api=False)
+# OCR timings show up in the API's /metrics through the shared directory
+init_worker_metrics(flask_app)
+
+
+class OcrWorker:
+    """Poll the job table and process queued tickets in batches."""
+
+    def __init__(self, poll_seconds: float, batch_size: int, gc_interval: float, requeue_interval: float):
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self.gc_interval = gc_interval
+        self.next_gc = 0.0
+        self.requeue_interval = requeue_interval
+        self.next_requeue = 0.0
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.running = True
+
+    def stop(self, signum=None, frame=None):
+        """Finish the current batch, then exit."""
+        logging.info("Stopping OCR worker...")
+        self.running = False
+
+    def collect_garbage(self):
+        """Reclaim unreferenced ticket images every ``gc_interval`` seconds."""
+        if time.monotonic() < self.next_gc:
+            return
+        self.next_gc = time.monotonic() + self.gc_interval
+        try:
+            removed = ticket_store_service.collect_garbage()
+            if removed:
+                logging.info("Removed %s unreferenced ticket images.", removed)
+        except Exception as e:
+            logging.error("Error collecting ticket images: %s", str(e))
+
+    def requeue_stale(self):
+        """Requeue jobs of crashed workers every ``requeue_interval`` seconds."""
+        if time.monotonic() < self.next_requeue:
+            return
+        self.next_requeue = time.monotonic() + self.requeue_interval
+        try:
+            requeued = ocr_job_service.requeue_stale()
+            if requeued:
+                logging.info("Requeued %s stale OCR jobs.", requeued)
+        except Exception as e:
+            logging.error("Error requeueing stale OCR jobs: %s", str(e))
+
+    def run(self):
+        """Start the worker loop."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        with flask_app.app_context():
+            if not CategoryStat.query.first():
+                seeded = anomaly_service.rebuild()
+                logging.info("Seeded expense statistics for %s categories.", seeded)
+            backfilled = expense_service.backfill_fingerprints()
+            if backfilled:
+                logging.info("Computed duplicate fingerprints for %s expenses.", backfilled)
+
+            logging.info("OCR worker %s started (batch size %s).", self.worker_id, self.batch_size)
+            while self.running:
+                self.requeue_stale()
+                self.collect_garbage()
+                try:
+                    jobs = ocr_job_service.claim_batch(self.worker_id, self.batch_size)
+                except Exception as e:
+                    logging.error("Error claiming OCR jobs: %s", str(e))
+                    jobs = []
+                if not jobs:
+                    time.sleep(self.poll_seconds)
+                    continue
+                ocr_job_service.process(jobs, self.worker_id)
+
+
+def main():
+    """Main function to run the worker."""
+    worker = OcrWorker(
+        flask_app.config['OCR_WORKER_POLL_SECONDS'],
+        flask_app.config['OCR_BATCH_SIZE'],
+        flask_app.config['TICKET_GC_INTERVAL_SECONDS'],
+        flask_app.config['OCR_REQUEUE_INTERVAL_SECONDS']
+    )
+    worker.run()
+
+
+if __name__ == '__main__':
+    main()